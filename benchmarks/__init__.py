@@ -0,0 +1,5 @@
+"""
+Benchmarks for disermo
+
+Run with ``python -m benchmarks``; see ``--help`` for options
+"""
@@ -0,0 +1,95 @@
+"""
+Command line entry point for the benchmarks
+
+Results are written as JSON; pass ``--compare`` with an earlier results file
+to report the change for each benchmark
+"""
+import argparse
+from dataclasses import asdict, fields
+import datetime
+import json
+import platform
+import sys
+from typing import Dict, List
+
+from .suite import Options, registry, run
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    defaults = Options()
+    for field in fields(Options):
+        parser.add_argument(
+            f'--{field.name.replace("_", "-")}',
+            type=field.type,
+            default=getattr(defaults, field.name),
+        )
+    parser.add_argument(
+        'names', nargs='*',
+        help=f'benchmark name prefixes to run, from: {", ".join(registry)}',
+    )
+    parser.add_argument('--output', '-o', help='write results to this file')
+    parser.add_argument('--compare', help='earlier results file to compare')
+    parser.add_argument(
+        '--threshold', type=float, default=None,
+        help='exit with an error if any benchmark is this ratio slower',
+    )
+    return parser.parse_args(argv)
+
+
+def compare(baseline: Dict, results: Dict, threshold: float = None) -> bool:
+    """
+    Print the ratio of each result's best time to the baseline's
+
+    Return False if any benchmark is slower than the threshold allows
+    """
+    passed: bool = True
+    for name, result in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None or not previous['min']:
+            continue
+        ratio: float = result['min'] / previous['min']
+        flag: str = ''
+        if threshold is not None and ratio > threshold:
+            flag = ' REGRESSION'
+            passed = False
+        print(f'{name:<32} {ratio:6.2f}x{flag}', file=sys.stderr)
+    return passed
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    options = Options(**{
+        field.name: getattr(args, field.name) for field in fields(Options)
+    })
+
+    results: Dict = {
+        'meta': {
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'options': asdict(options),
+        },
+        'results': {},
+    }
+    for name, result in run(options, args.names):
+        print(f'{name:<32} {result["min"]:.6f}s', file=sys.stderr)
+        results['results'][name] = result
+
+    output: str = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as file:
+            if not compare(json.load(file), results, args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
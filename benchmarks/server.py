@@ -0,0 +1,55 @@
+"""
+Local HTTP server with a stubbed latency, for benchmarking remote checks
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+from typing import Type
+
+
+class LatencyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency: float = 0
+
+    def do_GET(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        content = b'OK'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class LatencyServer:
+    """
+    Serve every GET request after ``latency`` seconds
+
+    Use as a context manager; ``url`` is the base url of the server
+    """
+    latency: float
+    httpd: ThreadingHTTPServer
+
+    def __init__(self, latency: float = 0.01) -> None:
+        self.latency = latency
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    def __enter__(self) -> 'LatencyServer':
+        handler: Type[LatencyHandler] = type(
+            'Handler', (LatencyHandler,), {'latency': self.latency},
+        )
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,227 @@
+"""
+Benchmark definitions and timing
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import (
+    Any, Callable, ContextManager, Dict, Iterator, List, Tuple,
+)
+
+from disermo.checks import Check
+from disermo.constants import Status
+from disermo.node import Node
+from disermo.storage import CSV, Storage
+
+from .server import LatencyServer
+from .trees import NullNotifier, build_tree, count
+
+
+@dataclass
+class Options:
+    width: int = 10
+    depth: int = 3
+    repeat: int = 5
+    latency: float = 0.005
+    web_width: int = 5
+    web_depth: int = 2
+    workers: int = 16
+
+
+# A benchmark is a generator which takes options, sets up, then yields the
+# operation to time and the number of items each call processes; anything
+# after the yield is run to tear down
+Operation = Tuple[Callable[[], Any], int]
+Benchmark = Callable[[Options], Iterator[Operation]]
+registry: Dict[str, Callable[[Options], ContextManager[Operation]]] = {}
+
+
+def benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    def register(func: Benchmark) -> Benchmark:
+        registry[name] = contextmanager(func)
+        return func
+    return register
+
+
+def measure(func: Callable[[], Any], repeat: int, items: int) -> Dict:
+    """
+    Call ``func`` ``repeat`` times and summarise the durations, in seconds
+    """
+    func()  # warm up
+    times: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    best: float = min(times)
+    return {
+        'items': items,
+        'repeat': repeat,
+        'min': best,
+        'max': max(times),
+        'mean': statistics.mean(times),
+        'median': statistics.median(times),
+        'items_per_second': items / best if best else None,
+    }
+
+
+def run(
+    options: Options, names: List[str] = None,
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Run the named benchmarks, or all of them, yielding their results
+    """
+    for name, func in registry.items():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        with func(options) as (operation, items):
+            result: Dict = measure(operation, options.repeat, items)
+        yield name, result
+
+
+class MemoryStorage(Storage):
+    """
+    Storage which is never loaded from or saved to disk
+    """
+    def load(self) -> None:
+        pass
+
+    def save(self) -> None:
+        pass
+
+
+def fill(storage: Storage, checks: List[Check], runs: int) -> None:
+    statuses = [Status.OK, Status.ERROR]
+    for index in range(runs):
+        for check in checks:
+            storage.set(check.uid, statuses[(index // 3) % 2])
+
+
+@benchmark('check.run')
+def check_run(options: Options):
+    node: Node = build_tree(options.width, options.depth)
+    yield node.run, count(node)
+
+
+@benchmark('check.run.threads')
+def check_run_threads(options: Options):
+    node: Node = build_tree(options.width, options.depth)
+    with ThreadPoolExecutor(max_workers=options.workers) as executor:
+        yield (lambda: node.run(executor=executor)), count(node)
+
+
+@benchmark('check.run.web')
+def check_run_web(options: Options):
+    with LatencyServer(options.latency) as server:
+        node: Node = build_tree(
+            options.web_width, options.web_depth, url=server.url,
+        )
+        yield node.run, count(node)
+
+
+@benchmark('check.run.web.threads')
+def check_run_web_threads(options: Options):
+    with LatencyServer(options.latency) as server, ThreadPoolExecutor(
+        max_workers=options.workers,
+    ) as executor:
+        node: Node = build_tree(
+            options.web_width, options.web_depth, url=server.url,
+        )
+        yield (lambda: node.run(executor=executor)), count(node)
+
+
+@benchmark('node.iter_flat_checks')
+def iter_flat_checks(options: Options):
+    node: Node = build_tree(options.width, options.depth)
+    yield (lambda: list(node.iter_flat_checks())), count(node)
+
+
+@benchmark('node.iter_flat_depth_checks')
+def iter_flat_depth_checks(options: Options):
+    node: Node = build_tree(options.width, options.depth)
+    yield (lambda: list(node.iter_flat_depth_checks())), count(node)
+
+
+@benchmark('node.iter_flat_labelled_checks')
+def iter_flat_labelled_checks(options: Options):
+    node: Node = build_tree(options.width, options.depth)
+    yield (lambda: list(node.iter_flat_labelled_checks())), count(node)
+
+
+@benchmark('node.get_index')
+def get_index(options: Options):
+    node: Node = build_tree(options.width, options.depth)
+
+    def rebuild():
+        node._index_version = -1
+        node.get_index()
+    yield rebuild, count(node)
+
+
+@benchmark('storage.set')
+def storage_set(options: Options):
+    checks = list(build_tree(options.width, options.depth).iter_tree())
+    storage = Storage()
+    yield (lambda: fill(storage, checks, 1)), len(checks)
+
+
+@benchmark('storage.get')
+def storage_get(options: Options):
+    checks = list(build_tree(options.width, options.depth).iter_tree())
+    storage = Storage()
+    fill(storage, checks, storage.max_memory)
+
+    def get():
+        for check in checks:
+            list(storage.get(check.uid))
+    yield get, len(checks)
+
+
+@benchmark('csv.save')
+def csv_save(options: Options):
+    checks = list(build_tree(options.width, options.depth).iter_tree())
+    path: str = tempfile.mkdtemp()
+    storage = CSV(os.path.join(path, 'bench.csv'), lock=False)
+    fill(storage, checks, storage.max_memory)
+    yield storage.save, len(checks)
+    shutil.rmtree(path)
+
+
+@benchmark('csv.load')
+def csv_load(options: Options):
+    checks = list(build_tree(options.width, options.depth).iter_tree())
+    path: str = tempfile.mkdtemp()
+    storage = CSV(os.path.join(path, 'bench.csv'), lock=False)
+    fill(storage, checks, storage.max_memory)
+    storage.save()
+    yield storage.load, len(checks)
+    shutil.rmtree(path)
+
+
+@benchmark('notifier.trend_test')
+def trend_test(options: Options):
+    node: Node = build_tree(options.width, options.depth)
+    node.run()
+    checks = list(node.iter_tree())
+    storage = Storage()
+    fill(storage, checks, storage.max_memory)
+    notifier = NullNotifier()
+
+    def test():
+        for check in checks:
+            notifier.test(storage, check)
+    yield test, len(checks)
+
+
+@benchmark('node.check')
+def node_check(options: Options):
+    node: Node = build_tree(
+        options.width, options.depth, notifier=NullNotifier(),
+    )
+    storage = MemoryStorage()
+    yield (lambda: node.check(storage)), count(node)
@@ -0,0 +1,71 @@
+"""
+Synthetic check trees
+"""
+from typing import Callable, Optional
+
+from disermo.checks import Check
+from disermo.checks.remote import Web
+from disermo.constants import Status
+from disermo.node import Node
+from disermo.notifiers.base import TrendNotifier
+
+
+class StaticCheck(Check):
+    """
+    Check which does no work, to measure the overhead of the tree itself
+    """
+    def __init__(self, index: int) -> None:
+        self.index = index
+        super().__init__(label=f'Static {index}')
+
+    def get_uid(self) -> str:
+        return f'{self.class_id}-{self.index}'
+
+    def update(self) -> None:
+        self.status = Status.OK
+        self.data = {'index': self.index}
+
+
+class NullNotifier(TrendNotifier):
+    """
+    Trend notifier which renders nothing and delivers nowhere
+    """
+    def render(self, node, checks):
+        return None
+
+
+def build_tree(
+    width: int,
+    depth: int,
+    url: Optional[str] = None,
+    notifier: Optional[TrendNotifier] = None,
+) -> Node:
+    """
+    Build a node with ``width`` subchecks on each of ``depth`` levels
+
+    If a url is given the leaves are ``Web`` checks against it, otherwise
+    they are ``StaticCheck``s
+    """
+    counter = iter(range(width ** (depth + 1) + 1))
+
+    def make_leaf() -> Check:
+        index: int = next(counter)
+        if url is None:
+            return StaticCheck(index)
+        return Web(f'{url}/{index}', label=f'Web {index}')
+
+    def make(level: int, factory: Callable[[], Check]) -> Check:
+        if level == depth:
+            return factory()
+        check = StaticCheck(next(counter))
+        return check.add(*[make(level + 1, factory) for _ in range(width)])
+
+    node = Node(label='Benchmark')
+    node.add(*[make(1, make_leaf) for _ in range(width)])
+    if notifier is not None:
+        node.notify(notifier)
+    return node
+
+
+def count(node: Node) -> int:
+    return sum(1 for _ in node.iter_tree())
@@ -3,3 +3,6 @@ from . import notifiers  # noqa
 from . import storage  # noqa
 from .checks import Check  # noqa
 from .node import Node  # noqa
+from .scheduler import Scheduler  # noqa
+from .sweep import Sweep  # noqa
+from .fleet import Fleet  # noqa
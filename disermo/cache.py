@@ -0,0 +1,147 @@
+"""
+Result caches, so checks which change slowly are not updated every sweep
+"""
+import json
+import os
+import threading
+import time
+from typing import (
+    TYPE_CHECKING, Any, Dict, Iterable, NamedTuple, Optional, Set,
+)
+
+from . import hooks
+from .constants import Status
+from .storage.files import atomic_write
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .checks import Check
+
+
+class CacheEntry(NamedTuple):
+    status: Status
+    data: Dict[str, Any]
+
+    # Time the result was produced, in seconds since the epoch
+    time: float
+
+
+class Cache:
+    """
+    In-memory result cache, keyed by ``Check.get_cache_key()``
+    """
+    entries: Dict[str, CacheEntry]
+    refreshing: Set[str]
+    lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.entries = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self.entries.get(key)
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self.lock:
+            self.entries[key] = entry
+
+    def flush(self) -> None:
+        """
+        Write out any results set since the last flush
+
+        Called once the checks of a sweep have been updated
+        """
+        pass
+
+    def refresh(self, check: 'Check') -> None:
+        """
+        Update a detached copy of a check in a background thread and cache
+        its result, unless it is already being refreshed
+        """
+        key: str = check.get_cache_key()
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        clone: Check = check.detached()
+
+        def refresh() -> None:
+            try:
+                with hooks.timed('check.update', check):
+                    clone.update()
+                self.set(key, CacheEntry(
+                    clone.status, dict(clone.data), time.time(),
+                ))
+                self.flush()
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=refresh).start()
+
+
+class FileCache(Cache):
+    """
+    Result cache stored in a JSON file, for runs in separate processes
+
+    Results are written to the file when the cache is flushed, once per
+    sweep. Check data must be JSON serialisable.
+    """
+    path: str
+    loaded: bool
+    changed: bool
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        self.loaded = False
+        self.changed = False
+
+    def load(self) -> None:
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as file:
+            self.entries = {
+                key: CacheEntry(Status(status), data, timestamp)
+                for key, (status, data, timestamp) in json.load(file).items()
+            }
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        if not self.loaded:
+            self.load()
+        return super().get(key)
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        if not self.loaded:
+            self.load()
+        with self.lock:
+            self.entries[key] = entry
+            self.changed = True
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self.changed:
+                return
+            with atomic_write(self.path) as file:
+                json.dump({
+                    key: [entry.status.value, entry.data, entry.time]
+                    for key, entry in self.entries.items()
+                }, file)
+            self.changed = False
+
+
+def flush_caches(checks: Iterable['Check']) -> None:
+    """
+    Flush the caches used by the given checks, once each
+    """
+    backends: Set[Cache] = {
+        check.get_cache() for check in checks if check.cache_ttl is not None
+    }
+    for backend in backends:
+        backend.flush()
+
+
+# Cache shared by all checks in the process which do not specify one
+shared = Cache()
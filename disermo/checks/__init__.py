@@ -1,4 +1,5 @@
 from .base import Check  # noqa
+from . import rates  # noqa
 from . import remote  # noqa
 from . import sensors  # noqa
 from . import storage  # noqa
@@ -2,15 +2,38 @@
 Checks
 """
 from __future__ import annotations
-from typing import List, Dict, Any, TypeVar
+import asyncio
+from concurrent.futures import Executor
+import copy
+import hashlib
+import inspect
+import logging
+import time
+from typing import (
+    TYPE_CHECKING, List, Dict, Any, Iterable, Iterator, Optional, Tuple,
+    Type, TypeVar,
+)
 
+from .. import hooks, procfs
+from ..cache import Cache, CacheEntry, shared as shared_cache
 from ..constants import Status
 from ..notifiers import Notifier
 from ..utils import camel_to_sentence
 
+if TYPE_CHECKING:  # pragma: no cover
+    from ..storage import Storage
+
+
+logger = logging.getLogger(__name__)
 
 T = TypeVar('T', bound='Check')
 
+# Status, data and elapsed seconds of a detached update
+Result = Tuple[Status, Dict[str, Any], float]
+
+# Signature of each check class's __init__, to bind constructor arguments
+_init_signatures: Dict[type, inspect.Signature] = {}
+
 
 class Check:
     uid: str
@@ -20,6 +43,37 @@ class Check:
     status: Status
     data: Dict[str, Any]
 
+    # Scheduling, in seconds; if no interval is set, it is inherited
+    interval: Optional[float] = None
+    jitter: float = 0
+
+    # Incremented whenever a subcheck is added to any check, so cached views
+    # of a tree know when they need to be rebuilt
+    tree_version: int = 0
+
+    # Whether this check keeps state in storage between runs, using
+    # ``load_state`` and ``save_state``
+    stateful: bool = False
+
+    # Result caching, in seconds; if no ttl is set, the check is not cached
+    cache_ttl: Optional[float] = None
+    cache_stale: bool = False
+    cache_backend: Optional[Cache] = None
+
+    # Fields of ``data`` which are bookkeeping rather than measurements, so
+    # are not recorded as time series
+    unrecorded_fields: Tuple[str, ...] = ('cache_age',)
+
+    # Positional and keyword arguments the check was constructed with, which
+    # describe its configuration
+    init_args: Tuple[Tuple[Any, ...], Dict[str, Any]]
+    _signature: Optional[Tuple[Any, ...]] = None
+
+    def __new__(cls: Type[T], *args: Any, **kwargs: Any) -> T:
+        check = super().__new__(cls)
+        check.init_args = (args, kwargs)
+        return check
+
     def __init__(self, label: str = None) -> None:
         if label is None:
             label = self.default_label
@@ -55,29 +109,337 @@ class Check:
 
     def add(self: T, *subchecks) -> T:
         self.subchecks.extend(subchecks)
+        Check.tree_version += 1
         return self
 
-    def run(self) -> Status:
+    def iter_tree(self) -> Iterator[Check]:
+        """
+        Generator to return this check and all of its subchecks, depth first
+        """
+        checks: List[Check] = [self]
+        while checks:
+            check = checks.pop()
+            checks.extend(reversed(check.subchecks))
+            yield check
+
+    def run(self, executor: Optional[Executor] = None) -> Status:
         """
         Run the check of this node, and of all its subchecks
 
         The resulting status is the worst status for this node and all subnodes
+
+        If an executor is given, every check in the tree is updated
+        concurrently on it, then statuses are collected once they have all
+        finished. The executor can be a thread or process pool.
+        """
+        with hooks.timed('check.run', self):
+            if executor is not None:
+                return self.run_concurrent(executor)
+
+            self.refresh()
+            worst: Status = self.status
+            for check in self.subchecks:
+                result: Status = check.run()
+                if result > worst:
+                    worst = result
+
+            # The status of this node is the worst found
+            self.status = worst
+            return worst
+
+    def run_concurrent(self, executor: Executor) -> Status:
+        """
+        Update all checks in the tree on the executor, then collect statuses
+
+        Each check's update is independent of its parent and children, so all
+        updates can be in flight at once; results are applied back to the
+        checks in tree order so the outcome matches a sequential run.
+        """
+        update_all(self.iter_tree(), executor)
+        return self.collect()
+
+    async def arun(self) -> Status:
+        """
+        Run the check of this node and of all its subchecks on the event loop
+
+        All checks in the tree are updated at the same time using ``aupdate``,
+        then statuses are collected in the same way as ``run``
+        """
+        await asyncio.gather(
+            *[check.arefresh() for check in self.iter_tree()]
+        )
+        return self.collect()
+
+    def collect(self) -> Status:
+        """
+        Set the status of this check to the worst status of its own update
+        and all of its subchecks, without updating anything
         """
-        self.update()
         worst: Status = self.status
         for check in self.subchecks:
-            result: Status = check.run()
+            result: Status = check.collect()
             if result > worst:
                 worst = result
-
-        # The status of this node is the worst found
         self.status = worst
         return worst
 
+    def detached(self: T) -> T:
+        """
+        Return a shallow copy of this check without subchecks or notifiers,
+        suitable for updating in a worker thread or process
+
+        Results are cached by the original in this process, so the copy has
+        no cache; cache backends hold locks and cannot be sent to a process
+        """
+        clone = copy.copy(self)
+        clone.subchecks = []
+        clone.notifiers = []
+        clone.data = {}
+        clone.cache_ttl = None
+        clone.cache_backend = None
+        return clone
+
     def update(self) -> None:
         self.status = Status.DISABLED
         self.data = {}
 
+    async def aupdate(self) -> None:
+        """
+        Update this check from within an event loop
+
+        By default this runs the blocking ``update`` in the loop's default
+        executor; checks which can perform their I/O natively using asyncio
+        should override this
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.update)
+
+    def load_state(self, storage: Storage) -> None:
+        """
+        Restore state kept in loaded storage, before this check is run
+
+        Only called for checks which are ``stateful``
+        """
+        pass
+
+    def save_state(self, storage: Storage) -> None:
+        """
+        Put state into storage after this check is run, ready to be saved
+
+        Updates may run on a detached copy in another process, so state to
+        keep should be taken from ``data`` rather than attributes set during
+        the update
+        """
+        pass
+
+    def fail(self, error: Exception) -> None:
+        """
+        Set an ERROR status for an exception raised by ``update``
+        """
+        self.status = Status.ERROR
+        self.data = {'error': f'Check failed: {error!r}'}
+
+    def refresh(self) -> None:
+        """
+        Update this check, unless it has a cached result which can be used
+        """
+        if not self.load_cached():
+            with hooks.timed('check.update', self):
+                self.update()
+            self.save_cached()
+
+    async def arefresh(self) -> None:
+        """
+        Update this check from within an event loop, unless it has a cached
+        result which can be used
+        """
+        if not self.load_cached():
+            with hooks.timed('check.update', self):
+                await self.aupdate()
+            self.save_cached()
+
+    def get_signature(self) -> Tuple[Any, ...]:
+        """
+        Return a hashable description of this check's configuration
+
+        This is made from the arguments the check was constructed with, with
+        defaults filled in and the label left out, so state set at runtime
+        is never included. Two checks with the same signature are expected
+        to give the same result when updated at the same time.
+        """
+        if self._signature is not None:
+            return self._signature
+
+        cls = type(self)
+        init: Optional[inspect.Signature] = _init_signatures.get(cls)
+        if init is None:
+            init = _init_signatures[cls] = inspect.signature(cls.__init__)
+        args, kwargs = self.init_args
+        bound = init.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+
+        config: List[Tuple[str, str]] = []
+        for name, value in list(bound.arguments.items())[1:]:
+            if name == 'label':
+                continue
+            if init.parameters[name].kind is inspect.Parameter.VAR_KEYWORD:
+                value = sorted(
+                    item for item in value.items() if item[0] != 'label'
+                )
+            config.append((name, repr(value)))
+        self._signature = (
+            f'{cls.__module__}.{cls.__qualname__}', *config,
+        )
+        return self._signature
+
+    def get_cache_key(self) -> str:
+        """
+        Return the key for this check in a result cache
+
+        The uid is shared by all checks of a class, so it is combined with a
+        hash of the configuration
+        """
+        digest: str = hashlib.sha1(
+            repr(self.get_signature()).encode('utf-8'),
+        ).hexdigest()
+        return f'{self.uid}:{digest}'
+
+    def get_cache(self) -> Cache:
+        if self.cache_backend is None:
+            return shared_cache
+        return self.cache_backend
+
+    def load_cached(self) -> bool:
+        """
+        Apply a cached result to this check, if there is one which is fresh
+        enough; return True if it was applied
+
+        If stale results are allowed, an expired result is applied and the
+        check is refreshed in the background for the next run
+        """
+        if self.cache_ttl is None:
+            return False
+
+        backend: Cache = self.get_cache()
+        entry: Optional[CacheEntry] = backend.get(self.get_cache_key())
+        if entry is None:
+            return False
+
+        age: float = max(time.time() - entry.time, 0)
+        if age < self.cache_ttl:
+            state = 'hit'
+        elif self.cache_stale:
+            state = 'stale'
+            backend.refresh(self)
+        else:
+            return False
+
+        self.status = entry.status
+        self.data = dict(entry.data, cache=state, cache_age=age)
+        return True
+
+    def save_cached(self) -> None:
+        """
+        Store the result of the last update in the cache
+        """
+        if self.cache_ttl is None:
+            return
+        self.get_cache().set(
+            self.get_cache_key(),
+            CacheEntry(self.status, dict(self.data), time.time()),
+        )
+        self.data['cache'] = 'miss'
+
+    def cache(
+        self: T,
+        ttl: float,
+        stale: bool = False,
+        backend: Cache = None,
+    ) -> T:
+        """
+        Reuse this check's result for ``ttl`` seconds instead of updating it
+
+        If ``stale`` is set, an expired result is still used while the check
+        is refreshed in the background. Results are kept in memory unless a
+        ``backend`` such as ``cache.FileCache`` is given.
+        """
+        self.cache_ttl = ttl
+        self.cache_stale = stale
+        self.cache_backend = backend
+        return self
+
+    def every(self: T, interval: float, jitter: float = 0) -> T:
+        """
+        Set how often this check should be run by a scheduler, in seconds
+
+        Each run will be delayed by a random amount up to ``jitter`` seconds,
+        to spread out load
+        """
+        self.interval = interval
+        self.jitter = jitter
+        return self
+
     def notify(self: T, *notifiers: Notifier) -> T:
         self.notifiers.extend(notifiers)
         return self
+
+
+def update_all(
+    checks: Iterable[Check],
+    executor: Executor,
+    catch: bool = False,
+) -> Dict[Check, float]:
+    """
+    Update checks concurrently on an executor, skipping any with a usable
+    cached result, and return the seconds each update took
+
+    Caches are consulted and filled in this process, so cached checks work
+    the same with thread and process pools. Updates are timed in the worker
+    and hooks are called in this process.
+
+    If ``catch`` is set, an exception raised by an update is logged and
+    given to the check's ``fail`` instead of being raised
+    """
+    pending: List[Check] = [
+        check for check in checks if not check.load_cached()
+    ]
+    futures = []
+    submitted: float = time.perf_counter()
+    sweep: Tuple[int, int] = procfs.shared.sweep
+    for check in pending:
+        hooks.pre('check.update', check)
+        futures.append(
+            executor.submit(update_detached, check.detached(), sweep),
+        )
+
+    timings: Dict[Check, float] = {}
+    for check, future in zip(pending, futures):
+        elapsed: float
+        try:
+            check.status, check.data, elapsed = future.result()
+        except Exception as e:
+            if not catch:
+                raise
+            logger.error(f'{check!r} update failed: {e!r}')
+            check.fail(e)
+            # The worker's own timing was lost with the exception
+            elapsed = time.perf_counter() - submitted
+        hooks.post('check.update', check, elapsed)
+        check.save_cached()
+        timings[check] = elapsed
+    return timings
+
+
+def update_detached(check: Check, sweep: Tuple[int, int] = None) -> Result:
+    """
+    Update a detached check and return its result
+
+    If a procfs sweep id is given, the procfs snapshot is reset if it does
+    not belong to that sweep. This is a module-level function so it can be
+    sent to a process pool.
+    """
+    if sweep is not None:
+        procfs.shared.join(sweep)
+    start: float = time.perf_counter()
+    check.update()
+    return check.status, check.data, time.perf_counter() - start
@@ -0,0 +1,284 @@
+"""
+Rate checks, from counters sampled on each run
+
+Each run reads the counters once and stores them in storage, so rates are
+calculated against the previous run rather than by sleeping between two
+reads. The first run, and the first run after a reboot or counter reset, only
+take a sample.
+"""
+from __future__ import annotations
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from .. import procfs
+from ..constants import Status
+from ..storage.base import Counter
+from .system import SystemCheck
+
+if TYPE_CHECKING:  # pragma: no cover
+    from ..storage import Storage
+
+
+WRAP_32 = 2 ** 32
+WRAP_64 = 2 ** 64
+
+# Boot times from /proc/stat can drift by a second between reads
+BOOT_TOLERANCE = 1
+
+# Size of the sectors counted in /proc/diskstats, whatever the device
+SECTOR_SIZE = 512
+
+# Highest plausible increase in a counter per second, used to tell a counter
+# which wrapped from one which was reset; this is about the packet rate of a
+# 100Gbit/s link
+DEFAULT_MAX_RATE = 1.5e8
+
+
+def delta(old: int, new: int, limit: float = None) -> Optional[int]:
+    """
+    Return the increase in a counter, or None if it went backwards because
+    it was reset
+
+    A counter which went backwards is only taken to have wrapped at 32 or 64
+    bits if the increase that implies is no more than ``limit``
+    """
+    if new >= old:
+        return new - old
+    if limit is None:
+        return None
+    wrap: int = WRAP_32 if old < WRAP_32 else WRAP_64
+    wrapped: int = new + wrap - old
+    if wrapped > limit:
+        return None
+    return wrapped
+
+
+class RateCheck(SystemCheck):
+    """
+    Base for checks which report rates of change of counters
+
+    Subclasses implement ``read`` to return the raw counters, and can
+    override ``get_rates`` to derive rates from the increase in each counter.
+    If ``warning`` or ``error`` is set, the status is found by comparing the
+    rate named by ``metric`` to them.
+
+    If a counter has gone backwards, it is taken to have wrapped only if the
+    increase is plausible for the time elapsed, given ``max_rates``, and no
+    counter has gone past 32 bits; otherwise the counters were reset, and the
+    run only takes a sample.
+    """
+    stateful = True
+    unrecorded_fields = SystemCheck.unrecorded_fields + (
+        'time', 'boot', 'interval',
+    )
+
+    # Rates which can be used as the metric, and the default
+    metrics: Tuple[str, ...] = ()
+    default_metric: str = ''
+
+    # Highest plausible increase per second of each counter, if not the
+    # default
+    max_rates: Dict[str, float] = {}
+
+    metric: str
+    warning: Optional[float]
+    error: Optional[float]
+    previous: Optional[Counter] = None
+
+    def __init__(
+        self,
+        label: str = None,
+        metric: str = None,
+        warning: float = None,
+        error: float = None,
+    ) -> None:
+        if metric is None:
+            metric = self.default_metric
+        if metric not in self.metrics:
+            raise ValueError(f'Unknown metric {metric}')
+        super().__init__(label)
+        self.metric = metric
+        self.warning = warning
+        self.error = error
+
+    def read(self, snapshot: procfs.Snapshot) -> Dict[str, int]:
+        raise NotImplementedError()  # pragma: no cover
+
+    def get_rates(
+        self, deltas: Dict[str, int], elapsed: float,
+    ) -> Dict[str, float]:
+        return {
+            f'{name}_per_second': value / elapsed
+            for name, value in deltas.items()
+        }
+
+    def load_state(self, storage: Storage) -> None:
+        self.previous = storage.get_counter(self.uid)
+
+    def save_state(self, storage: Storage) -> None:
+        values: Optional[Dict[str, int]] = self.data.get('counters')
+        if values is not None:
+            storage.set_counter(
+                self.uid,
+                Counter(values, self.data['time'], self.data['boot']),
+            )
+
+    def get_deltas(
+        self,
+        old: Dict[str, int],
+        new: Dict[str, int],
+        elapsed: float,
+    ) -> Optional[Dict[str, int]]:
+        """
+        Return the increase in each counter, or None if they were reset
+        """
+        # Counters past 32 bits are 64 bit and will not wrap, so going
+        # backwards means a reset
+        wide: bool = any(
+            value >= WRAP_32
+            for values in (old, new) for value in values.values()
+        )
+        deltas: Dict[str, int] = {}
+        for name, value in new.items():
+            if name not in old:
+                continue
+            limit: Optional[float] = None
+            if not wide:
+                limit = self.max_rates.get(name, DEFAULT_MAX_RATE) * elapsed
+            increase: Optional[int] = delta(old[name], value, limit)
+            if increase is None:
+                return None
+            deltas[name] = increase
+        return deltas
+
+    def is_reset(self, previous: Counter, now: float, boot: float) -> bool:
+        """
+        Whether the counters have been reset since the previous sample
+        """
+        return (
+            abs(previous.boot - boot) > BOOT_TOLERANCE or
+            now <= previous.time
+        )
+
+    def evaluate(self, snapshot: procfs.Snapshot) -> None:
+        values: Dict[str, int] = self.read(snapshot)
+        now: float = time.time()
+        boot: float = snapshot.stat().btime
+        self.data = {
+            'counters': values,
+            'time': now,
+            'boot': boot,
+        }
+        self.status = Status.OK
+
+        previous: Optional[Counter] = self.previous
+        if previous is None:
+            return
+        if self.is_reset(previous, now, boot):
+            self.data['reset'] = True
+            return
+
+        elapsed: float = now - previous.time
+        deltas: Optional[Dict[str, int]] = self.get_deltas(
+            previous.values, values, elapsed,
+        )
+        if deltas is None:
+            self.data['reset'] = True
+            return
+        rates: Dict[str, float] = self.get_rates(deltas, elapsed)
+        self.data.update(rates)
+        self.data['interval'] = elapsed
+
+        rate: Optional[float] = rates.get(self.metric)
+        if rate is None:
+            return
+        if self.error is not None and rate > self.error:
+            self.status = Status.ERROR
+        elif self.warning is not None and rate > self.warning:
+            self.status = Status.WARN
+
+
+class DiskIO(RateCheck):
+    """
+    Operations, throughput and utilisation of a block device, from
+    ``/proc/diskstats``
+
+    Utilisation is the fraction of time the device was busy
+    """
+    metrics = (
+        'reads_per_second', 'writes_per_second', 'iops',
+        'read_bytes_per_second', 'write_bytes_per_second', 'utilisation',
+    )
+    default_metric = 'utilisation'
+
+    # Operations and sectors of a fast NVMe device; milliseconds spent doing
+    # IO cannot grow faster than time passes
+    max_rates = {
+        'reads': 1e7, 'writes': 1e7,
+        'sectors_read': 2e7, 'sectors_written': 2e7,
+        'io_ms': 1000,
+    }
+
+    device: str
+
+    def __init__(self, device: str, label: str = None, **kwargs) -> None:
+        self.device = device
+        super().__init__(label=label or f'Disk IO {device}', **kwargs)
+
+    def get_uid(self) -> str:
+        return f'{self.class_id}:{self.device}'
+
+    def read(self, snapshot: procfs.Snapshot) -> Dict[str, int]:
+        stats: Dict[str, int] = snapshot.diskstats()[self.device]
+        return {
+            name: stats[name]
+            for name in (
+                'reads', 'writes', 'sectors_read', 'sectors_written', 'io_ms',
+            )
+        }
+
+    def get_rates(
+        self, deltas: Dict[str, int], elapsed: float,
+    ) -> Dict[str, float]:
+        reads: float = deltas['reads'] / elapsed
+        writes: float = deltas['writes'] / elapsed
+        return {
+            'reads_per_second': reads,
+            'writes_per_second': writes,
+            'iops': reads + writes,
+            'read_bytes_per_second': (
+                deltas['sectors_read'] * SECTOR_SIZE / elapsed
+            ),
+            'write_bytes_per_second': (
+                deltas['sectors_written'] * SECTOR_SIZE / elapsed
+            ),
+            'utilisation': min(deltas['io_ms'] / (elapsed * 1000), 1.0),
+        }
+
+
+class NetworkIO(RateCheck):
+    """
+    Traffic, errors and drops on a network interface, from ``/proc/net/dev``
+    """
+    COUNTERS = (
+        'rx_bytes', 'rx_packets', 'rx_errors', 'rx_dropped',
+        'tx_bytes', 'tx_packets', 'tx_errors', 'tx_dropped',
+    )
+    metrics = tuple(f'{name}_per_second' for name in COUNTERS)
+    default_metric = 'rx_bytes_per_second'
+
+    # Bytes at up to 100Gbit/s
+    max_rates = {'rx_bytes': 1.25e10, 'tx_bytes': 1.25e10}
+
+    interface: str
+
+    def __init__(self, interface: str, label: str = None, **kwargs) -> None:
+        self.interface = interface
+        super().__init__(label=label or f'Network IO {interface}', **kwargs)
+
+    def get_uid(self) -> str:
+        return f'{self.class_id}:{self.interface}'
+
+    def read(self, snapshot: procfs.Snapshot) -> Dict[str, int]:
+        stats: Dict[str, int] = snapshot.net_dev()[self.interface]
+        return {name: stats[name] for name in self.COUNTERS}
@@ -1,14 +1,16 @@
 """
 Checks which perform remote requests
 """
+import asyncio
 from dataclasses import dataclass, field
-from http.client import HTTPResponse
-import socket
-from typing import cast, Union
-from urllib.request import urlopen
-from urllib.error import HTTPError, URLError
+from email.message import Message
+from http.client import HTTPConnection, HTTPResponse, RemoteDisconnected
+import sys
+from typing import cast, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import urljoin, urlsplit
 
 from ..constants import Status
+from ..pool import ConnectionPool, PoolKey, shared as shared_pool
 from ..utils import Timer
 from .base import Check
 
@@ -20,31 +22,154 @@ DEFAULT_TIMEOUT = 10
 # This should be outside the standard HTTP error codes, so it is differentiated
 STATUS_FAILED = 0
 
+# Ports which are left out of the Host header, matching http.client
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Redirects which are followed, matching urllib
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 10
+
+# User agent sent with requests, matching urllib
+USER_AGENT = f'Python-urllib/{sys.version_info[0]}.{sys.version_info[1]}'
+
+# Size of each read when searching response content, in bytes
+CHUNK_SIZE = 64 * 1024
+
+# Charset used when the response does not declare one
+DEFAULT_CHARSET = 'utf-8'
+
+
+class ContentMatcher:
+    """
+    Incrementally search response content for a string
+
+    The needle is encoded using the response charset and searched for in the
+    raw bytes, keeping enough of the previous chunk to find a needle which is
+    split across two chunks. Searching stops once the needle is found or
+    ``max_bytes`` have been read.
+    """
+    needle: bytes
+    max_bytes: Optional[int]
+    read: int
+    found: bool
+    tail: bytes
+
+    def __init__(
+        self,
+        needle: str,
+        charset: str = None,
+        max_bytes: int = None,
+    ) -> None:
+        try:
+            self.needle = needle.encode(charset or DEFAULT_CHARSET)
+        except LookupError:
+            self.needle = needle.encode(DEFAULT_CHARSET)
+        self.max_bytes = max_bytes
+        self.read = 0
+        self.found = False
+        self.tail = b''
+
+    @property
+    def done(self) -> bool:
+        return self.found or (
+            self.max_bytes is not None and self.read >= self.max_bytes
+        )
+
+    def get_chunk_size(self) -> int:
+        """
+        Size of the next read, so no more than max_bytes are read
+        """
+        if self.max_bytes is None:
+            return CHUNK_SIZE
+        return max(0, min(CHUNK_SIZE, self.max_bytes - self.read))
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Search the next chunk of content
+
+        Returns True if no more content needs to be read
+        """
+        if self.max_bytes is not None:
+            chunk = chunk[:self.max_bytes - self.read]
+        self.read += len(chunk)
+        buffer: bytes = self.tail + chunk
+        if self.needle in buffer:
+            self.found = True
+        else:
+            keep: int = len(self.needle) - 1
+            self.tail = buffer[-keep:] if keep else b''
+        return self.done
+
+
+def get_charset(content_type: Optional[str]) -> Optional[str]:
+    """
+    Return the charset declared in a Content-Type header value, if any
+    """
+    if not content_type:
+        return None
+    message = Message()
+    message['Content-Type'] = content_type
+    return message.get_content_charset()
+
 
 @dataclass
 class Response:
     """
-    Wrapper for an urllib Response
+    Wrapper for an http.client response, with the pooled connection it was
+    received on
     """
-    raw: Union[HTTPResponse, HTTPError]
-    _content: str = field(init=False, repr=False)
+    raw: HTTPResponse
+    key: PoolKey
+    conn: HTTPConnection
+    _content: Optional[str] = field(default=None, init=False, repr=False)
 
     @property
     def code(self):
-        return self.raw.code
+        return self.raw.status
+
+    @property
+    def charset(self) -> Optional[str]:
+        return get_charset(self.raw.getheader('Content-Type'))
 
     @property
     def content(self):
         if self._content is None:
-            self._content = self.raw.read().decode('utf-8')
+            self._content = self.raw.read().decode(
+                self.charset or DEFAULT_CHARSET,
+            )
         return self._content
 
+    def contains(self, needle: str, max_bytes: int = None) -> bool:
+        """
+        Search the content for a string, reading no more than is needed
+        """
+        if self._content is not None:
+            return needle in self._content
+
+        matcher = ContentMatcher(needle, self.charset, max_bytes)
+        while not matcher.done:
+            chunk: bytes = self.raw.read(matcher.get_chunk_size())
+            if not chunk:
+                break
+            matcher.feed(chunk)
+        return matcher.found
+
 
 class Web(Check):
+    """
+    Check a URL returns the expected status code, and optionally content
+
+    ``update`` sends HTTP/1.1 requests on keep-alive connections from a
+    ``ConnectionPool``. ``aupdate`` opens a new connection for each request
+    and asks the server to close it, so connections are not reused when
+    checks run on an event loop.
+    """
     url: str
     timeout: float
     status_code: int = 200
     content_contains: Union[str, None]
+    max_content_bytes: Optional[int]
+    pool: Optional[ConnectionPool]
 
     def __init__(
         self,
@@ -53,71 +178,279 @@ class Web(Check):
         timeout: float = DEFAULT_TIMEOUT,
         status_code: int = 200,
         content_contains: str = None,
+        max_content_bytes: int = None,
+        pool: ConnectionPool = None,
     ):
         super().__init__(label)
         self.url = url
         self.timeout = timeout
         self.status_code = status_code
         self.content_contains = content_contains
+        self.max_content_bytes = max_content_bytes
+        self.pool = pool
+
+    def get_pool(self) -> ConnectionPool:
+        """
+        Return the connection pool for this check, defaulting to the pool
+        shared by all checks in the process
+        """
+        if self.pool is None:
+            return shared_pool
+        return self.pool
 
     def update(self) -> None:
         # Clean data, assuming we're going to fail
         self.data = {
             'status': STATUS_FAILED,
+            'elapsed_connect': 0.0,
+            'elapsed_request': 0.0,
         }
 
         # Make the request
         timer = Timer()
         try:
-            raw_response: HTTPResponse = cast(
-                HTTPResponse,
-                urlopen(
-                    self.url,
-                    timeout=self.timeout,
-                ),
-            )
+            response: Response = self.request()
+
+        except Exception as e:
+            # Unable to connect - most likely a socket error or timeout
+            self.status = Status.ERROR
+            self.data['error'] = f'Could not reach server: {e}'
+            return
+
+        finally:
+            # All checks log their elapsed time
+            self.data['elapsed'] = timer.elapsed()
 
-        except HTTPError as e_response:
-            # HTTP error - should be expected, analyse below
-            response = Response(raw=e_response)
+        try:
+            self.evaluate(response.code, lambda: response.contains(
+                cast(str, self.content_contains), self.max_content_bytes,
+            ))
+        finally:
+            self.get_pool().release(response.key, response.conn, response.raw)
+
+    def request(self) -> Response:
+        """
+        Perform a GET request using a pooled connection, following redirects
+        """
+        url: str = self.url
+        for redirects in range(MAX_REDIRECTS + 1):
+            key, path = split_url(url)
+            conn, raw = self.send(key, path)
+            location = raw.getheader('location')
+            if (
+                raw.status in REDIRECT_CODES and location and
+                redirects < MAX_REDIRECTS
+            ):
+                self.get_pool().release(key, conn, raw)
+                url = urljoin(url, location)
+                continue
+            break
+        return Response(raw=raw, key=key, conn=conn)
+
+    def send(
+        self,
+        key: PoolKey,
+        path: str,
+    ) -> Tuple[HTTPConnection, HTTPResponse]:
+        """
+        Send a request on a pooled connection and return the response
+
+        Connect and request times are added to the check data separately. If
+        a reused connection has been closed by the server, the request is
+        retried on a new connection.
+        """
+        pool: ConnectionPool = self.get_pool()
+        while True:
+            conn, reused = pool.acquire(key, timeout=self.timeout)
+            try:
+                if not reused:
+                    timer = Timer()
+                    conn.connect()
+                    self.data['elapsed_connect'] += timer.elapsed()
+
+                timer = Timer()
+                conn.request('GET', path, headers={'User-Agent': USER_AGENT})
+                raw: HTTPResponse = conn.getresponse()
+                self.data['elapsed_request'] += timer.elapsed()
+                return conn, raw
+
+            except (RemoteDisconnected, ConnectionError):
+                conn.close()
+                if not reused:
+                    raise
+
+            except Exception:
+                conn.close()
+                raise
+
+    async def aupdate(self) -> None:
+        """
+        Make the request using asyncio streams, so many web checks can share
+        a single event loop
+        """
+        self.data = {
+            'status': STATUS_FAILED,
+            'elapsed_connect': 0.0,
+            'elapsed_request': 0.0,
+        }
+
+        timer = Timer()
+        try:
+            code, found = await asyncio.wait_for(
+                self.fetch(), timeout=self.timeout,
+            )
 
-        except URLError as e:
-            # Unable to connect - not expected, raise immediately
+        except asyncio.TimeoutError:
             self.status = Status.ERROR
-            self.data['error'] = f'Could not reach server: {e.reason}'
+            self.data['error'] = 'Could not reach server: timed out'
             return
 
         except Exception as e:
-            # Most likely here is socket.timeout for HTTPS
             self.status = Status.ERROR
             self.data['error'] = f'Could not reach server: {e}'
             return
 
-        else:
-            # Successful request
-            response = Response(raw=raw_response)
-
         finally:
-            # All checks log their elapsed time
             self.data['elapsed'] = timer.elapsed()
 
+        self.evaluate(code, lambda: found)
+
+    async def fetch(self) -> Tuple[int, bool]:
+        """
+        Perform a GET request using asyncio streams, following redirects
+
+        Returns the status code and whether the expected content was found;
+        the content is only read if it will be needed to evaluate the response.
+        Connect and request times are added to the check data separately.
+        """
+        url: str = self.url
+        code: int = STATUS_FAILED
+        for _ in range(MAX_REDIRECTS + 1):
+            key, path = split_url(url)
+            scheme, host, port = key
+            timer = Timer()
+            reader, writer = await asyncio.open_connection(
+                host,
+                port,
+                ssl=(
+                    self.get_pool().ssl_context if scheme == 'https'
+                    else None
+                ),
+            )
+            self.data['elapsed_connect'] += timer.elapsed()
+            try:
+                timer = Timer()
+                writer.write((
+                    f'GET {path} HTTP/1.0\r\n'
+                    f'Host: {get_host_header(key)}\r\n'
+                    f'User-Agent: {USER_AGENT}\r\n'
+                    f'Connection: close\r\n'
+                    f'\r\n'
+                ).encode('latin-1'))
+                await writer.drain()
+
+                code, headers = await read_head(reader)
+                self.data['elapsed_request'] += timer.elapsed()
+                if code in REDIRECT_CODES and 'location' in headers:
+                    url = urljoin(url, headers['location'])
+                    continue
+
+                if not self.content_contains or code != self.status_code:
+                    return code, False
+
+                matcher = ContentMatcher(
+                    self.content_contains,
+                    get_charset(headers.get('content-type')),
+                    self.max_content_bytes,
+                )
+                while not matcher.done:
+                    chunk: bytes = await reader.read(
+                        matcher.get_chunk_size(),
+                    )
+                    if not chunk:
+                        break
+                    matcher.feed(chunk)
+                return code, matcher.found
+
+            finally:
+                writer.close()
+
+        # Too many redirects; report the last redirect
+        return code, False
+
+    def evaluate(self, code: int, contains: Callable[[], bool]) -> None:
+        """
+        Set the status of this check from a response status code and a
+        callable which searches the response for the expected content
+        """
         # Update status code to that returned by server
-        self.data['status'] = response.code
+        self.data['status'] = code
 
-        if response.code != self.status_code:
+        if code != self.status_code:
             self.status = Status.ERROR
             self.data['error'] = (
                 f'Expected status {self.status_code}, '
-                f'instead found {response.code}.'
+                f'instead found {code}.'
             )
             return
 
         if (
             self.content_contains and
-            self.content_contains not in response.content
+            not contains()
         ):
             self.status = Status.ERROR
             self.data['error'] = 'Expected content not found'
             return
 
         self.status = Status.OK
+
+
+def split_url(url: str) -> Tuple[PoolKey, str]:
+    """
+    Split a URL into its connection pool key and request path
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError(f'unknown url type: {parts.scheme}')
+    port: int = parts.port or (443 if parts.scheme == 'https' else 80)
+    path: str = parts.path or '/'
+    if parts.query:
+        path = f'{path}?{parts.query}'
+    return (parts.scheme, parts.hostname or '', port), path
+
+
+def get_host_header(key: PoolKey) -> str:
+    """
+    Return the Host header for a pool key, with IPv6 addresses in brackets
+    and default ports left out, matching http.client
+    """
+    scheme, host, port = key
+    if ':' in host:
+        host = f'[{host}]'
+    if port == DEFAULT_PORTS[scheme]:
+        return host
+    return f'{host}:{port}'
+
+
+async def read_head(
+    reader: asyncio.StreamReader,
+) -> Tuple[int, Dict[str, str]]:
+    """
+    Read the status line and headers of an HTTP response
+
+    Header names are lowercased
+    """
+    status_line: bytes = await reader.readline()
+    try:
+        code = int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise ValueError(f'Invalid status line: {status_line!r}')
+
+    headers: Dict[str, str] = {}
+    while True:
+        line: bytes = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return code, headers
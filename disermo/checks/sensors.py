@@ -1,5 +1,185 @@
+"""
+Sensor checks, read from sysfs
+"""
+from __future__ import annotations
+from collections import Counter
+import glob
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from ..constants import Status
 from .base import Check
 
 
+SYSFS_ROOT = '/sys/class'
+
+# hwmon drivers which report CPU temperatures
+CPU_HWMON_NAMES = ('coretemp', 'k10temp', 'zenpower', 'cpu_thermal')
+
+# Thermal zone types which report CPU temperatures, used if there are no
+# hwmon CPU sensors
+CPU_THERMAL_TYPES = re.compile(r'x86_pkg_temp|cpu|soc', re.IGNORECASE)
+
+# Degrees C
+DEFAULT_TEMPERATURE_WARNING = 80.0
+DEFAULT_TEMPERATURE_ERROR = 95.0
+
+
+class Sensor(NamedTuple):
+    label: str
+
+    # File with the temperature in millidegrees C
+    path: str
+
+
+def read_text(path: str) -> Optional[str]:
+    try:
+        with open(path) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def natural_key(path: str) -> List[object]:
+    return [
+        int(part) if part.isdigit() else part
+        for part in re.split(r'(\d+)', path)
+    ]
+
+
+def discover_hwmon(root: str) -> List[Sensor]:
+    """
+    Find CPU sensors in hwmon devices
+
+    Labels which appear on more than one device, such as ``Core 0`` on each
+    socket of a multi-socket host, are qualified with the device directory
+    """
+    sensors: List[Tuple[str, Sensor]] = []
+    devices: List[str] = sorted(
+        glob.glob(os.path.join(root, 'hwmon', 'hwmon*')), key=natural_key,
+    )
+    for device in devices:
+        name: Optional[str] = read_text(os.path.join(device, 'name'))
+        if name not in CPU_HWMON_NAMES:
+            continue
+        inputs: List[str] = sorted(
+            glob.glob(os.path.join(device, 'temp*_input')), key=natural_key,
+        )
+        for path in inputs:
+            prefix: str = path[:-len('_input')]
+            label: Optional[str] = read_text(f'{prefix}_label')
+            if not label:
+                label = f'{name} {os.path.basename(prefix)}'
+            sensors.append((os.path.basename(device), Sensor(label, path)))
+
+    counts: Counter[str] = Counter(sensor.label for _, sensor in sensors)
+    return [
+        sensor._replace(label=f'{sensor.label} ({device})')
+        if counts[sensor.label] > 1 else sensor
+        for device, sensor in sensors
+    ]
+
+
+def discover_thermal(root: str) -> List[Sensor]:
+    sensors: List[Sensor] = []
+    zones: List[str] = sorted(
+        glob.glob(os.path.join(root, 'thermal', 'thermal_zone*')),
+        key=natural_key,
+    )
+    for zone in zones:
+        zone_type: Optional[str] = read_text(os.path.join(zone, 'type'))
+        if zone_type and CPU_THERMAL_TYPES.search(zone_type):
+            sensors.append(Sensor(
+                f'{zone_type} {os.path.basename(zone)}',
+                os.path.join(zone, 'temp'),
+            ))
+    return sensors
+
+
+def discover(root: str = SYSFS_ROOT) -> List[Sensor]:
+    """
+    Find CPU temperature sensors, from hwmon or else thermal zones
+    """
+    return discover_hwmon(root) or discover_thermal(root)
+
+
+# Sensors found for each sysfs root, so discovery runs once per process
+discovered: Dict[str, List[Sensor]] = {}
+discovered_lock = threading.Lock()
+
+
+def get_sensors(root: str = SYSFS_ROOT) -> List[Sensor]:
+    with discovered_lock:
+        if root not in discovered:
+            discovered[root] = discover(root)
+        return discovered[root]
+
+
+def forget_sensors(root: str = None) -> None:
+    """
+    Discard discovered sensors for a root, or for all roots, so they are
+    discovered again when next used
+    """
+    with discovered_lock:
+        if root is None:
+            discovered.clear()
+        else:
+            discovered.pop(root, None)
+
+
 class CPUTemperature(Check):
-    pass
+    """
+    Highest CPU temperature, in degrees C
+
+    Sensors are discovered on the first update and reused for the life of the
+    process; if a sensor can no longer be read they are discovered again on
+    the next update. Hosts without CPU sensors are disabled.
+    """
+    warning: float
+    error: float
+    root: str
+
+    def __init__(
+        self,
+        label: str = None,
+        warning: float = DEFAULT_TEMPERATURE_WARNING,
+        error: float = DEFAULT_TEMPERATURE_ERROR,
+        root: str = SYSFS_ROOT,
+    ) -> None:
+        super().__init__(label)
+        self.warning = warning
+        self.error = error
+        self.root = root
+
+    def update(self) -> None:
+        self.data = {}
+        sensors: List[Sensor] = get_sensors(self.root)
+        if not sensors:
+            self.status = Status.DISABLED
+            self.data['error'] = 'No CPU temperature sensors found'
+            return
+
+        temperatures: Dict[str, float] = {}
+        try:
+            for sensor in sensors:
+                with open(sensor.path) as file:
+                    temperatures[sensor.label] = int(file.read()) / 1000
+        except (OSError, ValueError) as e:
+            forget_sensors(self.root)
+            self.status = Status.ERROR
+            self.data['error'] = f'Could not read sensor: {e}'
+            return
+
+        highest: float = max(temperatures.values())
+        self.data = {
+            'temperatures': temperatures,
+            'max': highest,
+        }
+        if highest > self.error:
+            self.status = Status.ERROR
+        elif highest > self.warning:
+            self.status = Status.WARN
+        else:
+            self.status = Status.OK
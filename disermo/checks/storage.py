@@ -3,7 +3,9 @@ Storage checks
 """
 from __future__ import annotations
 import os
+from typing import Any, Dict, List, Optional, Set
 
+from .. import procfs
 from ..constants import Status
 from .base import Check
 
@@ -11,11 +13,39 @@ from .base import Check
 DEFAULT_WARNING = 0.1
 DEFAULT_ERROR = 0.05
 
+# Filesystems which do not hold data, or are always full, skipped by Mounts
+PSEUDO_FSTYPES = {
+    'autofs', 'binfmt_misc', 'bpf', 'cgroup', 'cgroup2', 'configfs',
+    'debugfs', 'devpts', 'devtmpfs', 'efivarfs', 'fusectl', 'hugetlbfs',
+    'mqueue', 'nsfs', 'proc', 'pstore', 'ramfs', 'rpc_pipefs', 'securityfs',
+    'squashfs', 'sysfs', 'tmpfs', 'tracefs',
+}
+
+
+def get_status(fraction_free: float, warning: float, error: float) -> Status:
+    if fraction_free < error:
+        return Status.ERROR
+    elif fraction_free < warning:
+        return Status.WARN
+    return Status.OK
+
 
 class FreeSpace(Check):
+    """
+    Fraction of space and inodes free on the filesystem holding ``drive``,
+    which is any path on that filesystem
+
+    Filesystems which do not report an inode count are only checked for space.
+    If ``mount_point`` is set, ``drive`` must be a mount point; if it is no
+    longer mounted the check is disabled, rather than reporting the
+    filesystem underneath it.
+    """
     drive: str
     warning: float
     error: float
+    inode_warning: float
+    inode_error: float
+    mount_point: bool
 
     def __init__(
         self,
@@ -23,27 +53,152 @@ class FreeSpace(Check):
         label: str = None,
         warning: float = DEFAULT_WARNING,
         error: float = DEFAULT_ERROR,
+        inode_warning: float = DEFAULT_WARNING,
+        inode_error: float = DEFAULT_ERROR,
+        mount_point: bool = False,
     ) -> None:
         super().__init__(label)
         self.drive = drive
         self.warning = warning
         self.error = error
+        self.inode_warning = inode_warning
+        self.inode_error = inode_error
+        self.mount_point = mount_point
 
     def update(self) -> None:
-        data = os.statvfs(self.drive)
+        try:
+            if self.mount_point and not self.is_mounted():
+                self.status = Status.DISABLED
+                self.data = {'error': f'{self.drive} is not mounted'}
+                return
+            data = os.statvfs(self.drive)
+        except OSError as e:
+            self.status = Status.ERROR
+            self.data = {'error': f'Could not read filesystem: {e}'}
+            return
+
         total_bytes = data.f_frsize * data.f_blocks
         # free_bytes = data.f_frsize * data.f_bfree
         allowed_bytes = data.f_frsize * data.f_bavail
-        percent_free = allowed_bytes / total_bytes
+        percent_free = allowed_bytes / total_bytes if total_bytes else 1
 
         self.data = {
             'total': total_bytes,
             'free': allowed_bytes,
         }
+        self.status = get_status(percent_free, self.warning, self.error)
+
+        if data.f_files:
+            self.data['inodes_total'] = data.f_files
+            self.data['inodes_free'] = data.f_favail
+            inode_status: Status = get_status(
+                data.f_favail / data.f_files,
+                self.inode_warning,
+                self.inode_error,
+            )
+            if inode_status > self.status:
+                self.status = inode_status
+
+    def is_mounted(self) -> bool:
+        return any(
+            mount.mount_point == self.drive
+            for mount in procfs.shared.mountinfo()
+        )
+
+
+class Mounts(Check):
+    """
+    Check free space and inodes on every mounted filesystem
+
+    Mounts are read from ``/proc/self/mountinfo`` when the check is created,
+    and each filesystem gets one ``FreeSpace`` subcheck, however many times
+    it is mounted. Thresholds for a mount point can be set in ``overrides``,
+    eg ``{'/var': {'warning': 0.2}}``. This check's own update reports an
+    error if a monitored mount point is no longer mounted, and its subcheck
+    is disabled; call ``discover()`` to pick up mounts added since.
+    """
+    fstypes: Optional[Set[str]]
+    exclude_fstypes: Set[str]
+    thresholds: Dict[str, float]
+    overrides: Dict[str, Dict[str, float]]
+    mounts: Dict[str, FreeSpace]
+
+    def __init__(
+        self,
+        label: str = None,
+        fstypes: Set[str] = None,
+        exclude_fstypes: Set[str] = PSEUDO_FSTYPES,
+        overrides: Dict[str, Dict[str, float]] = None,
+        **thresholds: float,
+    ) -> None:
+        super().__init__(label)
+        self.fstypes = fstypes
+        self.exclude_fstypes = exclude_fstypes
+        self.overrides = overrides or {}
+        self.thresholds = thresholds
+        self.mounts = {}
+        try:
+            self.discover()
+        except OSError:
+            # Reported when updated
+            pass
+
+    def select(self, mounts: List[procfs.Mount]) -> List[procfs.Mount]:
+        """
+        Return one mount for each filesystem to check
+
+        A mount of the filesystem root is preferred over bind mounts of a
+        subdirectory
+        """
+        devices: Dict[str, procfs.Mount] = {}
+        for mount in mounts:
+            if self.fstypes is not None:
+                if mount.fstype not in self.fstypes:
+                    continue
+            elif mount.fstype in self.exclude_fstypes:
+                continue
+            known: Optional[procfs.Mount] = devices.get(mount.device)
+            if known is None or (known.root != '/' and mount.root == '/'):
+                devices[mount.device] = mount
+        return list(devices.values())
+
+    def discover(self) -> None:
+        """
+        Add a subcheck for each filesystem which is not already checked
+        """
+        checked: Set[str] = {
+            check.drive for check in self.subchecks
+            if isinstance(check, FreeSpace)
+        }
+        for mount in self.select(procfs.shared.mountinfo()):
+            if mount.mount_point in checked:
+                continue
+            options: Dict[str, Any] = dict(self.thresholds)
+            options.update(self.overrides.get(mount.mount_point, {}))
+            check = FreeSpace(
+                mount.mount_point, label=mount.mount_point, mount_point=True,
+                **options,
+            )
+
+            # Keep a separate history for each filesystem
+            check.uid = f'{check.uid}:{mount.mount_point}'
+            self.mounts[mount.mount_point] = check
+            self.add(check)
+
+    def update(self) -> None:
+        try:
+            mounted: Set[str] = {
+                mount.mount_point for mount in procfs.shared.mountinfo()
+            }
+        except OSError as e:
+            self.status = Status.ERROR
+            self.data = {'error': f'Could not read mounts: {e}'}
+            return
 
-        if percent_free < self.error:
+        missing: List[str] = sorted(set(self.mounts) - mounted)
+        self.data = {'filesystems': len(self.mounts)}
+        if missing:
             self.status = Status.ERROR
-        elif percent_free < self.warning:
-            self.status = Status.WARN
+            self.data['missing'] = missing
         else:
             self.status = Status.OK
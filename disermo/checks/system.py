@@ -1,5 +1,197 @@
+"""
+System checks, read from procfs
+"""
+from __future__ import annotations
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from .. import procfs
+from ..constants import Status
+from ..storage.base import Counter
 from .base import Check
 
+if TYPE_CHECKING:  # pragma: no cover
+    from ..storage import Storage
+
+
+# Load per CPU
+DEFAULT_LOAD_WARNING = 1.0
+DEFAULT_LOAD_ERROR = 2.0
+DEFAULT_LOAD_PERIOD = 5
+
+# Fraction of memory available
+DEFAULT_MEMORY_WARNING = 0.1
+DEFAULT_MEMORY_ERROR = 0.05
+
+# Fraction of swap free
+DEFAULT_SWAP_WARNING = 0.5
+DEFAULT_SWAP_ERROR = 0.25
+
+
+class SystemCheck(Check):
+    """
+    Base for checks which read from the shared procfs snapshot
+
+    Subclasses implement ``evaluate`` to set the status and data; if procfs
+    cannot be read, the status is set to error
+    """
+    def update(self) -> None:
+        self.data = {}
+        try:
+            self.evaluate(procfs.shared)
+        except (OSError, ValueError, KeyError) as e:
+            self.status = Status.ERROR
+            self.data['error'] = f'Could not read procfs: {e}'
+
+    def evaluate(self, snapshot: procfs.Snapshot) -> None:
+        raise NotImplementedError()  # pragma: no cover
+
+    def set_threshold_status(
+        self, value: float, warning: float, error: float, low: bool = False,
+    ) -> None:
+        """
+        Set the status by comparing a value to thresholds; if ``low`` is set,
+        lower values are worse
+        """
+        if low:
+            value, warning, error = -value, -warning, -error
+        if value > error:
+            self.status = Status.ERROR
+        elif value > warning:
+            self.status = Status.WARN
+        else:
+            self.status = Status.OK
+
+
+class Load(SystemCheck):
+    """
+    Load average per CPU over ``period`` minutes (1, 5 or 15)
+
+    CPU usage since the previous run is also recorded, using CPU times kept
+    in storage
+    """
+    stateful = True
+    unrecorded_fields = SystemCheck.unrecorded_fields + ('time', 'boot')
+
+    warning: float
+    error: float
+    period: int
+    previous: Optional[Counter] = None
+
+    def __init__(
+        self,
+        label: str = None,
+        warning: float = DEFAULT_LOAD_WARNING,
+        error: float = DEFAULT_LOAD_ERROR,
+        period: int = DEFAULT_LOAD_PERIOD,
+    ) -> None:
+        if period not in (1, 5, 15):
+            raise ValueError(f'Invalid load period {period}')
+        super().__init__(label)
+        self.warning = warning
+        self.error = error
+        self.period = period
+
+    def load_state(self, storage: Storage) -> None:
+        self.previous = storage.get_counter(self.uid)
+
+    def save_state(self, storage: Storage) -> None:
+        values: Optional[Dict[str, int]] = self.data.get('cpu_times')
+        if values is not None:
+            storage.set_counter(
+                self.uid,
+                Counter(values, self.data['time'], self.data['boot']),
+            )
+
+    def evaluate(self, snapshot: procfs.Snapshot) -> None:
+        loadavg: procfs.LoadAvg = snapshot.loadavg()
+        stat: procfs.Stat = snapshot.stat()
+        load: float = getattr(loadavg, f'load{self.period}') / stat.cpus
+
+        data: Dict[str, Any] = {
+            'load1': loadavg.load1,
+            'load5': loadavg.load5,
+            'load15': loadavg.load15,
+            'cpus': stat.cpus,
+            'load_per_cpu': load,
+            'procs_running': stat.procs_running,
+            'procs_blocked': stat.procs_blocked,
+            'cpu_times': stat.cpu._asdict(),
+            'time': time.time(),
+            'boot': stat.btime,
+        }
+        previous: Optional[Counter] = self.previous
+        if (
+            previous is not None and
+            previous.boot == stat.btime and
+            stat.cpu.total > previous.values['total']
+        ):
+            data['cpu_usage'] = (
+                (stat.cpu.busy - previous.values['busy']) /
+                (stat.cpu.total - previous.values['total'])
+            )
+        self.data = data
+        self.set_threshold_status(load, self.warning, self.error)
+
+
+class Memory(SystemCheck):
+    """
+    Fraction of memory available for new processes
+    """
+    warning: float
+    error: float
+
+    def __init__(
+        self,
+        label: str = None,
+        warning: float = DEFAULT_MEMORY_WARNING,
+        error: float = DEFAULT_MEMORY_ERROR,
+    ) -> None:
+        super().__init__(label)
+        self.warning = warning
+        self.error = error
+
+    def evaluate(self, snapshot: procfs.Snapshot) -> None:
+        meminfo: Dict[str, int] = snapshot.meminfo()
+        total: int = meminfo['MemTotal']
+        available: int = meminfo.get('MemAvailable', meminfo['MemFree'])
+        self.data = {
+            'total': total,
+            'available': available,
+        }
+        self.set_threshold_status(
+            available / total, self.warning, self.error, low=True,
+        )
+
+
+class Swap(SystemCheck):
+    """
+    Fraction of swap free; systems without swap are OK
+    """
+    warning: float
+    error: float
+
+    def __init__(
+        self,
+        label: str = None,
+        warning: float = DEFAULT_SWAP_WARNING,
+        error: float = DEFAULT_SWAP_ERROR,
+    ) -> None:
+        super().__init__(label)
+        self.warning = warning
+        self.error = error
 
-class Load(Check):
-    pass
+    def evaluate(self, snapshot: procfs.Snapshot) -> None:
+        meminfo: Dict[str, int] = snapshot.meminfo()
+        total: int = meminfo['SwapTotal']
+        free: int = meminfo['SwapFree']
+        self.data = {
+            'total': total,
+            'free': free,
+        }
+        if not total:
+            self.status = Status.OK
+            return
+        self.set_threshold_status(
+            free / total, self.warning, self.error, low=True,
+        )
@@ -0,0 +1,188 @@
+"""
+Fleet runner, to check many nodes across a process pool
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from . import hooks, procfs
+from .checks.base import Check, Result, update_detached
+from .constants import Status
+from .node import Node
+from .notifiers.dispatch import Dispatcher
+from .storage import Storage
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ShardStats:
+    """
+    Throughput of one shard of a fleet run
+    """
+    shard: int
+    nodes: int = 0
+    checks: int = 0
+
+    # Seconds spent updating checks in the worker
+    elapsed: float = 0
+
+    @property
+    def checks_per_second(self) -> float:
+        return self.checks / self.elapsed if self.elapsed else 0
+
+
+@dataclass
+class FleetResult:
+    """
+    Outcome of a fleet run
+    """
+    # Worst status of each node, and of the whole fleet
+    statuses: Dict[Node, Status] = field(default_factory=dict)
+    worst: Status = Status.DISABLED
+    shards: List[ShardStats] = field(default_factory=list)
+
+    # Seconds for the whole run, including notifying and storing
+    elapsed: float = 0
+
+
+def run_shard(
+    shard: int, trees: List[List[Check]],
+) -> Tuple[int, List[List[Result]], float]:
+    """
+    Update the detached checks of each node in a shard
+
+    An exception raised by an update is logged and given to the check's
+    ``fail``, so one failing check does not lose the results of the rest of
+    the shard. This is a module-level function so it can be sent to a
+    process pool.
+    """
+    start: float = time.perf_counter()
+    procfs.reset()
+    results: List[List[Result]] = [
+        [update_shard_check(check) for check in checks] for checks in trees
+    ]
+    return shard, results, time.perf_counter() - start
+
+
+def update_shard_check(check: Check) -> Result:
+    """
+    Update a detached check, failing it if its update raises an exception
+    """
+    start: float = time.perf_counter()
+    try:
+        return update_detached(check)
+    except Exception as e:
+        logger.error(f'{check!r} update failed: {e!r}')
+        check.fail(e)
+        return check.status, check.data, time.perf_counter() - start
+
+
+class Fleet:
+    """
+    Check many nodes, sharded across a process pool
+
+    Nodes are split between ``shards`` shards, which default to one per
+    worker. Detached copies of each shard's checks are updated in a worker
+    process; results are then applied to the nodes in this process, where
+    each node is notified and stored in turn, so storage is only ever
+    written from one place::
+
+        fleet = Fleet(workers=8)
+        for server in servers:
+            fleet.add(server, CSV(f'/var/lib/disermo/{server.label}.csv'))
+        result = fleet.run()
+    """
+    nodes: List[Tuple[Node, Storage]]
+    workers: int
+    shards: int
+    executor: Optional[Executor]
+    dispatcher: Optional[Dispatcher]
+
+    def __init__(
+        self,
+        workers: int = None,
+        shards: int = None,
+        executor: Executor = None,
+        dispatcher: Dispatcher = None,
+    ) -> None:
+        self.nodes = []
+        self.workers = workers or os.cpu_count() or 1
+        self.shards = shards or self.workers
+        self.executor = executor
+        self.dispatcher = dispatcher
+
+    def add(self, node: Node, storage: Storage) -> 'Fleet':
+        self.nodes.append((node, storage))
+        return self
+
+    def split(self) -> List[List[Tuple[Node, Storage]]]:
+        """
+        Split the nodes between shards, round robin
+        """
+        count: int = min(self.shards, len(self.nodes)) or 1
+        return [self.nodes[index::count] for index in range(count)]
+
+    def run(self) -> FleetResult:
+        """
+        Update every check in the fleet, then notify and store each node
+        """
+        if self.executor is not None:
+            return self.run_on(self.executor)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            return self.run_on(executor)
+
+    def run_on(self, executor: Executor) -> FleetResult:
+        start: float = time.perf_counter()
+        result = FleetResult()
+        procfs.reset()
+
+        # Submit checks which have no usable cached result
+        shards = self.split()
+        pending: List[List[List[Check]]] = []
+        futures = []
+        for index, shard in enumerate(shards):
+            for node, storage in shard:
+                node.load_states(storage)
+            trees: List[List[Check]] = [
+                [
+                    check for check in node.iter_flat_checks()
+                    if not check.load_cached()
+                ]
+                for node, _ in shard
+            ]
+            for checks in trees:
+                for check in checks:
+                    hooks.pre('check.update', check)
+            pending.append(trees)
+            futures.append(executor.submit(run_shard, index, [
+                [check.detached() for check in checks] for checks in trees
+            ]))
+
+        # Apply results, then report each node in this process
+        for shard, trees, future in zip(shards, pending, futures):
+            index, results, elapsed = future.result()
+            stats = ShardStats(shard=index, nodes=len(shard), elapsed=elapsed)
+            for checks, node_results in zip(trees, results):
+                stats.checks += len(checks)
+                for check, (status, data, check_elapsed) in zip(
+                    checks, node_results,
+                ):
+                    check.status, check.data = status, data
+                    hooks.post('check.update', check, check_elapsed)
+                    check.save_cached()
+            result.shards.append(stats)
+
+            for node, storage in shard:
+                worst: Status = node.collect()
+                node.commit(storage, dispatcher=self.dispatcher)
+                result.statuses[node] = worst
+                if worst > result.worst:
+                    result.worst = worst
+
+        result.elapsed = time.perf_counter() - start
+        return result
@@ -0,0 +1,213 @@
+"""
+Timing hooks, to instrument checks, storage and notifiers
+
+Register callbacks for an event, or for all events with ``None``::
+
+    def slow(event, target, elapsed):
+        if elapsed > 1:
+            print(f'{event} {target!r} took {elapsed:.2f}s')
+
+    hooks.add(post=slow)
+
+Pre-callbacks are called as ``pre(event, target)`` before the timed call,
+post-callbacks as ``post(event, target, elapsed)`` afterwards, with the
+elapsed time in seconds from a monotonic clock. Post-callbacks are called
+even if the timed call raises an exception.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+import threading
+import time
+from typing import (
+    Any, Callable, DefaultDict, Dict, Iterator, List, NamedTuple, Optional,
+    Tuple,
+)
+
+
+EVENTS = (
+    'check.run',
+    'check.update',
+    'storage.load',
+    'storage.save',
+    'notifier.process',
+    'notifier.send',
+    'notifier.deliver',
+    'node.check',
+)
+
+PreCallback = Callable[[str, Any], None]
+PostCallback = Callable[[str, Any, float], None]
+
+
+class Hook(NamedTuple):
+    event: Optional[str]
+    pre: Optional[PreCallback]
+    post: Optional[PostCallback]
+
+
+# Registered hooks; replaced rather than modified, so they can be read
+# without holding the lock
+registry: Tuple[Hook, ...] = ()
+lock = threading.Lock()
+
+
+def add(
+    event: str = None,
+    pre: PreCallback = None,
+    post: PostCallback = None,
+) -> Hook:
+    """
+    Register callbacks for an event, or for all events if no event is given
+
+    Returns the hook, to pass to ``remove``
+    """
+    global registry
+    if event is not None and event not in EVENTS:
+        raise ValueError(f'Unknown event {event}')
+    hook = Hook(event, pre, post)
+    with lock:
+        registry = registry + (hook,)
+    return hook
+
+
+def remove(hook: Hook) -> None:
+    global registry
+    with lock:
+        registry = tuple(known for known in registry if known is not hook)
+
+
+def clear() -> None:
+    global registry
+    with lock:
+        registry = ()
+
+
+def get_hooks(event: str) -> List[Hook]:
+    return [
+        hook for hook in registry
+        if hook.event is None or hook.event == event
+    ]
+
+
+def pre(event: str, target: Any) -> None:
+    for hook in get_hooks(event):
+        if hook.pre is not None:
+            hook.pre(event, target)
+
+
+def post(event: str, target: Any, elapsed: float) -> None:
+    for hook in get_hooks(event):
+        if hook.post is not None:
+            hook.post(event, target, elapsed)
+
+
+@contextmanager
+def timed(event: str, target: Any) -> Iterator[None]:
+    """
+    Context manager to call the hooks for an event around a block of code
+    """
+    if not registry:
+        yield
+        return
+
+    pre(event, target)
+    start: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        post(event, target, time.perf_counter() - start)
+
+
+class Timing:
+    count: int = 0
+    total: float = 0
+    max: float = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+
+    def __repr__(self) -> str:
+        return (
+            f'<Timing: {self.count} in {self.total:.6f}s, '
+            f'max {self.max:.6f}s>'
+        )
+
+
+class Profiler:
+    """
+    Collect timings for each event and target
+
+    Targets are described by their class and label, if they have one. Use as
+    a context manager, or call ``start`` and ``stop``::
+
+        with hooks.Profiler() as profiler:
+            MyServer.check(storage=store)
+        print(profiler.report())
+    """
+    timings: DefaultDict[Tuple[str, str], Timing]
+    hook: Optional[Hook] = None
+
+    def __init__(self) -> None:
+        self.timings = defaultdict(Timing)
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> 'Profiler':
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        if self.hook is None:
+            self.hook = add(post=self.record)
+
+    def stop(self) -> None:
+        if self.hook is not None:
+            remove(self.hook)
+            self.hook = None
+
+    def describe(self, target: Any) -> str:
+        name: str = type(target).__name__
+        label: Optional[str] = getattr(target, 'label', None)
+        if label is None:
+            return name
+        return f'{name}: {label}'
+
+    def record(self, event: str, target: Any, elapsed: float) -> None:
+        key: Tuple[str, str] = (event, self.describe(target))
+        with self.lock:
+            timing: Timing = self.timings[key]
+            timing.count += 1
+            timing.total += elapsed
+            timing.max = max(timing.max, elapsed)
+
+    def slowest(
+        self, event: str = None, limit: int = 10,
+    ) -> List[Tuple[Tuple[str, str], Timing]]:
+        """
+        Return the ``(event, target), timing`` pairs with the highest total
+        time, optionally for one event only
+        """
+        items: List[Tuple[Tuple[str, str], Timing]] = [
+            (key, timing) for key, timing in self.timings.items()
+            if event is None or key[0] == event
+        ]
+        items.sort(key=lambda item: item[1].total, reverse=True)
+        return items[:limit]
+
+    def totals(self) -> Dict[str, float]:
+        """
+        Return the total time spent in each event
+        """
+        totals: DefaultDict[str, float] = defaultdict(float)
+        for (event, _), timing in self.timings.items():
+            totals[event] += timing.total
+        return dict(totals)
+
+    def report(self, limit: int = 10) -> str:
+        return '\n'.join(
+            f'{timing.total:10.6f}s {timing.count:6d}x {event} {target}'
+            for (event, target), timing in self.slowest(limit=limit)
+        )
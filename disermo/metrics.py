@@ -0,0 +1,244 @@
+"""
+Prometheus metrics exporter
+
+Serves the status and elapsed time of every check in one or more nodes,
+with the duration of each sweep and time spent on storage, in the
+Prometheus text exposition format::
+
+    exporter = metrics.Exporter(MyServer).install()
+    exporter.serve(port=9585)
+
+or, for the node exporter's textfile collector, after each sweep::
+
+    exporter.write_textfile('/var/lib/node_exporter/disermo.prom')
+
+Metrics are generated line by line from the node trees, so a scrape does
+not build the whole response in memory.
+"""
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+from typing import (
+    Any, DefaultDict, Dict, Iterable, Iterator, List, Optional, Tuple, Type,
+)
+
+from . import hooks
+from .node import Node
+from .storage import Storage
+from .storage.files import atomic_write
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_PORT = 9585
+
+# Number of lines to write to a client at a time
+BATCH_SIZE = 256
+
+
+def escape(value: str) -> str:
+    """
+    Escape a label value
+    """
+    return (
+        value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    )
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    return ','.join(
+        f'{name}="{escape(value)}"' for name, value in labels.items()
+    )
+
+
+class Exporter:
+    """
+    Generate metrics for nodes
+
+    Call ``install`` to collect sweep and storage timings from hooks
+    """
+    prefix: str = 'disermo'
+    nodes: List[Node]
+    hook: Optional[hooks.Hook] = None
+
+    # Last and total duration, and count, of sweeps by node
+    sweeps: Dict[Node, Tuple[float, float, int]]
+
+    # Last and total duration, and count, of storage calls by operation
+    storage: DefaultDict[str, Tuple[float, float, int]]
+
+    def __init__(self, *nodes: Node) -> None:
+        self.nodes = list(nodes)
+        self.sweeps = {}
+        self.storage = defaultdict(lambda: (0, 0, 0))
+        self.lock = threading.Lock()
+
+    def install(self) -> 'Exporter':
+        if self.hook is None:
+            self.hook = hooks.add(post=self.record)
+        return self
+
+    def uninstall(self) -> None:
+        if self.hook is not None:
+            hooks.remove(self.hook)
+            self.hook = None
+
+    def record(self, event: str, target: Any, elapsed: float) -> None:
+        with self.lock:
+            if event == 'node.check' and target in self.nodes:
+                _, total, count = self.sweeps.get(target, (0, 0, 0))
+                self.sweeps[target] = (elapsed, total + elapsed, count + 1)
+            elif event.startswith('storage.') and isinstance(target, Storage):
+                operation: str = event.split('.', 1)[1]
+                _, total, count = self.storage[operation]
+                self.storage[operation] = (
+                    elapsed, total + elapsed, count + 1,
+                )
+
+    def family(
+        self, name: str, kind: str, help: str,
+        samples: Iterable[Tuple[Dict[str, str], Any]],
+    ) -> Iterator[str]:
+        """
+        Generate the lines of a metric family
+        """
+        name = f'{self.prefix}_{name}'
+        yield f'# HELP {name} {help}\n'
+        yield f'# TYPE {name} {kind}\n'
+        for labels, value in samples:
+            if labels:
+                yield f'{name}{{{format_labels(labels)}}} {value}\n'
+            else:
+                yield f'{name} {value}\n'
+
+    def iter_checks(self) -> Iterator[Tuple[Dict[str, str], Any]]:
+        for node in self.nodes:
+            for check, labels in node.iter_flat_labelled_checks():
+                yield {
+                    'node': node.label,
+                    'check': '/'.join(labels[1:]),
+                    'uid': check.uid,
+                }, check
+
+    def iter_status(self) -> Iterator[Tuple[Dict[str, str], Any]]:
+        for labels, check in self.iter_checks():
+            yield labels, check.status.value
+
+    def iter_elapsed(self) -> Iterator[Tuple[Dict[str, str], Any]]:
+        for labels, check in self.iter_checks():
+            elapsed: Optional[float] = check.data.get('elapsed')
+            if elapsed is not None:
+                yield labels, elapsed
+
+    def iter_sweeps(self, field: int) -> Iterator[Tuple[Dict[str, str], Any]]:
+        with self.lock:
+            sweeps = list(self.sweeps.items())
+        for node, values in sweeps:
+            yield {'node': node.label}, values[field]
+
+    def iter_storage(
+        self, field: int,
+    ) -> Iterator[Tuple[Dict[str, str], Any]]:
+        with self.lock:
+            storage = list(self.storage.items())
+        for operation, values in storage:
+            yield {'operation': operation}, values[field]
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Generate the lines of the exposition
+        """
+        yield from self.family(
+            'check_status', 'gauge',
+            'Check status: 0 disabled, 1 ok, 2 warn, 3 error',
+            self.iter_status(),
+        )
+        yield from self.family(
+            'check_elapsed_seconds', 'gauge',
+            'Time taken by the last update of the check',
+            self.iter_elapsed(),
+        )
+        yield from self.family(
+            'sweep_duration_seconds', 'gauge',
+            'Duration of the last sweep of the node',
+            self.iter_sweeps(0),
+        )
+        yield from self.family(
+            'sweep_duration_seconds_total', 'counter',
+            'Total duration of all sweeps of the node',
+            self.iter_sweeps(1),
+        )
+        yield from self.family(
+            'sweeps_total', 'counter',
+            'Number of sweeps of the node',
+            self.iter_sweeps(2),
+        )
+        yield from self.family(
+            'storage_seconds', 'gauge',
+            'Duration of the last storage operation',
+            self.iter_storage(0),
+        )
+        yield from self.family(
+            'storage_seconds_total', 'counter',
+            'Total duration of storage operations',
+            self.iter_storage(1),
+        )
+
+    def iter_batches(self) -> Iterator[bytes]:
+        """
+        Generate the exposition in encoded batches of lines
+        """
+        batch: List[str] = []
+        for line in self:
+            batch.append(line)
+            if len(batch) >= BATCH_SIZE:
+                yield ''.join(batch).encode('utf-8')
+                batch = []
+        if batch:
+            yield ''.join(batch).encode('utf-8')
+
+    def write_textfile(self, path: str) -> None:
+        """
+        Write the metrics to a file for the node exporter textfile collector
+
+        The file is replaced atomically so a partial file is never collected
+        """
+        with atomic_write(path, mode='wb') as file:
+            for batch in self.iter_batches():
+                file.write(batch)
+
+    def serve(
+        self, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+    ) -> ThreadingHTTPServer:
+        """
+        Serve the metrics over HTTP from a background thread
+
+        Returns the server; call ``shutdown`` on it to stop
+        """
+        handler: Type[MetricsHandler] = type(
+            'Handler', (MetricsHandler,), {'exporter': self},
+        )
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Stream the metrics to each request, closing the connection at the end
+    """
+    exporter: Exporter
+
+    def do_GET(self) -> None:
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for batch in self.exporter.iter_batches():
+            self.wfile.write(batch)
+
+    def log_message(self, *args) -> None:
+        pass
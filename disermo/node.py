@@ -1,68 +1,347 @@
 """
 Node object
 """
+import asyncio
 from collections import defaultdict
-from typing import List, DefaultDict, Iterator, Tuple
+from concurrent.futures import Executor
+import time
+from typing import (
+    Dict, List, DefaultDict, Iterable, Iterator, NamedTuple, Optional, Tuple,
+)
 
+from . import hooks, procfs
+from .cache import flush_caches
 from .checks.base import Check
 from .constants import Status
 from .notifiers import Notifier
+from .notifiers.dispatch import Dispatcher
 from .storage import Storage
+from .storage.series import SeriesStore, get_key
+
+
+class IndexEntry(NamedTuple):
+    check: Check
+    depth: int
+
+    # Position of the parent's entry in the index, or -1 for the root
+    parent: int
 
 
 class Node(Check):
-    def check(self, storage: Storage) -> Status:
+    _index: Optional[List[IndexEntry]] = None
+    _index_positions: Dict[Check, int]
+    _index_version: int = -1
+
+    def run(self, executor: Optional[Executor] = None) -> Status:
+        """
+        Run all checks in the tree as a new sweep, with a fresh procfs
+        snapshot
+        """
+        procfs.reset()
+        return super().run(executor=executor)
+
+    async def arun(self) -> Status:
+        procfs.reset()
+        return await super().arun()
+
+    def detached(self) -> 'Node':
+        """
+        Return a detached copy without the cached index, which refers to
+        every check and notifier in the tree
+        """
+        clone: Node = super().detached()
+        for name in ('_index', '_index_positions', '_index_version'):
+            vars(clone).pop(name, None)
+        return clone
+
+    def check(
+        self,
+        storage: Storage,
+        executor: Optional[Executor] = None,
+        dispatcher: Optional[Dispatcher] = None,
+        series: Optional[SeriesStore] = None,
+    ) -> Status:
         """
         Run the checks and notify
+
+        If an executor is given, the checks will be updated concurrently on it
+
+        If a dispatcher is given, notifications will be delivered in the
+        background by the dispatcher
+
+        If a series store is given, numeric check data is recorded in it
         """
-        status: Status = super().run()
+        with hooks.timed('node.check', self):
+            # Storage is locked for the whole run, so it is only loaded once
+            with storage.locked():
+                self.load_storage(storage)
+                status: Status = self.run(executor=executor)
+                self.commit(
+                    storage, dispatcher=dispatcher, series=series, loaded=True,
+                )
+        return status
+
+    def load_storage(self, storage: Storage) -> None:
+        """
+        Load storage and restore the state of stateful checks
 
+        The storage lock must be held
+        """
+        with hooks.timed('storage.load', storage):
+            storage.load()
+        for check in self.iter_flat_checks():
+            if check.stateful:
+                check.load_state(storage)
+
+    def load_states(self, storage: Storage) -> None:
+        """
+        Load storage and restore the state of stateful checks, if there are
+        any in the tree
+        """
+        if not any(check.stateful for check in self.iter_flat_checks()):
+            return
+        with storage.locked():
+            self.load_storage(storage)
+
+    def commit(
+        self,
+        storage: Storage,
+        dispatcher: Optional[Dispatcher] = None,
+        series: Optional[SeriesStore] = None,
+        loaded: bool = False,
+    ) -> None:
+        """
+        Notify and store the statuses of every check in the tree, once they
+        have all been run
+
+        Storage is loaded first so notifiers understand status context,
+        unless ``loaded`` is set because the lock has been held since it was
+        loaded
+        """
         # Collect flat list of all checks
         checks: List[Check] = list(self.iter_flat_checks())
+        flush_caches(checks)
 
-        # Collect notifiers
-        notifiers: DefaultDict[Notifier, List[Check]] = defaultdict(list)
-        for check in checks:
-            for notifier in check.notifiers:
-                notifiers[notifier].append(check)
+        with storage.locked():
+            if not loaded:
+                with hooks.timed('storage.load', storage):
+                    storage.load()
+            self.report(storage, checks, dispatcher=dispatcher)
+            self.save_states(storage, checks)
+            with hooks.timed('storage.save', storage):
+                storage.save()
+            if series is not None:
+                self.record(series, checks)
+
+    async def acheck(
+        self,
+        storage: Storage,
+        dispatcher: Optional[Dispatcher] = None,
+        series: Optional[SeriesStore] = None,
+    ) -> Status:
+        """
+        Run the checks and notify from within an event loop
 
-        # Load storage so notifiers understand status context
-        storage.load()
+        Checks are updated at the same time using their ``aupdate`` methods,
+        and blocking storage calls are run in the loop's default executor
+        """
+        loop = asyncio.get_running_loop()
+
+        async def process(
+            notifier: Notifier, notifier_checks: List[Check],
+        ) -> None:
+            with hooks.timed('notifier.process', notifier):
+                await notifier.aprocess(self, storage, notifier_checks)
+
+        with hooks.timed('node.check', self):
+            await loop.run_in_executor(None, storage.acquire)
+            try:
+                await loop.run_in_executor(None, self.load_storage, storage)
+                status: Status = await self.arun()
+                checks: List[Check] = list(self.iter_flat_checks())
+                await loop.run_in_executor(None, flush_caches, checks)
+                if dispatcher is not None:
+                    # Spool writes are synced to disk, so keep them off the
+                    # event loop
+                    await loop.run_in_executor(
+                        None, self.report, storage, checks, dispatcher,
+                    )
+                else:
+                    notifiers = self.get_notifiers(checks)
+                    await asyncio.gather(*[
+                        process(notifier, notifier_checks)
+                        for notifier, notifier_checks in notifiers.items()
+                    ])
+                    for notifier in notifiers:
+                        await loop.run_in_executor(None, notifier.flush)
+                    self.store(storage, checks)
+                self.save_states(storage, checks)
+                with hooks.timed('storage.save', storage):
+                    await loop.run_in_executor(None, storage.save)
+                if series is not None:
+                    await loop.run_in_executor(
+                        None, self.record, series, checks,
+                    )
+            finally:
+                storage.release()
+        return status
 
+    def report(
+        self,
+        storage: Storage,
+        checks: List[Check],
+        dispatcher: Optional[Dispatcher] = None,
+    ) -> None:
+        """
+        Notify and store the statuses of the given checks
+
+        Storage must already be loaded
+        """
         # Call notifiers
-        for notifier, notifier_checks in notifiers.items():
-            notifier.process(self, storage, notifier_checks)
+        notifiers = self.get_notifiers(checks)
+        if dispatcher is not None:
+            for notifier, notifier_checks in notifiers.items():
+                dispatcher.submit(notifier, self, storage, notifier_checks)
+        else:
+            for notifier, notifier_checks in notifiers.items():
+                with hooks.timed('notifier.process', notifier):
+                    notifier.process(self, storage, notifier_checks)
+            for notifier in notifiers:
+                notifier.flush()
 
         # Store statuses for trend spotting
+        self.store(storage, checks)
+
+    def save_states(self, storage: Storage, checks: List[Check]) -> None:
+        """
+        Put the state of any stateful checks into storage
+        """
+        for check in checks:
+            if check.stateful:
+                check.save_state(storage)
+
+    def record(
+        self,
+        series: SeriesStore,
+        checks: List[Check],
+        save: bool = True,
+    ) -> None:
+        """
+        Record the numeric data of the given checks, and save the series
+        unless ``save`` is false
+
+        Series are keyed by the labels of each check and its parents, joined
+        with ``/``, as the uid is shared by every check of a class
+        """
+        now: float = time.time()
+        for check, labels in self.get_labelled_checks(checks):
+            series.record(
+                get_key(labels),
+                check.data,
+                timestamp=now,
+                skip=check.unrecorded_fields,
+            )
+        if save:
+            series.save()
+
+    def get_notifiers(
+        self,
+        checks: List[Check],
+    ) -> DefaultDict[Notifier, List[Check]]:
+        """
+        Collect notifiers with the list of checks they are watching
+        """
+        notifiers: DefaultDict[Notifier, List[Check]] = defaultdict(list)
+        for check in checks:
+            for notifier in check.notifiers:
+                notifiers[notifier].append(check)
+        return notifiers
+
+    def store(self, storage: Storage, checks: List[Check]) -> None:
+        """
+        Store statuses for trend spotting
+        """
         for check in checks:
             storage.set(check.uid, check.status)
-        storage.save()
 
-        return status
+    def get_index(self) -> List[IndexEntry]:
+        """
+        Return a flattened index of the node tree, starting with self
+
+        The index is built once and cached until a subcheck is added to any
+        check with ``Check.add``. Each entry points to its parent's entry, so
+        label paths are only built when they are asked for.
+        """
+        if (
+            self._index is not None and
+            self._index_version == self.tree_version
+        ):
+            return self._index
+
+        index: List[IndexEntry] = []
+        stack: List[IndexEntry] = [IndexEntry(self, 0, -1)]
+        while stack:
+            entry: IndexEntry = stack.pop()
+            position: int = len(index)
+            index.append(entry)
+            for subcheck in reversed(entry.check.subchecks):
+                stack.append(IndexEntry(subcheck, entry.depth + 1, position))
+
+        self._index = index
+        self._index_positions = {
+            entry.check: position for position, entry in enumerate(index)
+        }
+        self._index_version = self.tree_version
+        return index
+
+    def get_labels(self, position: int) -> List[str]:
+        """
+        Return the labels of an index entry and its parents, oldest first
+        """
+        index: List[IndexEntry] = self.get_index()
+        labels: List[str] = []
+        while position >= 0:
+            entry: IndexEntry = index[position]
+            labels.append(entry.check.label)
+            position = entry.parent
+        labels.reverse()
+        return labels
+
+    def get_labelled_checks(
+        self,
+        checks: Iterable[Check],
+    ) -> List[Tuple[Check, List[str]]]:
+        """
+        Return (check, labels) pairs for the given checks in tree order, where
+        ``labels`` is the same as for ``iter_flat_labelled_checks``
+
+        This looks up each check in the index, so costs the number of checks
+        given and their depth rather than the size of the tree. Checks which
+        are not in the tree are ignored.
+        """
+        index: List[IndexEntry] = self.get_index()
+        positions: Dict[Check, int] = self._index_positions
+        return [
+            (index[position].check, self.get_labels(position))
+            for position in sorted({
+                positions[check] for check in checks if check in positions
+            })
+        ]
 
     def iter_flat_checks(self) -> Iterator[Check]:
         """
         Generator to return a flat list of the node tree, starting with self
         """
-        checks: List[Check] = [self]
-        while checks:
-            check = checks.pop(0)
-            checks = check.subchecks + checks
-            yield check
+        for entry in self.get_index():
+            yield entry.check
 
     def iter_flat_depth_checks(self) -> Iterator[Tuple[Check, int]]:
         """
         Generator to return a flat list of (check, depth) pairs of the node
         tree, starting with self, where depth is a 0-indexed depth (0 is self)
         """
-        checks: List[Tuple[Check, int]] = [(self, 0)]
-        while checks:
-            check, depth = checks.pop(0)
-            checks = [
-                (subcheck, depth + 1)
-                for subcheck in check.subchecks
-            ] + checks
-            yield (check, depth)
+        for entry in self.get_index():
+            yield (entry.check, entry.depth)
 
     def iter_flat_labelled_checks(self) -> Iterator[Tuple[Check, List[str]]]:
         """
@@ -70,14 +349,10 @@ class Node(Check):
         tree, starting with self, where ``labels`` is a list of all parent
         labels, in order oldest first
         """
-        checks: List[Tuple[Check, List[str]]] = [(self, [self.label])]
-        while checks:
-            # Look at next and search its children
-            check, label = checks.pop(0)
-            checks = [
-                (subcheck, label + [subcheck.label])
-                for subcheck in check.subchecks
-            ] + checks
-
-            # See if we've found one
-            yield (check, label)
+        # Entries are in depth-first order, so the path to each entry is the
+        # path to the previous one, cut back to its depth
+        labels: List[str] = []
+        for entry in self.get_index():
+            del labels[entry.depth:]
+            labels.append(entry.check.label)
+            yield (entry.check, list(labels))
@@ -1,3 +1,4 @@
 from .base import Notifier  # noqa
-from .email import Email  # noqa
+from .dispatch import Dispatcher  # noqa
+from .email import Email, SMTPConnection  # noqa
 from .stream import Stream  # noqa
@@ -1,19 +1,26 @@
 """
 Base class for all notifiers
 """
-from typing import TYPE_CHECKING, List
+import asyncio
+import hashlib
+from typing import TYPE_CHECKING, Any, List, Tuple
+
+from .. import hooks
 
 if TYPE_CHECKING:  # pragma: no cover
     from ..checks import Check
     from ..constants import Status
     from ..node import Node
-    from ..storage import Storage, GroupedStatus
+    from ..storage import Storage, Trend
 
 
 DEFAULT_TREND_LIMIT = 5
 
 
 class Notifier:
+    # Settings which identify this notifier's spooled notifications
+    spool_attrs: Tuple[str, ...] = ()
+
     def process(
         self,
         node: 'Node',
@@ -25,14 +32,36 @@ class Notifier:
 
         Filters the checks and passes notifiable ones on to send()
         """
-        # Get list of checks with something worth notifying
-        notifiable = [
+        # Send the notification(s) out
+        self.send(node, self.filter(storage, checks))
+
+    def filter(
+        self,
+        storage: 'Storage',
+        checks: 'List[Check]',
+    ) -> 'List[Check]':
+        """
+        Return the list of checks with something worth notifying
+        """
+        return [
             check for check in checks
             if self.test(storage, check)
         ]
 
-        # Send the notification(s) out
-        self.send(node, notifiable)
+    async def aprocess(
+        self,
+        node: 'Node',
+        storage: 'Storage',
+        checks: 'List[Check]',
+    ) -> None:
+        """
+        Process a set of checks from within an event loop
+
+        By default this runs the blocking ``process`` in the loop's default
+        executor
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.process, node, storage, checks)
 
     def test(self, storage: 'Storage', check: 'Check') -> bool:
         """
@@ -43,12 +72,71 @@ class Notifier:
         return True
 
     def send(self, node: 'Node', checks: 'List[Check]') -> None:
+        """
+        Send a notification for the given checks
+
+        By default this renders the notification and delivers it straight
+        away; subclasses should implement ``render`` and ``deliver`` so that
+        notifications can also be queued, or override this to send directly
+        """
+        with hooks.timed('notifier.send', self):
+            payload: Any = self.render(node, checks)
+            if payload is not None:
+                self.deliver(payload)
+
+    def render(self, node: 'Node', checks: 'List[Check]') -> Any:
+        """
+        Return a picklable payload describing the notification for the given
+        checks, or None if there is nothing to send
+        """
+        raise NotImplementedError()  # pragma: no cover
+
+    def deliver(self, payload: Any) -> None:
+        """
+        Deliver a rendered notification
+        """
         raise NotImplementedError()  # pragma: no cover
 
+    @property
+    def can_render(self) -> bool:
+        """
+        Whether this notifier can render notifications to be delivered later
+        """
+        return type(self).render is not Notifier.render
+
+    @property
+    def spool_key(self) -> str:
+        """
+        Key used to find this notifier's queued notifications after a restart
+
+        This is the class name, with a digest of the ``spool_attrs`` settings
+        so that notifiers with different settings do not share a spool
+        """
+        name: str = type(self).__name__.lower()
+        if not self.spool_attrs:
+            return name
+        return f'{name}-{self.get_spool_digest()}'
+
+    def get_spool_digest(self) -> str:
+        settings: str = repr([
+            getattr(self, attr) for attr in self.spool_attrs
+        ])
+        return hashlib.sha1(settings.encode()).hexdigest()[:8]
+
+    def flush(self) -> None:
+        """
+        Called once all notifiers have processed a sweep
+
+        Subclasses which batch their output should finish sending it here
+        """
+        pass
+
 
 class TrendNotifier(Notifier):
     after: int
 
+    spool_attrs: Tuple[str, ...] = ('after',)
+
     def __init__(self, after: int = DEFAULT_TREND_LIMIT):
         self.after = after
 
@@ -58,44 +146,27 @@ class TrendNotifier(Notifier):
 
         Looking for a change which occurred {self.after} ago
         """
-        uid: str = check.uid
         status: Status = check.status
-        generator: GroupedStatus = storage.get(key=uid, grouped=True)
-
-        # Get first (newest) status
-        first_status: Status
-        first_count: int
-        try:
-            first_status, first_count = next(generator)
-        except StopIteration:
+        trend: Trend = storage.trend(key=check.uid, after=self.after)
+
+        if trend.status is None:
             # Nothing on the stack
             if self.after <= 1:
                 return True
             return False
 
         # See if this is starting or continuing a trend
-        if first_status == status:
-            if first_count >= self.after:
+        if trend.status == status:
+            if trend.run_length >= self.after:
                 # Continuing trend - no change
                 return False
 
-            elif first_count + 1 == self.after:
+            elif trend.run_length + 1 == self.after:
                 # This next one will start a new trend
                 # But what about the previous trend; is this actually a change?
-                past_status: Status
-                past_count: int
-                for past_status, past_count in generator:
-                    if past_count >= self.after:
-                        # Found the previous trend
-                        if past_status == status:
-                            # This is returning to an old trend - no change
-                            return False
-                        else:
-                            # This is starting a new trend
-                            return True
-
-                # Haven't found a previous trend - this is starting a new one
-                return True
+                # If it matches, this is returning to an old trend - no change
+                # If there was no previous trend, this is starting a new one
+                return trend.previous != status
 
         else:
             # Status doesn't match, it can't be a trend...
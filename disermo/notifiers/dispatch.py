@@ -0,0 +1,375 @@
+"""
+Background dispatch of notifications
+"""
+from collections import defaultdict, deque
+from dataclasses import dataclass
+import glob
+import itertools
+import logging
+import os
+import pickle
+import queue
+import re
+import threading
+import time
+from typing import (
+    TYPE_CHECKING, Any, DefaultDict, Deque, Dict, List, Optional, Tuple,
+)
+
+from .base import Notifier
+from .. import hooks
+from ..storage.files import atomic_write
+
+if TYPE_CHECKING:  # pragma: no cover
+    from ..checks import Check
+    from ..node import Node
+    from ..storage import Storage
+
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of notifications waiting for each notifier
+DEFAULT_MAX_SIZE = 100
+
+# Number of times a failed delivery is retried
+DEFAULT_RETRIES = 5
+
+# Delay before the first retry, in seconds; doubled for each further retry
+DEFAULT_BACKOFF = 1
+
+_re_unsafe = re.compile(r'[^\w.@-]')
+
+# Queued notification: spool file path, if any, and payload
+Item = Tuple[Optional[str], Any]
+
+
+@dataclass
+class DispatcherStats:
+    submitted: int = 0
+    delivered: int = 0
+    retried: int = 0
+    failed: int = 0
+    deferred: int = 0
+    dropped: int = 0
+
+
+class Worker:
+    """
+    Delivers the queued notifications of a single notifier in order
+
+    Spooled notifications which did not fit in the queue are held in
+    ``overflow`` by path, and queued again as the queue drains
+    """
+    dispatcher: 'Dispatcher'
+    notifier: Notifier
+    queue: 'queue.Queue[Optional[Item]]'
+    overflow: Deque[str]
+    lock: threading.Lock
+    thread: threading.Thread
+
+    def __init__(self, dispatcher: 'Dispatcher', notifier: Notifier) -> None:
+        self.dispatcher = dispatcher
+        self.notifier = notifier
+        self.queue = queue.Queue(maxsize=dispatcher.max_size)
+        self.overflow = deque()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(
+            target=self.run,
+            name=f'disermo-dispatch-{notifier.spool_key}',
+            daemon=True,
+        )
+        self.thread.start()
+
+    def run(self) -> None:
+        while True:
+            item: Optional[Item] = self.queue.get()
+            try:
+                if item is None:
+                    return
+                try:
+                    self.deliver(*item)
+                except OSError as e:
+                    # Spool file was moved or removed under us
+                    logger.error(
+                        f'{self.notifier.spool_key} spool update failed: {e}',
+                    )
+                self.refill()
+                if self.queue.empty():
+                    self.flush()
+            finally:
+                self.queue.task_done()
+
+    def deliver(self, path: Optional[str], payload: Any) -> None:
+        """
+        Deliver a notification, retrying with exponential backoff
+
+        The spool file is removed once the notification is delivered, or
+        renamed to ``.failed`` once all retries have failed
+        """
+        dispatcher: Dispatcher = self.dispatcher
+        for attempt in itertools.count():
+            try:
+                with hooks.timed('notifier.deliver', self.notifier):
+                    self.notifier.deliver(payload)
+            except Exception as e:
+                if attempt >= dispatcher.retries:
+                    dispatcher.count('failed')
+                    logger.error(
+                        f'{self.notifier.spool_key} delivery failed after '
+                        f'{attempt + 1} attempts: {e}',
+                    )
+                    if path is not None:
+                        os.replace(path, f'{path}.failed')
+                    return
+
+                dispatcher.count('retried')
+                delay: float = dispatcher.backoff * 2 ** attempt
+                logger.warning(
+                    f'{self.notifier.spool_key} delivery failed, retrying '
+                    f'in {delay}s: {e}',
+                )
+                if dispatcher.stopped.wait(delay):
+                    # Shutting down - leave it in the spool for next time
+                    return
+            else:
+                dispatcher.count('delivered')
+                if path is not None:
+                    os.remove(path)
+                return
+
+    def refill(self) -> None:
+        """
+        Move notifications from the overflow into the queue while it has room
+        """
+        with self.lock:
+            while self.overflow and not self.queue.full():
+                path: str = self.overflow.popleft()
+                try:
+                    payload: Any = self.dispatcher.read_spool(path)
+                except (OSError, pickle.UnpicklingError) as e:
+                    logger.error(
+                        f'{self.notifier.spool_key} spool read failed: {e}',
+                    )
+                    continue
+                self.queue.put_nowait((path, payload))
+
+    def flush(self) -> None:
+        try:
+            self.notifier.flush()
+        except Exception as e:
+            logger.error(f'{self.notifier.spool_key} flush failed: {e}')
+
+
+class Dispatcher:
+    """
+    Hand notifications to background workers, so that slow or failing
+    notifiers do not delay or break the check run
+
+    Each notifier gets its own worker thread and bounded queue. Checks are
+    filtered and the notification rendered when it is submitted, so later
+    status changes do not affect it; the rendered payload is then delivered
+    by the worker, retrying with exponential backoff if it fails.
+
+    If ``spool`` is a directory path, payloads are written there until they
+    are delivered. Each notifier gets its own directory, named from its
+    ``spool_key``. Notifications left by a previous process are found when
+    the dispatcher is created, and queued again when their notifier is first
+    used. When a queue is full, spooled notifications wait on disk until
+    there is room; others are dropped.
+    """
+    spool: Optional[str]
+    max_size: int
+    retries: int
+    backoff: float
+    stats: DispatcherStats
+    stats_lock: threading.Lock
+    workers: Dict[Notifier, Worker]
+    spool_dirs: Dict[Notifier, str]
+    stale: Dict[str, List[str]]
+    stopped: threading.Event
+    lock: threading.RLock
+
+    def __init__(
+        self,
+        spool: str = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+    ) -> None:
+        self.spool = None if spool is None else str(spool)
+        self.max_size = max_size
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = DispatcherStats()
+        self.stats_lock = threading.Lock()
+        self.workers = {}
+        self.spool_dirs = {}
+        self.stopped = threading.Event()
+        self.lock = threading.RLock()
+        self.counter = itertools.count()
+        self.stale = self.find_stale()
+
+    def count(self, stat: str) -> None:
+        """
+        Increment a stats counter; workers update them from their threads
+        """
+        with self.stats_lock:
+            setattr(self.stats, stat, getattr(self.stats, stat) + 1)
+
+    def submit(
+        self,
+        notifier: Notifier,
+        node: 'Node',
+        storage: 'Storage',
+        checks: 'List[Check]',
+    ) -> None:
+        """
+        Filter and render a notification, then queue it for delivery
+
+        Notifiers which cannot render notifications are processed straight
+        away, with any error logged rather than raised
+        """
+        if not notifier.can_render:
+            try:
+                with hooks.timed('notifier.process', notifier):
+                    notifier.process(node, storage, checks)
+                notifier.flush()
+            except Exception as e:
+                logger.error(f'{notifier.spool_key} failed: {e}')
+            return
+
+        with hooks.timed('notifier.process', notifier):
+            payload: Any = notifier.render(
+                node, notifier.filter(storage, checks),
+            )
+        if payload is None:
+            return
+
+        self.count('submitted')
+        worker: Worker = self.get_worker(notifier)
+        path: Optional[str] = self.write_spool(notifier, payload)
+        self.enqueue(worker, (path, payload))
+
+    def enqueue(self, worker: Worker, item: Item) -> None:
+        """
+        Queue a notification, or hold it in the worker's overflow if the
+        queue is full and it is spooled
+        """
+        path: Optional[str] = item[0]
+        queued: bool = False
+        with worker.lock:
+            # Spooled notifications queue behind any already waiting
+            if path is None or not worker.overflow:
+                try:
+                    worker.queue.put_nowait(item)
+                    queued = True
+                except queue.Full:
+                    pass
+            if not queued and path is not None:
+                worker.overflow.append(path)
+        if queued:
+            return
+
+        self.count('dropped' if path is None else 'deferred')
+        logger.warning(
+            f'{worker.notifier.spool_key} queue is full, notification '
+            + ('dropped' if path is None else 'left in spool'),
+        )
+
+    def get_worker(self, notifier: Notifier) -> Worker:
+        """
+        Return the worker for a notifier, starting it if necessary
+        """
+        with self.lock:
+            worker: Optional[Worker] = self.workers.get(notifier)
+            if worker is not None:
+                return worker
+            worker = self.workers[notifier] = Worker(self, notifier)
+            spool_dir: Optional[str] = self.get_spool_dir(notifier)
+            stale: List[str] = (
+                [] if spool_dir is None else self.stale.pop(spool_dir, [])
+            )
+
+        # Requeue anything left in the spool by a previous process
+        for path in stale:
+            try:
+                payload: Any = self.read_spool(path)
+            except (OSError, pickle.UnpicklingError) as e:
+                logger.error(f'{notifier.spool_key} spool read failed: {e}')
+                continue
+            self.enqueue(worker, (path, payload))
+        return worker
+
+    def get_spool_dir(self, notifier: Notifier) -> Optional[str]:
+        """
+        Return the spool directory for a notifier
+
+        Notifiers with the same ``spool_key`` are given numbered directories
+        in the order they are first seen, so each has its own
+        """
+        if self.spool is None:
+            return None
+        with self.lock:
+            spool_dir: Optional[str] = self.spool_dirs.get(notifier)
+            if spool_dir is None:
+                name: str = _re_unsafe.sub('_', notifier.spool_key)
+                taken = set(self.spool_dirs.values())
+                spool_dir = os.path.join(self.spool, name)
+                for suffix in itertools.count(2):
+                    if spool_dir not in taken:
+                        break
+                    spool_dir = os.path.join(self.spool, f'{name}-{suffix}')
+                self.spool_dirs[notifier] = spool_dir
+        return spool_dir
+
+    def find_stale(self) -> Dict[str, List[str]]:
+        """
+        Find notifications left in the spool by a previous process, by
+        directory, oldest first
+        """
+        stale: DefaultDict[str, List[str]] = defaultdict(list)
+        if self.spool is not None:
+            pattern: str = os.path.join(self.spool, '*', '*.pickle')
+            for path in sorted(glob.glob(pattern)):
+                stale[os.path.dirname(path)].append(path)
+        return dict(stale)
+
+    def read_spool(self, path: str) -> Any:
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+
+    def write_spool(self, notifier: Notifier, payload: Any) -> Optional[str]:
+        """
+        Write a payload to the spool, and return its path
+        """
+        spool_dir: Optional[str] = self.get_spool_dir(notifier)
+        if spool_dir is None:
+            return None
+        os.makedirs(spool_dir, exist_ok=True)
+        name: str = f'{time.time_ns():020d}-{next(self.counter):06d}'
+        path: str = os.path.join(spool_dir, f'{name}.pickle')
+        with atomic_write(path, mode='wb', fsync=True) as file:
+            pickle.dump(payload, file)
+        return path
+
+    def join(self) -> None:
+        """
+        Wait until all queued notifications have been handled
+        """
+        for worker in list(self.workers.values()):
+            worker.queue.join()
+
+    def close(self, timeout: float = None) -> None:
+        """
+        Stop all workers once their queues are empty
+
+        Retries which are waiting are abandoned, leaving their notifications
+        in the spool
+        """
+        self.stopped.set()
+        for worker in list(self.workers.values()):
+            worker.queue.put(None)
+        for worker in list(self.workers.values()):
+            worker.thread.join(timeout)
+        self.workers.clear()
+        self.stopped.clear()
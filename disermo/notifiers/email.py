@@ -1,9 +1,13 @@
 """
 Email notifier
 """
+from collections import OrderedDict
+from email.message import Message
 from email.mime.text import MIMEText
 import smtplib
-from typing import TYPE_CHECKING, List, Tuple
+import ssl
+import threading
+from typing import TYPE_CHECKING, cast, Dict, List, Optional, Tuple
 
 from .base import TrendNotifier
 
@@ -12,22 +16,195 @@ if TYPE_CHECKING:
     from ..node import Node
 
 
+# Default SMTP timeout, in seconds
+DEFAULT_TIMEOUT = 30
+
+
+class SMTPConnection:
+    """
+    SMTP session which is shared by Email notifiers
+
+    The session is opened when the first message is sent, and closed when
+    the connection is flushed at the end of the sweep, so all messages in a
+    sweep are sent over one connection.
+
+    In digest mode, messages are held until the connection is flushed, then
+    messages with the same sender and recipient are merged into one.
+    """
+    host: str
+    port: int
+    starttls: bool
+    username: Optional[str]
+    password: Optional[str]
+    timeout: float
+    digest: bool
+
+    smtp: Optional[smtplib.SMTP]
+    queue: List[Message]
+    lock: threading.RLock
+
+    template_digest_subject = '''[Disermo] {count} notifications'''
+    template_digest_separator = '''\n\n'''
+    template_digest_section = '''{subject}\n\n{body}'''
+
+    def __init__(
+        self,
+        host: str = 'localhost',
+        port: int = 0,
+        starttls: bool = False,
+        username: str = None,
+        password: str = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        digest: bool = False,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.digest = digest
+
+        self.smtp = None
+        self.queue = []
+        self.lock = threading.RLock()
+
+    def connect(self) -> smtplib.SMTP:
+        """
+        Return the SMTP session, opening it if necessary
+        """
+        if self.smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    smtp.starttls(context=ssl.create_default_context())
+                if self.username is not None:
+                    smtp.login(self.username, self.password or '')
+            except Exception:
+                smtp.close()
+                raise
+            self.smtp = smtp
+        return self.smtp
+
+    def send(self, msg: Message) -> None:
+        """
+        Send a message, or queue it if in digest mode
+        """
+        with self.lock:
+            if self.digest:
+                self.queue.append(msg)
+            else:
+                self.deliver(msg)
+
+    def deliver(self, msg: Message) -> None:
+        """
+        Send a message now, reconnecting once if the server has disconnected
+        """
+        with self.lock:
+            try:
+                self.connect().send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                self.smtp = None
+                self.connect().send_message(msg)
+
+    def flush(self) -> None:
+        """
+        Send any queued messages, then close the session
+        """
+        with self.lock:
+            queue: List[Message] = self.queue
+            self.queue = []
+            try:
+                for msg in self.merge(queue):
+                    self.deliver(msg)
+            finally:
+                self.close()
+
+    def merge(self, queue: List[Message]) -> List[Message]:
+        """
+        Merge messages with the same sender and recipient into digests
+        """
+        groups: Dict[Tuple[str, str], List[Message]] = OrderedDict()
+        for msg in queue:
+            groups.setdefault((msg['From'], msg['To']), []).append(msg)
+
+        merged: List[Message] = []
+        for (from_addr, to_addr), msgs in groups.items():
+            if len(msgs) == 1:
+                merged.append(msgs[0])
+                continue
+
+            digest = MIMEText(self.template_digest_separator.join([
+                self.template_digest_section.format(
+                    subject=msg['Subject'],
+                    body=cast(bytes, msg.get_payload(decode=True)).decode(
+                        msg.get_content_charset() or 'utf-8',
+                    ),
+                )
+                for msg in msgs
+            ]))
+            digest['Subject'] = self.template_digest_subject.format(
+                count=len(msgs),
+            )
+            digest['To'] = to_addr
+            digest['From'] = from_addr
+            merged.append(digest)
+        return merged
+
+    def close(self) -> None:
+        with self.lock:
+            if self.smtp is None:
+                return
+            smtp, self.smtp = self.smtp, None
+            try:
+                smtp.quit()
+            except smtplib.SMTPServerDisconnected:
+                pass
+
+
+# Connection shared by Email notifiers which do not specify one
+shared = SMTPConnection()
+
+
 class Email(TrendNotifier):
     to_addr: str
     from_addr: str
+    connection: Optional[SMTPConnection]
+
+    spool_attrs: Tuple[str, ...] = ('to_addr', 'from_addr', 'after')
 
     template_subject = '''[Disermo] {name} => {status}'''
     template_body = '''{summary}'''
     template_body_summary = '''{check}: {status}'''
 
-    def __init__(self, to_addr: str, from_addr: str, **kwargs) -> None:
+    def __init__(
+        self,
+        to_addr: str,
+        from_addr: str,
+        connection: SMTPConnection = None,
+        **kwargs,
+    ) -> None:
         super().__init__(**kwargs)
         self.to_addr = to_addr
         self.from_addr = from_addr
+        self.connection = connection
+
+    def get_connection(self) -> SMTPConnection:
+        """
+        Return the SMTP connection for this notifier, defaulting to the
+        connection shared by all Email notifiers in the process
+        """
+        if self.connection is None:
+            return shared
+        return self.connection
 
-    def send(self, node: 'Node', checks: 'List[Check]') -> None:
+    @property
+    def spool_key(self) -> str:
+        return f'email-{self.to_addr}-{self.get_spool_digest()}'
+
+    def render(self, node: 'Node', checks: 'List[Check]') -> Optional[Message]:
         if not checks:
-            return
+            return None
 
         subject = self.template_subject.format(
             name=node.label,
@@ -35,11 +212,9 @@ class Email(TrendNotifier):
         )
 
         # Generate full labels
-        found: List[Tuple[Check, List[str]]] = [
-            (check, label)
-            for check, label in node.iter_flat_labelled_checks()
-            if check in checks
-        ]
+        found: List[Tuple[Check, List[str]]] = node.get_labelled_checks(
+            checks,
+        )
 
         # Render summary
         summary = '\n'.join([
@@ -58,7 +233,10 @@ class Email(TrendNotifier):
         msg['Subject'] = subject
         msg['To'] = self.to_addr
         msg['From'] = self.from_addr
+        return msg
+
+    def deliver(self, payload: Message) -> None:
+        self.get_connection().send(payload)
 
-        s = smtplib.SMTP('localhost')
-        s.send_message(msg)
-        s.quit()
+    def flush(self) -> None:
+        self.get_connection().flush()
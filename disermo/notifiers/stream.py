@@ -16,10 +16,11 @@ class Stream(Notifier):
     def __init__(self, stream: TextIO):
         self.stream = stream
 
-    def send(self, node: 'Node', checks: 'List[Check]') -> None:
-        check: Check
-        depth: int
-        for check, depth in node.iter_flat_depth_checks():
-            self.stream.write(
-                f'{"  " * depth}{check.label}: {check.status.name.title()}\n'
-            )
+    def render(self, node: 'Node', checks: 'List[Check]') -> str:
+        return ''.join([
+            f'{"  " * depth}{check.label}: {check.status.name.title()}\n'
+            for check, depth in node.iter_flat_depth_checks()
+        ])
+
+    def deliver(self, payload: str) -> None:
+        self.stream.write(payload)
@@ -0,0 +1,144 @@
+"""
+HTTP connection pool
+
+Keeps idle keep-alive connections open so repeated requests to the same host
+can skip the TCP connect and TLS handshake
+"""
+from collections import defaultdict, deque
+from http.client import HTTPConnection, HTTPSConnection, HTTPResponse
+import ssl
+import threading
+import time
+from typing import DefaultDict, Deque, Optional, Tuple
+
+
+# Maximum number of idle connections to keep for each host
+DEFAULT_MAX_SIZE = 4
+
+# Number of seconds an idle connection is kept before it is closed
+DEFAULT_IDLE_TIMEOUT = 60
+
+# Maximum number of unread response bytes to drain so that a connection can
+# be reused; larger responses are closed instead
+DRAIN_LIMIT = 64 * 1024
+
+PoolKey = Tuple[str, str, int]
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of idle HTTP connections, keyed by scheme, host and port
+    """
+    max_size: int
+    idle_timeout: float
+    idle: DefaultDict[PoolKey, Deque[Tuple[HTTPConnection, float]]]
+    lock: threading.Lock
+    _ssl_context: Optional[ssl.SSLContext]
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    ) -> None:
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.idle = defaultdict(deque)
+        self.lock = threading.Lock()
+        self._ssl_context = None
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        """
+        Shared SSL context, so certificates are only loaded once
+        """
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    def acquire(
+        self,
+        key: PoolKey,
+        timeout: float,
+    ) -> Tuple[HTTPConnection, bool]:
+        """
+        Return a connection for the given key, and whether it was reused
+
+        New connections are not connected; the caller can call ``connect()``
+        to time the connection separately from the request
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.evict(now)
+            connections = self.idle.get(key)
+            if connections:
+                conn, _ = connections.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+
+        scheme, host, port = key
+        if scheme == 'https':
+            return HTTPSConnection(
+                host, port, timeout=timeout, context=self.ssl_context,
+            ), False
+        return HTTPConnection(host, port, timeout=timeout), False
+
+    def release(
+        self,
+        key: PoolKey,
+        conn: HTTPConnection,
+        response: HTTPResponse,
+    ) -> None:
+        """
+        Return a connection to the pool once its response is finished with
+
+        Any unread response content is drained if it is small enough,
+        otherwise the connection is closed
+        """
+        try:
+            if not response.will_close and not response.isclosed():
+                response.read(DRAIN_LIMIT)
+        except Exception:
+            conn.close()
+            return
+
+        if response.will_close or not response.isclosed():
+            conn.close()
+            return
+
+        now = time.monotonic()
+        with self.lock:
+            connections = self.idle[key]
+            connections.append((conn, now))
+            while len(connections) > self.max_size:
+                old_conn, _ = connections.popleft()
+                old_conn.close()
+
+    def evict(self, now: float) -> None:
+        """
+        Close connections which have been idle for too long
+
+        The pool lock must be held by the caller
+        """
+        for key in list(self.idle):
+            connections = self.idle[key]
+            while connections and now - connections[0][1] > self.idle_timeout:
+                conn, _ = connections.popleft()
+                conn.close()
+            if not connections:
+                del self.idle[key]
+
+    def clear(self) -> None:
+        """
+        Close all idle connections
+        """
+        with self.lock:
+            for connections in self.idle.values():
+                for conn, _ in connections:
+                    conn.close()
+            self.idle.clear()
+
+
+# Pool shared by all checks in the process
+shared = ConnectionPool()
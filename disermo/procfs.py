@@ -0,0 +1,265 @@
+"""
+Sweep-scoped snapshot of files in /proc
+
+System checks read /proc through the shared snapshot, so each file is read
+and parsed at most once per sweep however many checks use it. The snapshot
+is reset at the start of each sweep by ``Node.run``, the scheduler, ``Sweep``
+and ``Fleet``.
+
+Worker processes in a process pool do not see those resets, so each reset
+starts a new sweep id, which is sent with detached checks; a worker resets
+its own snapshot when it first sees a new id.
+"""
+import itertools
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple, TypeVar
+
+
+ROOT = '/proc'
+
+T = TypeVar('T')
+
+# Sweep ids are unique to the process which started the sweep
+_sweeps = itertools.count()
+
+
+class LoadAvg(NamedTuple):
+    load1: float
+    load5: float
+    load15: float
+    running: int
+    total: int
+
+
+class CPUTimes(NamedTuple):
+    """
+    Time spent by all CPUs, in clock ticks
+    """
+    busy: int
+    total: int
+
+
+class Stat(NamedTuple):
+    cpu: CPUTimes
+    cpus: int
+    procs_running: int
+    procs_blocked: int
+
+    # Boot time in seconds since the epoch
+    btime: int = 0
+
+
+# Field names of /proc/diskstats counters after the device name
+DISKSTATS_FIELDS = (
+    'reads', 'reads_merged', 'sectors_read', 'read_ms',
+    'writes', 'writes_merged', 'sectors_written', 'write_ms',
+    'in_progress', 'io_ms', 'weighted_io_ms',
+)
+
+# Field names of /proc/net/dev counters after the interface name
+NET_DEV_FIELDS = (
+    'rx_bytes', 'rx_packets', 'rx_errors', 'rx_dropped',
+    'rx_fifo', 'rx_frame', 'rx_compressed', 'rx_multicast',
+    'tx_bytes', 'tx_packets', 'tx_errors', 'tx_dropped',
+    'tx_fifo', 'tx_collisions', 'tx_carrier', 'tx_compressed',
+)
+
+
+class Mount(NamedTuple):
+    mount_id: int
+    parent_id: int
+
+    # Device as major:minor, shared by bind mounts of the same filesystem
+    device: str
+
+    # Path within the filesystem which is mounted
+    root: str
+    mount_point: str
+    fstype: str
+    source: str
+
+
+_re_octal_escape = re.compile(r'\\([0-7]{3})')
+
+
+def unescape(value: str) -> str:
+    """
+    Decode octal escapes used for spaces and other characters in mountinfo
+    """
+    return _re_octal_escape.sub(lambda match: chr(int(match[1], 8)), value)
+
+
+def parse_mountinfo(text: str) -> List[Mount]:
+    mounts: List[Mount] = []
+    for line in text.splitlines():
+        fields, _, tail = line.partition(' - ')
+        parts: List[str] = fields.split()
+        details: List[str] = tail.split()
+        if len(parts) < 5 or len(details) < 2:
+            continue
+        mounts.append(Mount(
+            mount_id=int(parts[0]),
+            parent_id=int(parts[1]),
+            device=parts[2],
+            root=unescape(parts[3]),
+            mount_point=unescape(parts[4]),
+            fstype=details[0],
+            source=unescape(details[1]),
+        ))
+    return mounts
+
+
+def parse_loadavg(text: str) -> LoadAvg:
+    load1, load5, load15, procs = text.split()[:4]
+    running, total = procs.split('/')
+    return LoadAvg(
+        float(load1), float(load5), float(load15), int(running), int(total),
+    )
+
+
+def parse_stat(text: str) -> Stat:
+    cpu: CPUTimes = CPUTimes(0, 0)
+    cpus: int = 0
+    procs: Dict[str, int] = {}
+    for line in text.splitlines():
+        name, _, values = line.partition(' ')
+        if name == 'cpu':
+            # user nice system idle iowait irq softirq steal; guest time is
+            # already counted in user and nice
+            times: List[int] = [int(value) for value in values.split()[:8]]
+            idle: int = sum(times[3:5])
+            cpu = CPUTimes(sum(times) - idle, sum(times))
+        elif name.startswith('cpu'):
+            cpus += 1
+        elif name in ('procs_running', 'procs_blocked', 'btime'):
+            procs[name] = int(values)
+    return Stat(
+        cpu=cpu,
+        cpus=cpus or 1,
+        procs_running=procs.get('procs_running', 0),
+        procs_blocked=procs.get('procs_blocked', 0),
+        btime=procs.get('btime', 0),
+    )
+
+
+def parse_diskstats(text: str) -> Dict[str, Dict[str, int]]:
+    """
+    Return counters for each block device
+    """
+    devices: Dict[str, Dict[str, int]] = {}
+    for line in text.splitlines():
+        parts: List[str] = line.split()
+        if len(parts) < 3 + len(DISKSTATS_FIELDS):
+            continue
+        devices[parts[2]] = dict(zip(
+            DISKSTATS_FIELDS, (int(value) for value in parts[3:]),
+        ))
+    return devices
+
+
+def parse_net_dev(text: str) -> Dict[str, Dict[str, int]]:
+    """
+    Return counters for each network interface
+    """
+    interfaces: Dict[str, Dict[str, int]] = {}
+    for line in text.splitlines():
+        name, separator, values = line.partition(':')
+        if not separator or '|' in line:
+            continue
+        interfaces[name.strip()] = dict(zip(
+            NET_DEV_FIELDS, (int(value) for value in values.split()),
+        ))
+    return interfaces
+
+
+def parse_meminfo(text: str) -> Dict[str, int]:
+    """
+    Return meminfo values, converted to bytes where they have units
+    """
+    values: Dict[str, int] = {}
+    for line in text.splitlines():
+        name, _, value = line.partition(':')
+        parts: List[str] = value.split()
+        if not parts:
+            continue
+        number: int = int(parts[0])
+        if len(parts) > 1 and parts[1] == 'kB':
+            number *= 1024
+        values[name] = number
+    return values
+
+
+class Snapshot:
+    """
+    Cache of parsed files under a procfs root, kept until it is reset
+    """
+    root: str
+    entries: Dict[str, Any]
+    sweep: Tuple[int, int]
+
+    def __init__(self, root: str = ROOT) -> None:
+        self.root = root
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.sweep = (os.getpid(), next(_sweeps))
+
+    def reset(self) -> None:
+        with self.lock:
+            self.entries = {}
+            self.sweep = (os.getpid(), next(_sweeps))
+
+    def join(self, sweep: Tuple[int, int]) -> None:
+        """
+        Use this snapshot for the given sweep, resetting it if it was last
+        used for a different one
+        """
+        with self.lock:
+            if sweep != self.sweep:
+                self.entries = {}
+                self.sweep = sweep
+
+    def get(self, name: str, parser: Callable[[str], T]) -> T:
+        """
+        Return the parsed contents of a file, reading it if it is not in the
+        snapshot
+        """
+        key: str = f'{name}:{parser.__name__}'
+        with self.lock:
+            if key in self.entries:
+                return self.entries[key]
+
+            with open(os.path.join(self.root, name)) as file:
+                value: T = parser(file.read())
+            self.entries[key] = value
+            return value
+
+    def loadavg(self) -> LoadAvg:
+        return self.get('loadavg', parse_loadavg)
+
+    def stat(self) -> Stat:
+        return self.get('stat', parse_stat)
+
+    def meminfo(self) -> Dict[str, int]:
+        return self.get('meminfo', parse_meminfo)
+
+    def mountinfo(self) -> List[Mount]:
+        return self.get('self/mountinfo', parse_mountinfo)
+
+    def diskstats(self) -> Dict[str, Dict[str, int]]:
+        return self.get('diskstats', parse_diskstats)
+
+    def net_dev(self) -> Dict[str, Dict[str, int]]:
+        return self.get('net/dev', parse_net_dev)
+
+
+# Snapshot shared by all system checks
+shared = Snapshot()
+
+
+def reset() -> None:
+    """
+    Start a new sweep, so files are read again when next used
+    """
+    shared.reset()
@@ -0,0 +1,287 @@
+"""
+Scheduler to run checks from a long-running process
+
+The node tree and storage are kept in memory, and each check is run at its
+own interval instead of every check being run on every sweep
+"""
+from concurrent.futures import Executor
+from dataclasses import dataclass
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+from . import hooks, procfs
+from .cache import flush_caches
+from .checks.base import Check, update_all
+from .constants import Status
+from .node import Node
+from .notifiers.dispatch import Dispatcher
+from .storage import Storage
+from .storage.series import SeriesStore
+
+
+logger = logging.getLogger(__name__)
+
+# Interval for checks which do not set their own, in seconds
+DEFAULT_INTERVAL = 60
+
+# How often storage is saved, in seconds
+DEFAULT_FLUSH_INTERVAL = 60
+
+
+@dataclass
+class SchedulerStats:
+    """
+    Counters to show whether the scheduler is keeping up
+    """
+    # Number of times checks were run, and number of check runs
+    ticks: int = 0
+    runs: int = 0
+
+    # Check runs which took longer than the check's interval
+    overruns: int = 0
+
+    # Scheduled runs which were skipped because they were missed
+    skipped: int = 0
+
+    # Seconds the latest tick started after it was due, and the worst seen
+    drift: float = 0
+    max_drift: float = 0
+
+    # Number of times storage was saved
+    flushes: int = 0
+
+
+class Scheduler:
+    """
+    Run the checks of a node at their intervals
+
+    Storage is loaded once, then statuses are reported for each check when it
+    is run, along with its parent checks. Storage is saved in batches, every
+    ``flush_interval`` seconds.
+
+    Missed runs are skipped rather than queued, so a slow check cannot cause
+    runs to pile up; overruns, skipped runs and drift are counted in
+    ``stats`` and logged. A check which raises an exception is given an ERROR
+    status, and the scheduler carries on.
+    """
+    node: Node
+    storage: Storage
+    interval: float
+    flush_interval: float
+    executor: Optional[Executor]
+    dispatcher: Optional[Dispatcher]
+    series: Optional[SeriesStore]
+    clock: Callable[[], float]
+    stats: SchedulerStats
+
+    checks: List[Check]
+    parents: Dict[Check, Optional[Check]]
+    intervals: Dict[Check, float]
+    slots: Dict[Check, float]
+    due: Dict[Check, float]
+    own: Dict[Check, Status]
+    last_flush: float
+    dirty: bool
+
+    def __init__(
+        self,
+        node: Node,
+        storage: Storage,
+        interval: float = DEFAULT_INTERVAL,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        executor: Executor = None,
+        dispatcher: Dispatcher = None,
+        series: SeriesStore = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.node = node
+        self.storage = storage
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.executor = executor
+        self.dispatcher = dispatcher
+        self.series = series
+        self.clock = clock
+        self.stats = SchedulerStats()
+        self.stopped = threading.Event()
+
+        # Find parents and inherited intervals
+        self.checks = []
+        self.parents = {}
+        self.intervals = {}
+        self.add_checks(node, None, interval)
+
+        self.slots = {}
+        self.due = {}
+        self.own = {}
+        self.last_flush = 0
+        self.dirty = False
+
+    def add_checks(
+        self,
+        check: Check,
+        parent: Optional[Check],
+        interval: float,
+    ) -> None:
+        """
+        Add a check and its subchecks in tree order
+        """
+        if check.interval is not None:
+            interval = check.interval
+        self.checks.append(check)
+        self.parents[check] = parent
+        self.intervals[check] = interval
+        for subcheck in check.subchecks:
+            self.add_checks(subcheck, check, interval)
+
+    def start(self) -> None:
+        """
+        Load storage and schedule every check to run now
+        """
+        with self.storage.locked():
+            with hooks.timed('storage.load', self.storage):
+                self.storage.load()
+            for check in self.checks:
+                if check.stateful:
+                    check.load_state(self.storage)
+        now: float = self.clock()
+        for check in self.checks:
+            self.slots[check] = now
+            self.due[check] = now + random.uniform(0, check.jitter)
+            self.own[check] = check.status
+        self.last_flush = now
+
+    def run_forever(self) -> None:
+        """
+        Run checks as they become due until ``stop()`` is called
+        """
+        self.start()
+        try:
+            while not self.stopped.is_set():
+                self.run_pending()
+                delay: float = min(
+                    min(self.due.values()),
+                    self.last_flush + self.flush_interval,
+                ) - self.clock()
+                if delay > 0:
+                    self.stopped.wait(delay)
+        finally:
+            self.flush()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def run_pending(self) -> List[Check]:
+        """
+        Run all checks which are due, then notify and store their statuses
+
+        Returns the list of checks which were run
+        """
+        now: float = self.clock()
+        due: List[Check] = [
+            check for check in self.checks if self.due[check] <= now
+        ]
+        if due:
+            self.stats.ticks += 1
+            self.stats.runs += len(due)
+            self.stats.drift = now - min(self.due[check] for check in due)
+            self.stats.max_drift = max(self.stats.max_drift, self.stats.drift)
+
+            # Stateful checks continue from the state saved on their last run
+            for check in due:
+                if check.stateful:
+                    check.load_state(self.storage)
+
+            procfs.reset()
+            elapsed: Dict[Check, float] = self.update(due)
+            flush_caches(due)
+            finished: float = self.clock()
+            for check in due:
+                self.own[check] = check.status
+                took: float = elapsed.get(check, 0)
+                if took > self.intervals[check]:
+                    self.stats.overruns += 1
+                    logger.warning(
+                        f'{check!r} took {took:.3f}s, longer than '
+                        f'its interval of {self.intervals[check]}s',
+                    )
+                self.reschedule(check, finished)
+
+            # Collect statuses from each check's own latest result
+            for check in self.checks:
+                check.status = self.own[check]
+            self.node.collect()
+
+            # Report checks which were run, and parents which may have changed
+            changed: Set[Check] = set()
+            for check in due:
+                parent: Optional[Check] = check
+                while parent is not None and parent not in changed:
+                    changed.add(parent)
+                    parent = self.parents[parent]
+            self.node.report(
+                self.storage,
+                [check for check in self.checks if check in changed],
+                dispatcher=self.dispatcher,
+            )
+            self.node.save_states(self.storage, due)
+            if self.series is not None:
+                self.node.record(self.series, due, save=False)
+            self.dirty = True
+
+        if self.clock() - self.last_flush >= self.flush_interval:
+            self.flush()
+        return due
+
+    def update(self, checks: List[Check]) -> Dict[Check, float]:
+        """
+        Update the given checks, on the executor if there is one, and return
+        the seconds each one took
+
+        A check which raises an exception is given an ERROR status
+        """
+        if self.executor is not None:
+            return update_all(checks, self.executor, catch=True)
+
+        elapsed: Dict[Check, float] = {}
+        for check in checks:
+            start: float = self.clock()
+            try:
+                check.refresh()
+            except Exception as e:
+                logger.exception(f'{check!r} update failed')
+                check.fail(e)
+            elapsed[check] = self.clock() - start
+        return elapsed
+
+    def reschedule(self, check: Check, now: float) -> None:
+        """
+        Schedule the next run of a check, skipping any missed runs
+        """
+        interval: float = self.intervals[check]
+        slot: float = self.slots[check] + interval
+        if slot <= now:
+            missed: int = int((now - slot) // interval) + 1
+            self.stats.skipped += missed
+            logger.warning(f'{check!r} skipped {missed} scheduled run(s)')
+            slot += missed * interval
+        self.slots[check] = slot
+        self.due[check] = slot + random.uniform(0, check.jitter)
+
+    def flush(self) -> None:
+        """
+        Save storage if anything has changed since it was last saved
+        """
+        self.last_flush = self.clock()
+        if not self.dirty:
+            return
+        with self.storage.locked():
+            with hooks.timed('storage.save', self.storage):
+                self.storage.save()
+        if self.series is not None:
+            self.series.save()
+        self.dirty = False
+        self.stats.flushes += 1
@@ -1,2 +1,5 @@
-from .base import Storage, GroupedStatus, FlatStatus  # noqa
+from .base import Storage, Counter, GroupedStatus, FlatStatus, Trend  # noqa
 from .csv import CSV  # noqa
+from .log import Log  # noqa
+from .series import SeriesStore  # noqa
+from .sqlite import SQLite  # noqa
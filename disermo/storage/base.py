@@ -1,8 +1,11 @@
 """
 Storage base
 """
-from collections import defaultdict
-from typing import DefaultDict, List, Tuple, Iterator, overload
+from array import array
+from contextlib import contextmanager
+from typing import (
+    Any, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, overload,
+)
 from typing_extensions import Literal
 
 from ..constants import Status
@@ -11,19 +14,241 @@ from ..constants import Status
 GroupedStatus = Iterator[Tuple[Status, int]]
 FlatStatus = Iterator[Status]
 
+# Look up statuses by their packed value
+STATUSES: Dict[int, Status] = {status.value: status for status in Status}
+
+
+class Trend(NamedTuple):
+    """
+    Summary of a key's history for trend spotting
+    """
+    # Newest status and how many times in a row it has been seen
+    status: Optional[Status]
+    run_length: int
+
+    # Status of the most recent earlier run which was long enough to be a
+    # trend, if it is still in memory
+    previous: Optional[Status]
+
+
+class Counter(NamedTuple):
+    """
+    Last raw sample of a check's counters, for rate checks
+    """
+    values: Dict[str, int]
+
+    # Time of the sample in seconds since the epoch, and the boot time of the
+    # host when it was taken, to spot resets
+    time: float
+    boot: float
+
+
+class History:
+    """
+    Fixed-capacity ring buffer of (status, count) pairs, oldest first
+
+    Statuses are packed as bytes and counts as unsigned longs, so each entry
+    costs a few bytes rather than a tuple; appending and trimming the oldest
+    entry are O(1) and do not allocate.
+
+    Trend summaries are kept up to date as entries are added, so looking up
+    a trend is O(1) once it has been looked up for that trend length.
+    """
+    __slots__ = (
+        'statuses', 'counts', 'start', 'length', 'total', 'established',
+    )
+
+    statuses: array
+    counts: array
+    start: int
+    length: int
+
+    # Number of entries ever appended, including those no longer in memory
+    total: int
+
+    # Most recent entry before the newest which was at least ``after`` long,
+    # as (entry number, status value), keyed by ``after``
+    established: Optional[Dict[int, Tuple[int, int]]]
+
+    def __init__(
+        self,
+        capacity: int,
+        values: Iterable[Tuple[Status, int]] = (),
+    ) -> None:
+        self.statuses = array('B', bytes(capacity))
+        self.counts = array('L', bytes(capacity * array('L').itemsize))
+        self.start = 0
+        self.length = 0
+        self.total = 0
+        self.established = None
+        for status, count in values:
+            self.append(status, count)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.statuses)
+
+    def append(self, status: Status, count: int = 1) -> None:
+        """
+        Add a new entry, dropping the oldest if the buffer is full
+        """
+        capacity: int = len(self.statuses)
+
+        # The newest entry is about to become a past trend
+        if self.established and self.length:
+            last_index: int = (self.start + self.length - 1) % capacity
+            last_count: int = self.counts[last_index]
+            for after in self.established:
+                if last_count >= after:
+                    self.established[after] = (
+                        self.total - 1, self.statuses[last_index],
+                    )
+
+        self.total += 1
+        if self.length < capacity:
+            index: int = (self.start + self.length) % capacity
+            self.length += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % capacity
+        self.statuses[index] = status.value
+        self.counts[index] = count
+
+    def last(self) -> Optional[Tuple[Status, int]]:
+        """
+        Return the newest entry, or None if empty
+        """
+        if not self.length:
+            return None
+        index: int = (self.start + self.length - 1) % len(self.statuses)
+        return STATUSES[self.statuses[index]], self.counts[index]
+
+    def increment(self) -> None:
+        """
+        Increment the count of the newest entry
+        """
+        index: int = (self.start + self.length - 1) % len(self.statuses)
+        self.counts[index] += 1
+
+    def trend(self, after: int) -> Trend:
+        """
+        Return the trend summary for trends at least ``after`` long
+        """
+        last: Optional[Tuple[Status, int]] = self.last()
+        if last is None:
+            return Trend(None, 0, None)
+
+        if self.established is None:
+            self.established = {}
+        if after not in self.established:
+            # Find the previous trend once, then keep it up to date in append
+            found: Tuple[int, int] = (-1, 0)
+            number: int = self.total - 1
+            history: Iterator[Tuple[Status, int]] = reversed(self)
+            next(history)
+            for status, count in history:
+                number -= 1
+                if count >= after:
+                    found = (number, status.value)
+                    break
+            self.established[after] = found
+
+        number, value = self.established[after]
+        if number < self.total - self.length:
+            # Not found, or no longer in memory
+            return Trend(last[0], last[1], None)
+        return Trend(last[0], last[1], STATUSES[value])
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[Tuple[Status, int]]:
+        capacity: int = len(self.statuses)
+        for offset in range(self.length):
+            index: int = (self.start + offset) % capacity
+            yield STATUSES[self.statuses[index]], self.counts[index]
+
+    def __reversed__(self) -> Iterator[Tuple[Status, int]]:
+        capacity: int = len(self.statuses)
+        for offset in range(self.length - 1, -1, -1):
+            index: int = (self.start + offset) % capacity
+            yield STATUSES[self.statuses[index]], self.counts[index]
+
+    def __eq__(self, other: Any) -> bool:
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'<History: {list(self)!r}>'
+
+
+class HistoryDict(Dict[str, History]):
+    """
+    Dict of histories which creates missing entries like a defaultdict, and
+    converts lists of (status, count) pairs into histories when set
+    """
+    capacity: int
+
+    def __init__(self, capacity: int) -> None:
+        super().__init__()
+        self.capacity = capacity
+
+    def __missing__(self, key: str) -> History:
+        history = self[key] = History(self.capacity)
+        return history
+
+    def __setitem__(
+        self,
+        key: str,
+        values: Iterable[Tuple[Status, int]],
+    ) -> None:
+        if not isinstance(values, History):
+            values = History(self.capacity, values)
+        super().__setitem__(key, values)
+
 
 class Storage:
     """
     Store recent statuses
     """
     path: str
-    data: DefaultDict[str, List[Tuple[Status, int]]]
+    data: HistoryDict
+    counters: Dict[str, Counter]
     max_memory: int
 
+    # Seconds spent waiting for the storage lock on the last acquire
+    lock_wait: float = 0
+
     def __init__(self, max_memory: int = 10) -> None:
-        self.data = defaultdict(list)
+        self.data = HistoryDict(max_memory)
+        self.counters = {}
         self.max_memory = max_memory
 
+    def acquire(self) -> None:
+        """
+        Acquire exclusive access to the stored data
+
+        Storage which can be shared between processes should override this so
+        that overlapping runs are serialised
+        """
+        pass
+
+    def release(self) -> None:
+        pass
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Context manager to hold the storage lock
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
     def load(self) -> None:
         raise NotImplementedError()  # pragma: no cover
 
@@ -33,22 +258,37 @@ class Storage:
     def set(self, key: str, status: Status) -> None:
         """
         Add a status to the memory
+
+        The oldest entry is dropped once there are ``max_memory`` entries
         """
-        count = 1
-        if self.data[key]:
-            last_status: Status
-            last_count: int
-            last_status, last_count = self.data[key][-1]
-            if last_status == status:
-                # Increment the last status rather than creating a new one
-                self.data[key].pop()
-                count = last_count + 1
+        history: History = self.data[key]
+        last: Optional[Tuple[Status, int]] = history.last()
+        if last is not None and last[0] == status:
+            # Increment the last status rather than creating a new one
+            history.increment()
+        else:
+            history.append(status)
 
-        self.data[key].append((status, count))
+    def get_counter(self, key: str) -> Optional[Counter]:
+        """
+        Return the last counter sample stored for a key
+        """
+        return self.counters.get(key)
+
+    def set_counter(self, key: str, counter: Counter) -> None:
+        """
+        Replace the counter sample for a key
+        """
+        self.counters[key] = counter
 
-        # Assert max memory
-        if len(self.data[key]) > self.max_memory:
-            self.data[key] = self.data[key][-self.max_memory:]
+    def trend(self, key: str, after: int) -> Trend:
+        """
+        Return the trend summary of a key for trends at least ``after`` long
+        """
+        history: Optional[History] = self.data.get(key)
+        if history is None:
+            return Trend(None, 0, None)
+        return history.trend(after)
 
     @overload
     def get(self, key: str, grouped: Literal[False]) -> FlatStatus:
@@ -62,9 +302,13 @@ class Storage:
         """
         Generator to return stored statuses, with most recent first
         """
+        history: Optional[History] = self.data.get(key)
+        if history is None:
+            return
+
         status: Status
         count: int
-        for status, count in reversed(self.data[key]):
+        for status, count in reversed(history):
             if grouped:
                 yield status, count
             else:
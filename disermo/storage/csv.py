@@ -2,10 +2,13 @@
 CSV storage
 """
 import csv
+import json
 import os
+from typing import IO, Iterable, Mapping, Optional, Tuple
 
 from ..constants import Status
-from .base import Storage
+from .base import Counter, Storage
+from .files import atomic_write, FileLock
 
 
 class CSV(Storage):
@@ -15,33 +18,112 @@ class CSV(Storage):
         key,status|count,status|count,...
 
     with oldest status first
+
+    Counter samples for rate checks are kept in a JSON file alongside, at
+    ``path.counters.json``.
+
+    Saves are written to a temporary file which then replaces the original,
+    and are flushed to disk if ``fsync`` is set. Unless ``lock`` is false,
+    an advisory lock on ``path.lock`` is held while a node is checked, so
+    that overlapping runs are serialised.
     """
     SEPARATOR = '|'
 
-    def __init__(self, path: str, max_memory: int = 10) -> None:
+    fsync: bool
+    file_lock: Optional[FileLock]
+    counters_changed: bool
+
+    def __init__(
+        self,
+        path: str,
+        max_memory: int = 10,
+        fsync: bool = False,
+        lock: bool = True,
+    ) -> None:
         super().__init__(max_memory=max_memory)
         self.path = path
+        self.fsync = fsync
+        self.file_lock = FileLock(f'{path}.lock') if lock else None
+        self.counters_changed = False
+
+    def acquire(self) -> None:
+        if self.file_lock is not None:
+            self.file_lock.acquire()
+            self.lock_wait = self.file_lock.wait
+
+    def release(self) -> None:
+        if self.file_lock is not None:
+            self.file_lock.release()
 
     def load(self) -> None:
+        self.load_counters()
         if not os.path.exists(self.path):
             return
 
         with open(self.path, 'r') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                self.data[row[0]] = [
-                    (Status(int(status)), int(count))
-                    for (status, count) in [
-                        cell.split(self.SEPARATOR, 1)
-                        for cell in row[1:]
-                    ]
-                ]
+            self.read(file)
 
     def save(self) -> None:
-        with open(self.path, 'w') as file:
-            writer = csv.writer(file)
-            for key, values in self.data.items():
-                writer.writerow([key] + [
-                    f'{status.value}{self.SEPARATOR}{count}'
-                    for status, count in values
-                ])
+        with atomic_write(self.path, fsync=self.fsync) as file:
+            self.write(file, self.data)
+        self.save_counters()
+
+    @property
+    def counters_path(self) -> str:
+        return f'{self.path}.counters.json'
+
+    def set_counter(self, key: str, counter: Counter) -> None:
+        super().set_counter(key, counter)
+        self.counters_changed = True
+
+    def load_counters(self) -> None:
+        if not os.path.exists(self.counters_path):
+            return
+        with open(self.counters_path, 'r') as file:
+            self.counters = {
+                key: Counter(values, timestamp, boot)
+                for key, (values, timestamp, boot) in json.load(file).items()
+            }
+        self.counters_changed = False
+
+    def save_counters(self) -> None:
+        """
+        Write counter samples, if any have been set since they were loaded
+        """
+        if not self.counters_changed:
+            return
+        with atomic_write(self.counters_path, fsync=self.fsync) as file:
+            json.dump({
+                key: [counter.values, counter.time, counter.boot]
+                for key, counter in self.counters.items()
+            }, file)
+        self.counters_changed = False
+
+    def read(self, file: IO) -> None:
+        """
+        Read CSV rows from an open file into memory
+        """
+        reader = csv.reader(file)
+        for row in reader:
+            self.data[row[0]] = [
+                (Status(int(status)), int(count))
+                for (status, count) in [
+                    cell.split(self.SEPARATOR, 1)
+                    for cell in row[1:]
+                ]
+            ]
+
+    def write(
+        self,
+        file: IO,
+        data: Mapping[str, Iterable[Tuple[Status, int]]],
+    ) -> None:
+        """
+        Write CSV rows for the given data to an open file
+        """
+        writer = csv.writer(file)
+        for key, values in data.items():
+            writer.writerow([key] + [
+                f'{status.value}{self.SEPARATOR}{count}'
+                for status, count in values
+            ])
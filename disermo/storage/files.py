@@ -0,0 +1,131 @@
+"""
+Safe file operations for file-based storage
+"""
+from contextlib import contextmanager
+import fcntl
+import os
+import stat
+import tempfile
+import threading
+import time
+from typing import IO, Iterator, Optional
+
+
+# Process umask, read once as reading it means briefly changing it
+_umask: Optional[int] = None
+_umask_lock = threading.Lock()
+
+
+def get_umask() -> int:
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            _umask = os.umask(0o022)
+            os.umask(_umask)
+    return _umask
+
+
+def get_file_mode(path: str) -> int:
+    """
+    Return the permissions for a file written over ``path``: those of the
+    existing file, or the default for a new file under the umask
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~get_umask()
+
+
+@contextmanager
+def atomic_write(
+    path: str,
+    mode: str = 'w',
+    fsync: bool = False,
+) -> Iterator[IO]:
+    """
+    Context manager to write a file by writing a temporary file in the same
+    directory, then renaming it over the original
+
+    The original is left untouched if writing fails. If ``fsync`` is set,
+    the file and directory are flushed to disk before returning. The file
+    keeps the permissions of the original, rather than those of the
+    temporary file.
+    """
+    path = str(path)
+    dirname: str = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(
+        dir=dirname, prefix=f'{os.path.basename(path)}.', suffix='.tmp',
+    )
+    try:
+        os.fchmod(fd, get_file_mode(path))
+        with os.fdopen(fd, mode) as file:
+            yield file
+            file.flush()
+            if fsync:
+                os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if fsync:
+        fsync_dir(dirname)
+
+
+def fsync_dir(dirname: str) -> None:
+    """
+    Flush a directory to disk, so a rename within it is durable
+    """
+    fd: int = os.open(dirname, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FileLock:
+    """
+    Advisory exclusive lock on a lock file
+
+    The lock can be acquired again by the same object without blocking; it
+    is released when it has been released as many times as it was acquired.
+    """
+    path: str
+    file: Optional[IO]
+    depth: int
+    wait: float
+
+    def __init__(self, path: str) -> None:
+        self.path = str(path)
+        self.file = None
+        self.depth = 0
+
+        # Seconds spent waiting for the lock on the last acquire
+        self.wait = 0
+
+    def acquire(self) -> None:
+        if self.depth:
+            self.depth += 1
+            return
+
+        start: float = time.perf_counter()
+        file = open(self.path, 'a')
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            file.close()
+            raise
+        self.wait = time.perf_counter() - start
+        self.file = file
+        self.depth = 1
+
+    def release(self) -> None:
+        if not self.depth:
+            return
+        self.depth -= 1
+        if self.depth or self.file is None:
+            return
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.file.close()
+        self.file = None
@@ -0,0 +1,296 @@
+"""
+Append-only log storage
+"""
+import contextlib
+import glob
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+import zlib
+
+from ..constants import Status
+from .csv import CSV
+from .files import atomic_write, FileLock
+
+
+# Number of logged statuses before the log is compacted into the snapshot
+DEFAULT_COMPACT_AFTER = 1000
+
+
+class Log(CSV):
+    """
+    Store records as a CSV snapshot with an append-only log of changes
+
+    The snapshot at ``path`` is in the same format as CSV storage, after a
+    header line with the generation of the latest log it contains:
+
+        #generation
+        key,status|count,status|count,...
+
+    Each save appends the statuses set since the last save to the log segment
+    ``path.<generation>.log``, one line per status:
+
+        crc32<TAB>status<TAB>key
+
+    Lines are only replayed if they are complete and their checksum matches,
+    so a half-written line is discarded on the next load.
+
+    Once ``compact_after`` statuses have been logged, new statuses are
+    written to a new segment and a background thread writes a new snapshot,
+    then removes the old segments. Compaction does not need the storage
+    lock, so saving never waits for it:
+
+    * segments are only removed once the snapshot containing them has been
+      renamed into place, and a load which finds the snapshot replaced while
+      it was reading starts again
+    * snapshots are written while holding ``path.compact.lock`` (unless
+      ``lock`` is false), and a snapshot is not written over a later
+      generation
+
+    A crash during compaction leaves the old snapshot or segments in place,
+    which are replayed as normal. Snapshots are always flushed to disk; log
+    appends are flushed if ``fsync`` is set.
+    """
+    compact_after: int
+    generation: int
+    logged: int
+    pending: List[Tuple[str, Status]]
+    lock: threading.Lock
+    compactor: Optional[threading.Thread]
+    compact_lock: Optional[FileLock]
+
+    def __init__(
+        self,
+        path: str,
+        max_memory: int = 10,
+        compact_after: int = DEFAULT_COMPACT_AFTER,
+        fsync: bool = False,
+        lock: bool = True,
+    ) -> None:
+        super().__init__(
+            path=path, max_memory=max_memory, fsync=fsync, lock=lock,
+        )
+        self.compact_after = compact_after
+        self.generation = 1
+        self.logged = 0
+        self.pending = []
+        self.lock = threading.Lock()
+        self.compactor = None
+        self.compact_lock = FileLock(f'{path}.compact.lock') if lock else None
+
+    def get_segment_path(self, generation: int) -> str:
+        return f'{self.path}.{generation}.log'
+
+    def get_segments(self) -> Dict[int, str]:
+        """
+        Find existing log segments, keyed by generation
+        """
+        segments: Dict[int, str] = {}
+        for segment_path in glob.glob(f'{glob.escape(str(self.path))}.*.log'):
+            generation: str = segment_path[len(str(self.path)) + 1:-4]
+            if generation.isdigit():
+                segments[int(generation)] = segment_path
+        return segments
+
+    def get_snapshot_id(self) -> Optional[Tuple[int, int]]:
+        """
+        Return the device and inode of the snapshot, or None if there is none
+        """
+        try:
+            stat: os.stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def load(self) -> None:
+        """
+        Load the snapshot and replay newer log segments
+
+        A compaction in another process can replace the snapshot and remove
+        the segments it contains at any time, so if the snapshot is replaced
+        while loading, it is loaded again
+        """
+        while not self.load_snapshot():
+            pass
+
+    def load_snapshot(self) -> bool:
+        """
+        Load the snapshot and replay newer log segments, and return False if
+        the snapshot was replaced while loading
+        """
+        self.data.clear()
+        self.pending = []
+        self.logged = 0
+        self.load_counters()
+
+        # Load snapshot
+        snapshot_generation: int = 0
+        snapshot_id: Optional[Tuple[int, int]] = None
+        try:
+            file = open(self.path, 'r')
+        except FileNotFoundError:
+            pass
+        else:
+            with file:
+                stat: os.stat_result = os.fstat(file.fileno())
+                snapshot_id = (stat.st_dev, stat.st_ino)
+                header: str = file.readline()
+                if header.startswith('#'):
+                    snapshot_generation = int(header[1:])
+                else:
+                    # Plain CSV without a header
+                    file.seek(0)
+                self.read(file)
+
+        # Replay newer segments and remove those already in the snapshot
+        self.generation = snapshot_generation + 1
+        segments: Dict[int, str] = self.get_segments()
+        for generation in sorted(segments):
+            if generation <= snapshot_generation:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(segments[generation])
+                continue
+            try:
+                self.replay(segments[generation])
+            except FileNotFoundError:
+                # Removed by a compaction
+                return False
+            self.generation = generation
+        return self.get_snapshot_id() == snapshot_id
+
+    def replay(self, segment_path: str) -> None:
+        """
+        Apply the statuses in a log segment, and truncate any incomplete or
+        corrupt lines from its end
+        """
+        valid: int = 0
+        with open(segment_path, 'rb') as file:
+            for raw in file:
+                event: Optional[Tuple[str, Status]] = self.parse(raw)
+                if event is None:
+                    break
+                key, status = event
+                super().set(key, status)
+                self.logged += 1
+                valid += len(raw)
+
+        if valid < os.path.getsize(segment_path):
+            with open(segment_path, 'r+b') as file:
+                file.truncate(valid)
+
+    def parse(self, raw: bytes) -> Optional[Tuple[str, Status]]:
+        """
+        Parse a log line, or return None if it is incomplete or corrupt
+        """
+        if not raw.endswith(b'\n'):
+            return None
+        try:
+            checksum, payload = raw[:-1].split(b'\t', 1)
+            if int(checksum, 16) != zlib.crc32(payload):
+                return None
+            status, key = payload.decode('utf-8').split('\t', 1)
+            return key, Status(int(status))
+        except ValueError:
+            return None
+
+    def format(self, key: str, status: Status) -> bytes:
+        payload: bytes = f'{status.value}\t{key}'.encode('utf-8')
+        return b'%08x\t%s\n' % (zlib.crc32(payload), payload)
+
+    def set(self, key: str, status: Status) -> None:
+        super().set(key, status)
+        self.pending.append((key, status))
+
+    def save(self) -> None:
+        """
+        Append pending statuses to the log, and compact if it is too long
+        """
+        if self.pending:
+            with self.lock:
+                with open(
+                    self.get_segment_path(self.generation), 'ab',
+                ) as file:
+                    file.write(b''.join(
+                        self.format(key, status)
+                        for key, status in self.pending
+                    ))
+                    if self.fsync:
+                        file.flush()
+                        os.fsync(file.fileno())
+            self.logged += len(self.pending)
+            self.pending = []
+
+        self.save_counters()
+        if self.logged >= self.compact_after:
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Start a new log segment and write a snapshot in the background
+        """
+        self.wait()
+        with self.lock:
+            generation: int = self.generation
+            data: Dict[str, List[Tuple[Status, int]]] = {
+                key: list(values) for key, values in self.data.items()
+            }
+            self.generation += 1
+            self.logged = 0
+
+            # Create the new segment now, so other processes which load
+            # during the compaction append to it rather than the old one
+            open(self.get_segment_path(self.generation), 'ab').close()
+
+        self.compactor = threading.Thread(
+            target=self.write_snapshot, args=(generation, data),
+        )
+        self.compactor.start()
+
+    def write_snapshot(
+        self,
+        generation: int,
+        data: Dict[str, List[Tuple[Status, int]]],
+    ) -> None:
+        """
+        Write a snapshot including all segments up to the given generation,
+        then remove those segments
+
+        If another process has already written a snapshot of a later
+        generation, only the segments are removed
+        """
+        if self.compact_lock is not None:
+            self.compact_lock.acquire()
+        try:
+            if self.get_snapshot_generation() < generation:
+                with atomic_write(self.path, fsync=True) as file:
+                    file.write(f'#{generation}\n')
+                    self.write(file, data)
+
+            for segment_generation, segment_path in (
+                self.get_segments().items()
+            ):
+                if segment_generation <= generation:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(segment_path)
+        finally:
+            if self.compact_lock is not None:
+                self.compact_lock.release()
+
+    def get_snapshot_generation(self) -> int:
+        """
+        Return the generation of the snapshot, or 0 if there is none
+        """
+        try:
+            with open(self.path, 'r') as file:
+                header: str = file.readline()
+        except FileNotFoundError:
+            return 0
+        return int(header[1:]) if header.startswith('#') else 0
+
+    def wait(self) -> None:
+        """
+        Wait for any background compaction to finish
+        """
+        if self.compactor is not None:
+            self.compactor.join()
+            self.compactor = None
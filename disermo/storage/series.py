@@ -0,0 +1,506 @@
+"""
+Numeric time-series storage for check data
+"""
+from array import array
+import json
+import os
+import time
+from typing import (
+    Any, Collection, Dict, Iterator, List, NamedTuple, Optional, Sequence,
+    Tuple,
+)
+from urllib.parse import quote
+
+from .files import atomic_write
+
+
+# Resolution of each tier in seconds, and the number of buckets it keeps:
+# 1 minute for 2 days, 1 hour for 60 days, 1 day for 2 years
+DEFAULT_TIERS: Tuple[Tuple[int, int], ...] = (
+    (60, 2 * 24 * 60),
+    (60 * 60, 60 * 24),
+    (24 * 60 * 60, 2 * 365),
+)
+
+# Number of samples appended to a series file before it is compacted
+COMPACT_SAMPLES: int = 24 * 60
+
+SUFFIX = '.series'
+
+# Bytes per bucket in a series file: bucket number, min, max, sum and count
+BUCKET_SIZE: int = 5 * 8
+
+# Bytes per sample appended to a series file: timestamp and value
+SAMPLE_SIZE: int = 2 * 8
+
+
+def get_key(labels: Sequence[str]) -> str:
+    """
+    Return the series key for a check from its labels and those of its
+    parents, oldest first
+    """
+    return '/'.join(labels)
+
+
+class Point(NamedTuple):
+    """
+    Summary of the samples in one bucket
+    """
+    # Start of the bucket, in seconds since the epoch
+    time: float
+    min: float
+    max: float
+    avg: float
+    samples: int
+
+
+class Tier:
+    """
+    Fixed-capacity ring buffer of buckets, oldest first
+
+    Each bucket holds the min, max, sum and count of the samples within it,
+    packed in arrays so a bucket costs a few dozen bytes rather than objects.
+    The arrays grow as buckets are added until they reach ``capacity``, then
+    each new bucket replaces the oldest.
+    """
+    __slots__ = (
+        'resolution', 'capacity', 'buckets', 'mins', 'maxs', 'sums',
+        'counts', 'start', 'length',
+    )
+
+    resolution: int
+    capacity: int
+
+    # Bucket numbers, being the bucket start time divided by the resolution
+    buckets: array
+    mins: array
+    maxs: array
+    sums: array
+    counts: array
+    start: int
+    length: int
+
+    def __init__(self, resolution: int, capacity: int) -> None:
+        self.resolution = resolution
+        self.capacity = capacity
+        self.buckets = array('q')
+        self.mins = array('d')
+        self.maxs = array('d')
+        self.sums = array('d')
+        self.counts = array('q')
+        self.start = 0
+        self.length = 0
+
+    @property
+    def span(self) -> int:
+        """
+        Number of seconds the tier holds when full
+        """
+        return self.resolution * self.capacity
+
+    def index(self, offset: int) -> int:
+        """
+        Return the array index of the entry ``offset`` from the oldest
+        """
+        return (self.start + offset) % self.capacity
+
+    def find(self, bucket: int) -> int:
+        """
+        Return the offset of the first entry at or after a bucket number
+        """
+        low: int = 0
+        high: int = self.length
+        while low < high:
+            middle: int = (low + high) // 2
+            if self.buckets[self.index(middle)] < bucket:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def add(self, timestamp: float, value: float) -> None:
+        """
+        Add a sample to its bucket
+
+        Samples older than the newest bucket are added to their bucket if it
+        is still held, otherwise they are dropped
+        """
+        bucket: int = int(timestamp // self.resolution)
+        if self.length:
+            last: int = self.index(self.length - 1)
+            if bucket < self.buckets[last]:
+                offset: int = self.find(bucket)
+                if (
+                    offset < self.length and
+                    self.buckets[self.index(offset)] == bucket
+                ):
+                    self.merge(self.index(offset), value)
+                return
+            if bucket == self.buckets[last]:
+                self.merge(last, value)
+                return
+
+        if self.length < self.capacity:
+            self.buckets.append(bucket)
+            self.mins.append(value)
+            self.maxs.append(value)
+            self.sums.append(value)
+            self.counts.append(1)
+            self.length += 1
+            return
+
+        index: int = self.start
+        self.start = (self.start + 1) % self.capacity
+        self.buckets[index] = bucket
+        self.mins[index] = value
+        self.maxs[index] = value
+        self.sums[index] = value
+        self.counts[index] = 1
+
+    def merge(self, index: int, value: float) -> None:
+        if value < self.mins[index]:
+            self.mins[index] = value
+        if value > self.maxs[index]:
+            self.maxs[index] = value
+        self.sums[index] += value
+        self.counts[index] += 1
+
+    @property
+    def oldest(self) -> Optional[float]:
+        """
+        Start time of the oldest bucket held, or None if empty
+        """
+        if not self.length:
+            return None
+        return self.buckets[self.start] * self.resolution
+
+    def query(self, start: float, end: float) -> Iterator[Point]:
+        """
+        Generate the buckets which hold samples between ``start`` and ``end``
+        """
+        first: int = int(start // self.resolution)
+        last: int = int(end // self.resolution)
+        for offset in range(self.find(first), self.length):
+            index: int = self.index(offset)
+            bucket: int = self.buckets[index]
+            if bucket > last:
+                break
+            count: int = self.counts[index]
+            yield Point(
+                bucket * self.resolution,
+                self.mins[index],
+                self.maxs[index],
+                self.sums[index] / count,
+                count,
+            )
+
+    def ordered(self, values: array) -> array:
+        """
+        Return a copy of one of the arrays, oldest first
+        """
+        end: int = self.start + self.length
+        if end <= len(values):
+            return values[self.start:end]
+        return values[self.start:] + values[:end - len(values)]
+
+    def to_bytes(self) -> bytes:
+        return b''.join(
+            self.ordered(values).tobytes()
+            for values in (
+                self.buckets, self.mins, self.maxs, self.sums, self.counts,
+            )
+        )
+
+    def from_bytes(self, length: int, raw: bytes) -> None:
+        """
+        Load ``length`` buckets written by ``to_bytes``
+        """
+        size: int = length * 8
+        loaded: List[array] = []
+        for number, typecode in enumerate('qdddq'):
+            values = array(typecode)
+            values.frombytes(raw[number * size:(number + 1) * size])
+            loaded.append(values[-self.capacity:])
+        self.buckets, self.mins, self.maxs, self.sums, self.counts = loaded
+        self.start = 0
+        self.length = len(self.buckets)
+
+
+def read_header(file: Any) -> Tuple[Dict[str, Any], int]:
+    """
+    Read the header of a series file, and return it with the offset of the
+    samples appended after its buckets
+    """
+    line: bytes = file.readline()
+    header: Dict[str, Any] = json.loads(line)
+    return header, len(line) + sum(
+        length * BUCKET_SIZE for _, _, length in header['tiers']
+    )
+
+
+class Series:
+    """
+    Samples of one field of one check, rolled up into each tier
+    """
+    __slots__ = ('key', 'field', 'tiers')
+
+    key: str
+    field: str
+    tiers: List[Tier]
+
+    def __init__(
+        self, key: str, field: str, tiers: Sequence[Tuple[int, int]],
+    ) -> None:
+        self.key = key
+        self.field = field
+        self.tiers = [
+            Tier(resolution, capacity) for resolution, capacity in tiers
+        ]
+
+    def add(self, timestamp: float, value: float) -> None:
+        for tier in self.tiers:
+            tier.add(timestamp, value)
+
+    def extend(self, samples: array) -> None:
+        """
+        Add samples from an array of timestamp and value pairs
+        """
+        for index in range(0, len(samples), 2):
+            self.add(samples[index], samples[index + 1])
+
+    def get_tier(
+        self, start: float, end: float, resolution: int = None,
+    ) -> Tier:
+        """
+        Return the tier with the given resolution, or else the finest tier
+        which holds samples from ``start``
+
+        If no tier holds samples that old, return the finest tier which can
+        hold the whole range, so a new series is not queried at the coarsest
+        resolution
+        """
+        if resolution is not None:
+            for tier in self.tiers:
+                if tier.resolution == resolution:
+                    return tier
+            raise ValueError(f'No tier with resolution {resolution}')
+
+        for tier in self.tiers:
+            oldest: Optional[float] = tier.oldest
+            if oldest is not None and oldest <= start:
+                return tier
+        for tier in self.tiers:
+            if tier.span >= end - start:
+                return tier
+        return self.tiers[-1]
+
+    def query(
+        self, start: float, end: float, resolution: int = None,
+    ) -> List[Point]:
+        tier: Tier = self.get_tier(start, end, resolution)
+        return list(tier.query(start, end))
+
+    def write(self, file: Any) -> None:
+        """
+        Write the buckets of every tier, with no appended samples
+        """
+        header: Dict[str, Any] = {
+            'key': self.key,
+            'field': self.field,
+            'tiers': [
+                [tier.resolution, tier.capacity, tier.length]
+                for tier in self.tiers
+            ],
+        }
+        file.write(json.dumps(header).encode('utf-8') + b'\n')
+        for tier in self.tiers:
+            file.write(tier.to_bytes())
+
+    def read(self, file: Any) -> None:
+        """
+        Read buckets written by ``write`` and add any samples appended since;
+        tiers are matched by resolution, so tiers which have been added or
+        removed since are left empty
+        """
+        header: Dict[str, Any]
+        header, _ = read_header(file)
+        tiers: Dict[int, Tier] = {tier.resolution: tier for tier in self.tiers}
+        for resolution, _, length in header['tiers']:
+            raw: bytes = file.read(length * BUCKET_SIZE)
+            tier: Optional[Tier] = tiers.get(resolution)
+            if tier is not None:
+                tier.from_bytes(length, raw)
+
+        # Ignore a sample left partly written by an interrupted save
+        raw = file.read()
+        samples: array = array('d')
+        samples.frombytes(raw[:len(raw) - len(raw) % SAMPLE_SIZE])
+        self.extend(samples)
+
+
+class SeriesStore:
+    """
+    Store numeric check data as time series, keyed by check and field
+
+    Nodes key the series of each check by its label path, using ``get_key``.
+
+    Each sample is rolled up into fixed-size tiers of min/max/avg buckets,
+    by default 1 minute for 2 days, 1 hour for 60 days and 1 day for 2
+    years, so memory and disk use are bounded however long it runs. A query
+    uses the finest tier which covers its start, so a week of one check's
+    latency reads a few hundred hourly buckets.
+
+    If ``path`` is set, each series is kept in its own file in that
+    directory. Series are only read when queried; ``save`` appends the
+    samples added since the last save to the end of their files, and a file
+    is compacted, rolling its appended samples up into its buckets, once it
+    holds ``compact`` appended samples.
+    """
+    path: Optional[str]
+    tiers: Sequence[Tuple[int, int]]
+    compact: int
+    series: Dict[Tuple[str, str], Series]
+
+    # Timestamp and value pairs added since the last save, by key and field
+    pending: Dict[Tuple[str, str], array]
+
+    def __init__(
+        self,
+        path: str = None,
+        tiers: Sequence[Tuple[int, int]] = DEFAULT_TIERS,
+        compact: int = COMPACT_SAMPLES,
+    ) -> None:
+        self.path = None if path is None else str(path)
+        self.tiers = tiers
+        self.compact = compact
+        self.series = {}
+        self.pending = {}
+
+    def get_path(self, key: str, field: str) -> str:
+        assert self.path is not None
+        name: str = f'{quote(key, safe="")}.{quote(field, safe="")}'
+        return os.path.join(self.path, f'{name}{SUFFIX}')
+
+    def get_series(self, key: str, field: str) -> Series:
+        """
+        Return the series for a field, reading it from disk if necessary
+        """
+        series: Optional[Series] = self.series.get((key, field))
+        if series is not None:
+            return series
+
+        series = Series(key, field, self.tiers)
+        if self.path is not None:
+            path: str = self.get_path(key, field)
+            if os.path.exists(path):
+                with open(path, 'rb') as file:
+                    series.read(file)
+            pending: Optional[array] = self.pending.get((key, field))
+            if pending is not None:
+                series.extend(pending)
+        self.series[(key, field)] = series
+        return series
+
+    def add(
+        self, key: str, field: str, value: float, timestamp: float = None,
+    ) -> None:
+        if timestamp is None:
+            timestamp = time.time()
+        if self.path is None:
+            self.get_series(key, field).add(timestamp, value)
+            return
+
+        # Series which have not been queried are not read just to add to them
+        series: Optional[Series] = self.series.get((key, field))
+        if series is not None:
+            series.add(timestamp, value)
+        self.pending.setdefault((key, field), array('d')).extend(
+            (timestamp, value),
+        )
+
+    def record(
+        self,
+        key: str,
+        data: Dict[str, Any],
+        timestamp: float = None,
+        skip: Collection[str] = (),
+    ) -> None:
+        """
+        Add every numeric value in a check's data, except fields in ``skip``
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        for field, value in data.items():
+            if field in skip:
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.add(key, field, value, timestamp=timestamp)
+
+    def query(
+        self,
+        key: str,
+        field: str,
+        start: float,
+        end: float = None,
+        resolution: int = None,
+    ) -> List[Point]:
+        """
+        Return the buckets of a field between ``start`` and ``end``, in
+        seconds since the epoch
+
+        The finest tier which holds samples from ``start`` is used, unless
+        a ``resolution`` is given
+        """
+        if end is None:
+            end = time.time()
+        return self.get_series(key, field).query(start, end, resolution)
+
+    def save(self) -> None:
+        """
+        Append the samples added since the last save to their series files
+        """
+        if self.path is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        pending: Dict[Tuple[str, str], array] = self.pending
+        self.pending = {}
+        for (key, field), samples in pending.items():
+            self.append(key, field, samples)
+
+    def append(self, key: str, field: str, samples: array) -> None:
+        """
+        Append samples to the end of a series file, or compact the file if
+        it would then hold too many appended samples
+        """
+        try:
+            file = open(self.get_path(key, field), 'r+b')
+        except FileNotFoundError:
+            self.rewrite(key, field, samples)
+            return
+
+        with file:
+            _, offset = read_header(file)
+            end: int = file.seek(0, os.SEEK_END)
+            appended: int = (end - offset) // SAMPLE_SIZE
+            if appended + len(samples) // 2 < self.compact:
+                # Drop a sample left partly written by an interrupted save
+                if end != offset + appended * SAMPLE_SIZE:
+                    file.truncate(offset + appended * SAMPLE_SIZE)
+                    file.seek(0, os.SEEK_END)
+                file.write(samples.tobytes())
+                return
+        self.rewrite(key, field, samples)
+
+    def rewrite(self, key: str, field: str, samples: array) -> None:
+        """
+        Rewrite a series file with its appended samples and ``samples``
+        rolled up into its buckets
+        """
+        path: str = self.get_path(key, field)
+        series: Series = Series(key, field, self.tiers)
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                series.read(file)
+        series.extend(samples)
+        with atomic_write(path, mode='wb') as file:
+            series.write(file)
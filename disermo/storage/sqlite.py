@@ -0,0 +1,165 @@
+"""
+SQLite storage
+"""
+import json
+import sqlite3
+from typing import Optional
+
+from ..constants import Status
+from .base import Counter, Storage, Trend
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS history (
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (key, seq)
+) WITHOUT ROWID
+'''
+
+COUNTERS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT NOT NULL PRIMARY KEY,
+    time REAL NOT NULL,
+    boot REAL NOT NULL,
+    counter_values TEXT NOT NULL
+) WITHOUT ROWID
+'''
+
+
+class SQLite(Storage):
+    """
+    Store records in an SQLite database, indexed by key
+
+    Statuses are read and written directly in the database rather than held
+    in memory, so ``max_memory`` can be much larger than with file storage.
+    All statuses set between calls to ``save()`` are written in a single
+    transaction, and the database uses write-ahead logging.
+    """
+    connection: Optional[sqlite3.Connection]
+
+    def __init__(self, path: str, max_memory: int = 10) -> None:
+        super().__init__(max_memory=max_memory)
+        self.path = path
+        self.connection = None
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Return the database connection, opening it if necessary
+        """
+        if self.connection is None:
+            self.connection = sqlite3.connect(
+                str(self.path), check_same_thread=False,
+            )
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute(SCHEMA)
+            self.connection.execute(COUNTERS_SCHEMA)
+            self.connection.commit()
+        return self.connection
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    def load(self) -> None:
+        self.connect()
+
+    def save(self) -> None:
+        self.connect().commit()
+
+    def set(self, key: str, status: Status) -> None:
+        """
+        Add a status to the database
+        """
+        connection: sqlite3.Connection = self.connect()
+        row = connection.execute(
+            'SELECT seq, status FROM history WHERE key = ? '
+            'ORDER BY seq DESC LIMIT 1',
+            (key,),
+        ).fetchone()
+
+        if row is not None and row[1] == status.value:
+            # Increment the last status rather than creating a new one
+            connection.execute(
+                'UPDATE history SET count = count + 1 '
+                'WHERE key = ? AND seq = ?',
+                (key, row[0]),
+            )
+            return
+
+        seq: int = 0 if row is None else row[0] + 1
+        connection.execute(
+            'INSERT INTO history (key, seq, status, count) '
+            'VALUES (?, ?, ?, 1)',
+            (key, seq, status.value),
+        )
+
+        # Assert max memory
+        connection.execute(
+            'DELETE FROM history WHERE key = ? AND seq <= ?',
+            (key, seq - self.max_memory),
+        )
+
+    def get_counter(self, key: str) -> Optional[Counter]:
+        row = self.connect().execute(
+            'SELECT counter_values, time, boot FROM counters WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        return Counter(json.loads(row[0]), row[1], row[2])
+
+    def set_counter(self, key: str, counter: Counter) -> None:
+        self.connect().execute(
+            'INSERT OR REPLACE INTO counters '
+            '(key, time, boot, counter_values) VALUES (?, ?, ?, ?)',
+            (key, counter.time, counter.boot, json.dumps(counter.values)),
+        )
+
+    def trend(self, key: str, after: int) -> Trend:
+        """
+        Return the trend summary of a key using indexed queries
+        """
+        connection: sqlite3.Connection = self.connect()
+        row = connection.execute(
+            'SELECT seq, status, count FROM history WHERE key = ? '
+            'ORDER BY seq DESC LIMIT 1',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return Trend(None, 0, None)
+
+        previous = connection.execute(
+            'SELECT status FROM history WHERE key = ? AND seq < ? '
+            'AND count >= ? ORDER BY seq DESC LIMIT 1',
+            (key, row[0], after),
+        ).fetchone()
+        return Trend(
+            Status(row[1]),
+            row[2],
+            None if previous is None else Status(previous[0]),
+        )
+
+    def get(self, key, grouped=False):
+        """
+        Generator to return stored statuses, with most recent first
+        """
+        cursor = self.connect().execute(
+            'SELECT status, count FROM history WHERE key = ? '
+            'ORDER BY seq DESC',
+            (key,),
+        )
+        value: int
+        count: int
+        for value, count in cursor:
+            status = Status(value)
+            if grouped:
+                yield status, count
+            else:
+                for i in range(count):
+                    yield status
@@ -0,0 +1,89 @@
+"""
+Sweep coordinator, to run checks shared between nodes once
+"""
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import procfs
+from .checks.base import Check, update_all
+from .constants import Status
+from .node import Node
+from .notifiers.dispatch import Dispatcher
+from .storage import Storage
+
+
+class Sweep:
+    """
+    Run the checks of several nodes together
+
+    Checks which have the same class and configuration, such as a
+    ``Web('https://shared-api/')`` in several nodes, are only updated once
+    per sweep; the result is copied to each of them. Each node keeps its own
+    labels, notifiers and storage::
+
+        sweep = Sweep().add(ServerA, storage_a).add(ServerB, storage_b)
+        sweep.run()
+    """
+    nodes: List[Tuple[Node, Storage]]
+    executor: Optional[Executor]
+    dispatcher: Optional[Dispatcher]
+
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        dispatcher: Optional[Dispatcher] = None,
+    ) -> None:
+        self.nodes = []
+        self.executor = executor
+        self.dispatcher = dispatcher
+
+    def add(self, node: Node, storage: Storage) -> 'Sweep':
+        self.nodes.append((node, storage))
+        return self
+
+    def group(self) -> Dict[Tuple[Any, ...], List[Check]]:
+        """
+        Return lists of equivalent checks in all nodes, by their signature
+
+        A check which appears in more than one tree is only listed once
+        """
+        groups: Dict[Tuple[Any, ...], List[Check]] = {}
+        seen: Set[int] = set()
+        for node, _ in self.nodes:
+            for check in node.iter_flat_checks():
+                if id(check) in seen:
+                    continue
+                seen.add(id(check))
+                groups.setdefault(check.get_signature(), []).append(check)
+        return groups
+
+    def update(self, checks: List[Check]) -> None:
+        if self.executor is None:
+            for check in checks:
+                check.refresh()
+        else:
+            update_all(checks, self.executor)
+
+    def run(self) -> Status:
+        """
+        Update each unique check once, then notify and store for each node
+
+        Returns the worst status of all nodes
+        """
+        procfs.reset()
+        for node, storage in self.nodes:
+            node.load_states(storage)
+        groups: List[List[Check]] = list(self.group().values())
+        self.update([checks[0] for checks in groups])
+        for first, *duplicates in groups:
+            for check in duplicates:
+                check.status = first.status
+                check.data = dict(first.data)
+
+        worst: Status = Status.DISABLED
+        for node, storage in self.nodes:
+            status: Status = node.collect()
+            node.commit(storage, dispatcher=self.dispatcher)
+            if status > worst:
+                worst = status
+        return worst
@@ -54,8 +54,11 @@ def camel_to_sentence(val: str) -> str:
 
 
 class Timer:
+    """
+    Measure elapsed time with a monotonic high-resolution clock
+    """
     def __init__(self):
-        self.start = time.time()
+        self.start = time.perf_counter()
 
     def elapsed(self):
-        return time.time() - self.start
+        return time.perf_counter() - self.start
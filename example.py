@@ -5,7 +5,7 @@ Example Disermo script
 from __future__ import annotations
 import sys
 
-from disermo import Node, Check, checks, notifiers, storage
+from disermo import Node, Check, Scheduler, checks, notifiers, storage
 
 
 # Define storage
@@ -20,14 +20,18 @@ cli = notifiers.Stream(sys.stdout)
 
 MyServer = Node('My server').add(
     Check('Storage').add(
-        checks.storage.FreeSpace(drive='/dev/sda1'),
+        checks.storage.FreeSpace('/').every(10),
     ),
     Check('CPU').add(
         checks.sensors.CPUTemperature(),
         checks.system.Load(),
     ),
+    Check('Memory').add(
+        checks.system.Memory(),
+        checks.system.Swap(),
+    ),
     Check('Remote').add(
-        checks.remote.Web('http://example.com'),
+        checks.remote.Web('http://example.com').every(300, jitter=30),
     ),
 ).notify(cli)
 
@@ -36,5 +40,12 @@ def disermo():
     MyServer.check(storage=store)
 
 
+def disermo_daemon():
+    Scheduler(MyServer, storage=store).run_forever()
+
+
 if __name__ == '__main__':
-    disermo()
+    if '--daemon' in sys.argv:
+        disermo_daemon()
+    else:
+        disermo()
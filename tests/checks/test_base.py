@@ -1,6 +1,9 @@
 """
 Test disermo/checks/base.py
 """
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 from disermo.constants import Status
 from disermo.checks.base import Check
 from disermo.notifiers import Notifier
@@ -140,6 +143,68 @@ class TestSubcheck:
         assert tree.status == Status.ERROR
 
 
+class TestRunConcurrent:
+    def gen_tree(self):
+        return MockCheck(Status.DISABLED).add(
+            MockCheck(Status.OK).add(
+                MockCheck(Status.WARN)
+            ),
+            MockCheck(Status.ERROR),
+            MockCheck(Status.OK),
+        )
+
+    def flatten(self, tree):
+        return [(check.status, check.data) for check in tree.iter_tree()]
+
+    def test_iter_tree__depth_first(self):
+        tree = self.gen_tree()
+        assert list(tree.iter_tree()) == [
+            tree,
+            tree.subchecks[0],
+            tree.subchecks[0].subchecks[0],
+            tree.subchecks[1],
+            tree.subchecks[2],
+        ]
+
+    def test_threads__matches_sequential(self):
+        sequential = self.gen_tree()
+        sequential.run()
+
+        concurrent = self.gen_tree()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert concurrent.run(executor=executor) == Status.ERROR
+
+        assert self.flatten(concurrent) == self.flatten(sequential)
+
+    def test_processes__matches_sequential(self):
+        sequential = self.gen_tree()
+        sequential.run()
+
+        concurrent = self.gen_tree()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            assert concurrent.run(executor=executor) == Status.ERROR
+
+        assert self.flatten(concurrent) == self.flatten(sequential)
+
+    def test_arun__matches_sequential(self):
+        sequential = self.gen_tree()
+        sequential.run()
+
+        concurrent = self.gen_tree()
+        assert asyncio.run(concurrent.arun()) == Status.ERROR
+
+        assert self.flatten(concurrent) == self.flatten(sequential)
+
+    def test_detached__tree_links_removed(self):
+        tree = self.gen_tree().notify(Notifier())
+        clone = tree.detached()
+        assert clone is not tree
+        assert clone.subchecks == []
+        assert clone.notifiers == []
+        assert len(tree.subchecks) == 3
+        assert len(tree.notifiers) == 1
+
+
 class TestNotify:
     def test_notify__records_notifiers(self):
         check = Check()
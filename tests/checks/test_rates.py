@@ -0,0 +1,181 @@
+"""
+Test disermo/checks/rates.py
+"""
+from unittest import mock
+
+import pytest
+
+from disermo import procfs
+from disermo.checks.rates import DiskIO, NetworkIO, WRAP_32, WRAP_64, delta
+from disermo.constants import Status
+from disermo.node import Node
+from disermo.storage.base import Counter, Storage
+
+from ..test_procfs import STAT
+
+
+DISKSTATS = (
+    '   8       0 sda 100 0 1000 0 50 0 2000 0 0 500 0 0 0 0 0 0 0\n'
+    '   8       1 sda1 10 0 100 0 5 0 200 0 0 50 0 0 0 0 0 0 0\n'
+)
+
+NET_DEV = (
+    'Inter-|   Receive                            |  Transmit\n'
+    ' face |bytes    packets errs drop fifo frame compressed multicast|'
+    'bytes    packets errs drop fifo colls carrier compressed\n'
+    '  eth0: 1000 10 0 0 0 0 0 0 2000 20 0 0 0 0 0 0\n'
+)
+
+
+class MockStorage(Storage):
+    def load(self):
+        pass
+
+    def save(self):
+        pass
+
+
+@pytest.fixture
+def proc(tmp_path, monkeypatch):
+    (tmp_path / 'net').mkdir()
+    (tmp_path / 'stat').write_text(STAT + 'btime 1000\n')
+    (tmp_path / 'diskstats').write_text(DISKSTATS)
+    (tmp_path / 'net' / 'dev').write_text(NET_DEV)
+    monkeypatch.setattr(procfs, 'shared', procfs.Snapshot(str(tmp_path)))
+    return tmp_path
+
+
+def run_at(check, timestamp):
+    procfs.reset()
+    with mock.patch('time.time', return_value=timestamp):
+        check.update()
+
+
+class TestDelta:
+    def test_increase(self):
+        assert delta(10, 15) == 5
+
+    def test_wrap_32(self):
+        assert delta(WRAP_32 - 10, 5, limit=100) == 15
+
+    def test_wrap_64(self):
+        assert delta(WRAP_64 - 10, 5, limit=100) == 15
+
+    def test_backwards__reset(self):
+        assert delta(5000, 10) is None
+
+    def test_backwards__implausible_wrap__reset(self):
+        assert delta(5000, 10, limit=1e6) is None
+
+
+class TestDiskIO:
+    def test_uid(self):
+        assert DiskIO('sda').uid == 'diskio:sda'
+        assert DiskIO('sda').label == 'Disk IO sda'
+
+    def test_unknown_metric(self):
+        with pytest.raises(ValueError):
+            DiskIO('sda', metric='unknown')
+
+    def test_first_run__sample_only(self, proc):
+        check = DiskIO('sda')
+        run_at(check, 100)
+        assert check.status == Status.OK
+        assert check.data['counters']['reads'] == 100
+        assert check.data['boot'] == 1000
+        assert 'iops' not in check.data
+
+    def test_rates(self, proc):
+        check = DiskIO('sda')
+        check.previous = Counter({
+            'reads': 80, 'writes': 40, 'sectors_read': 800,
+            'sectors_written': 1000, 'io_ms': 0,
+        }, 90, 1000)
+        run_at(check, 100)
+        assert check.data['reads_per_second'] == 2
+        assert check.data['iops'] == 3
+        assert check.data['read_bytes_per_second'] == 200 * 512 / 10
+        assert check.data['write_bytes_per_second'] == 1000 * 512 / 10
+        assert check.data['utilisation'] == 0.05
+        assert check.data['interval'] == 10
+
+    def test_threshold(self, proc):
+        check = DiskIO('sda', metric='iops', warning=2, error=5)
+        check.previous = Counter({
+            'reads': 80, 'writes': 40, 'sectors_read': 0,
+            'sectors_written': 0, 'io_ms': 0,
+        }, 90, 1000)
+        run_at(check, 100)
+        assert check.status == Status.WARN
+
+    def test_reboot__reset(self, proc):
+        check = DiskIO('sda')
+        check.previous = Counter({'reads': 1000000}, 90, 500)
+        run_at(check, 100)
+        assert check.data['reset'] is True
+        assert 'iops' not in check.data
+
+    def test_io_ms_wrapped(self, proc):
+        check = DiskIO('sda')
+        check.previous = Counter({
+            'reads': 100, 'writes': 50, 'sectors_read': 1000,
+            'sectors_written': 2000, 'io_ms': WRAP_32 - 500,
+        }, 90, 1000)
+        run_at(check, 100)
+        assert check.data['utilisation'] == 0.1
+
+    def test_counter_reset__no_rates(self, proc):
+        check = DiskIO('sda')
+        check.previous = Counter({'io_ms': 5000}, 90, 1000)
+        run_at(check, 100)
+        assert check.data['reset'] is True
+        assert 'utilisation' not in check.data
+        assert check.status == Status.OK
+
+    def test_missing_device__error(self, proc):
+        check = DiskIO('sdz')
+        run_at(check, 100)
+        assert check.status == Status.ERROR
+
+
+class TestNetworkIO:
+    def test_rates(self, proc):
+        check = NetworkIO('eth0', error=50)
+        check.previous = Counter({'rx_bytes': 500, 'tx_bytes': 1000}, 90, 1000)
+        run_at(check, 100)
+        assert check.data['rx_bytes_per_second'] == 50
+        assert check.data['tx_bytes_per_second'] == 100
+        assert check.status == Status.OK
+        assert check.uid == 'networkio:eth0'
+
+    def test_interface_recreated__reset(self, proc):
+        check = NetworkIO('eth0', error=50)
+        check.previous = Counter({'rx_packets': 5000}, 90, 1000)
+        run_at(check, 100)
+        assert check.data['reset'] is True
+        assert 'rx_packets_per_second' not in check.data
+        assert check.status == Status.OK
+
+    def test_64_bit_counters__backwards_is_reset(self, proc):
+        check = NetworkIO('eth0')
+        check.previous = Counter(
+            {'rx_bytes': WRAP_32 + 5000, 'tx_bytes': 1500}, 90, 1000,
+        )
+        run_at(check, 100)
+        assert check.data['reset'] is True
+
+
+def test_node_check__counters_persisted(proc):
+    storage = MockStorage()
+    node = Node(label='Node').add(DiskIO('sda'), NetworkIO('eth0'))
+    with mock.patch('time.time', return_value=100):
+        node.check(storage)
+    assert storage.get_counter('diskio:sda').values['reads'] == 100
+
+    # A new tree, as in the next run from cron, picks up the sample
+    (proc / 'diskstats').write_text(DISKSTATS.replace(' 100 ', ' 300 ', 1))
+    node = Node(label='Node').add(DiskIO('sda'))
+    with mock.patch('time.time', return_value=110):
+        node.check(storage)
+    assert node.subchecks[0].data['reads_per_second'] == 20
+    assert storage.get_counter('diskio:sda').time == 110
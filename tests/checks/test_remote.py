@@ -0,0 +1,284 @@
+"""
+Test disermo/checks/remote.py
+"""
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import socket
+import threading
+
+import pytest
+
+from disermo.constants import Status
+from disermo.checks.remote import (
+    ContentMatcher, get_charset, get_host_header, Web,
+)
+from disermo.pool import ConnectionPool
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    ports = set()
+    hosts = []
+
+    def do_GET(self):
+        self.ports.add(self.client_address[1])
+        self.hosts.append(self.headers['Host'])
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', '/')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        content_type = 'text/html'
+        if self.path == '/':
+            content = b'Hello world'
+            self.send_response(200)
+        elif self.path == '/large':
+            content = b'x' * 200000 + b'needle'
+            self.send_response(200)
+        elif self.path == '/latin':
+            content = 'Café'.encode('iso-8859-1')
+            content_type = 'text/html; charset=iso-8859-1'
+            self.send_response(200)
+        else:
+            content = b'Not found'
+            self.send_response(404)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), MockHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestContentMatcher:
+    def test_found(self):
+        matcher = ContentMatcher('world')
+        assert matcher.feed(b'Hello world') is True
+        assert matcher.found is True
+
+    def test_not_found(self):
+        matcher = ContentMatcher('world')
+        assert matcher.feed(b'Hello') is False
+        assert matcher.feed(b' there') is False
+        assert matcher.found is False
+
+    def test_spans_chunks__found(self):
+        matcher = ContentMatcher('world')
+        assert matcher.feed(b'Hello wo') is False
+        assert matcher.feed(b'rld') is True
+        assert matcher.found is True
+
+    def test_spans_many_chunks__found(self):
+        matcher = ContentMatcher('world')
+        for char in b'Hello world':
+            matcher.feed(bytes([char]))
+        assert matcher.found is True
+
+    def test_max_bytes__stops(self):
+        matcher = ContentMatcher('world', max_bytes=8)
+        assert matcher.get_chunk_size() == 8
+        assert matcher.feed(b'Hello world') is True
+        assert matcher.found is False
+        assert matcher.read == 8
+
+    def test_charset__needle_encoded(self):
+        matcher = ContentMatcher('Café', charset='iso-8859-1')
+        matcher.feed('Café'.encode('iso-8859-1'))
+        assert matcher.found is True
+
+    def test_unknown_charset__default_used(self):
+        matcher = ContentMatcher('Café', charset='unknown')
+        matcher.feed('Café'.encode('utf-8'))
+        assert matcher.found is True
+
+    def test_get_charset(self):
+        assert get_charset('text/html; charset=ISO-8859-1') == 'iso-8859-1'
+        assert get_charset('text/html') is None
+        assert get_charset(None) is None
+
+
+class TestUpdate:
+    def test_ok(self, server):
+        check = Web(f'{server}/')
+        check.update()
+        assert check.status == Status.OK
+        assert check.data['status'] == 200
+        assert check.data['elapsed'] >= 0
+
+    def test_content_found(self, server):
+        check = Web(f'{server}/', content_contains='world')
+        check.update()
+        assert check.status == Status.OK
+
+    def test_content_missing(self, server):
+        check = Web(f'{server}/', content_contains='missing')
+        check.update()
+        assert check.status == Status.ERROR
+        assert check.data['error'] == 'Expected content not found'
+
+    def test_content_large__found(self, server):
+        check = Web(f'{server}/large', content_contains='needle')
+        check.update()
+        assert check.status == Status.OK
+
+    def test_content_large__beyond_max_bytes(self, server):
+        check = Web(
+            f'{server}/large',
+            content_contains='needle',
+            max_content_bytes=1000,
+        )
+        check.update()
+        assert check.status == Status.ERROR
+        assert check.data['error'] == 'Expected content not found'
+
+    def test_content_charset(self, server):
+        check = Web(f'{server}/latin', content_contains='Café')
+        check.update()
+        assert check.status == Status.OK
+
+    def test_wrong_status(self, server):
+        check = Web(f'{server}/missing')
+        check.update()
+        assert check.status == Status.ERROR
+        assert check.data['status'] == 404
+
+    def test_redirect__followed(self, server):
+        check = Web(f'{server}/redirect')
+        check.update()
+        assert check.status == Status.OK
+        assert check.data['status'] == 200
+
+    def test_elapsed__split(self, server):
+        check = Web(f'{server}/', pool=ConnectionPool())
+        check.update()
+        assert check.data['elapsed_connect'] > 0
+        assert check.data['elapsed_request'] > 0
+        assert check.data['elapsed'] >= (
+            check.data['elapsed_connect'] + check.data['elapsed_request']
+        )
+
+    def test_pool__connection_reused(self, server):
+        pool = ConnectionPool()
+        checks = [
+            Web(f'{server}/', pool=pool),
+            Web(f'{server}/missing', pool=pool),
+            Web(f'{server}/', pool=pool),
+        ]
+        MockHandler.ports.clear()
+        for check in checks:
+            check.update()
+
+        assert [check.status for check in checks] == [
+            Status.OK, Status.ERROR, Status.OK,
+        ]
+        assert len(MockHandler.ports) == 1
+        assert checks[2].data['elapsed_connect'] == 0
+
+    def test_pool__closed_connection__retried(self, server):
+        pool = ConnectionPool()
+        check = Web(f'{server}/', pool=pool)
+        check.update()
+        for connections in pool.idle.values():
+            for conn, _ in connections:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+
+        check.update()
+        assert check.status == Status.OK
+
+    def test_unreachable(self):
+        check = Web('http://127.0.0.1:1/')
+        check.update()
+        assert check.status == Status.ERROR
+        assert check.data['error'].startswith('Could not reach server')
+
+
+class TestAupdate:
+    def test_ok(self, server):
+        check = Web(f'{server}/', content_contains='world')
+        asyncio.run(check.aupdate())
+        assert check.status == Status.OK
+        assert check.data['status'] == 200
+
+    def test_content_missing(self, server):
+        check = Web(f'{server}/', content_contains='missing')
+        asyncio.run(check.aupdate())
+        assert check.status == Status.ERROR
+        assert check.data['error'] == 'Expected content not found'
+
+    def test_wrong_status(self, server):
+        check = Web(f'{server}/missing')
+        asyncio.run(check.aupdate())
+        assert check.status == Status.ERROR
+        assert check.data['status'] == 404
+
+    def test_content_large__beyond_max_bytes(self, server):
+        check = Web(
+            f'{server}/large',
+            content_contains='needle',
+            max_content_bytes=1000,
+        )
+        asyncio.run(check.aupdate())
+        assert check.status == Status.ERROR
+
+    def test_content_charset(self, server):
+        check = Web(f'{server}/latin', content_contains='Café')
+        asyncio.run(check.aupdate())
+        assert check.status == Status.OK
+
+    def test_redirect__followed(self, server):
+        check = Web(f'{server}/redirect')
+        asyncio.run(check.aupdate())
+        assert check.status == Status.OK
+        assert check.data['status'] == 200
+
+    def test_unreachable(self):
+        check = Web('http://127.0.0.1:1/')
+        asyncio.run(check.aupdate())
+        assert check.status == Status.ERROR
+        assert check.data['error'].startswith('Could not reach server')
+
+    def test_matches_update(self, server):
+        checks = [Web(f'{server}/missing'), Web(f'{server}/missing')]
+        checks[0].update()
+        asyncio.run(checks[1].aupdate())
+        assert checks[0].status == checks[1].status
+        assert checks[0].data['status'] == checks[1].data['status']
+        assert checks[0].data['error'] == checks[1].data['error']
+        assert set(checks[0].data) == set(checks[1].data)
+
+    def test_elapsed__split(self, server):
+        check = Web(f'{server}/')
+        asyncio.run(check.aupdate())
+        assert check.data['elapsed_connect'] > 0
+        assert check.data['elapsed_request'] > 0
+        assert check.data['elapsed'] >= (
+            check.data['elapsed_connect'] + check.data['elapsed_request']
+        )
+
+    def test_host_header(self, server):
+        MockHandler.hosts.clear()
+        asyncio.run(Web(f'{server}/').aupdate())
+        assert MockHandler.hosts == [server[len('http://'):]]
+
+
+def test_get_host_header():
+    assert get_host_header(('http', 'example.com', 80)) == 'example.com'
+    assert get_host_header(('https', 'example.com', 443)) == 'example.com'
+    assert get_host_header(('http', 'example.com', 8080)) == (
+        'example.com:8080'
+    )
+    assert get_host_header(('http', '::1', 80)) == '[::1]'
+    assert get_host_header(('https', '::1', 8443)) == '[::1]:8443'
@@ -0,0 +1,140 @@
+"""
+Test disermo/checks/sensors.py
+"""
+import pytest
+
+from disermo.checks import sensors
+from disermo.checks.sensors import CPUTemperature, Sensor
+from disermo.constants import Status
+
+
+@pytest.fixture(autouse=True)
+def forget():
+    sensors.forget_sensors()
+    yield
+    sensors.forget_sensors()
+
+
+def add_hwmon(root, index, name, temps):
+    device = root / 'hwmon' / f'hwmon{index}'
+    device.mkdir(parents=True)
+    (device / 'name').write_text(f'{name}\n')
+    for number, (label, value) in enumerate(temps, start=1):
+        (device / f'temp{number}_input').write_text(f'{value}\n')
+        if label:
+            (device / f'temp{number}_label').write_text(f'{label}\n')
+    return device
+
+
+def add_zone(root, index, zone_type, value):
+    zone = root / 'thermal' / f'thermal_zone{index}'
+    zone.mkdir(parents=True)
+    (zone / 'type').write_text(f'{zone_type}\n')
+    (zone / 'temp').write_text(f'{value}\n')
+    return zone
+
+
+class TestDiscover:
+    def test_hwmon(self, tmp_path):
+        add_hwmon(tmp_path, 0, 'nvme', [('Composite', 40000)])
+        device = add_hwmon(tmp_path, 1, 'coretemp', [
+            ('Package id 0', 50000), (None, 45000),
+        ])
+        add_zone(tmp_path, 0, 'x86_pkg_temp', 50000)
+        assert sensors.discover(str(tmp_path)) == [
+            Sensor('Package id 0', str(device / 'temp1_input')),
+            Sensor('coretemp temp2', str(device / 'temp2_input')),
+        ]
+
+    def test_hwmon__same_labels__qualified(self, tmp_path):
+        add_hwmon(tmp_path, 0, 'coretemp', [('Core 0', 50000)])
+        add_hwmon(tmp_path, 1, 'coretemp', [
+            ('Core 0', 90000), ('Core 1', 60000),
+        ])
+        found = sensors.discover(str(tmp_path))
+        assert [sensor.label for sensor in found] == [
+            'Core 0 (hwmon0)', 'Core 0 (hwmon1)', 'Core 1',
+        ]
+
+    def test_natural_order(self, tmp_path):
+        device = add_hwmon(tmp_path, 0, 'k10temp', [
+            (f'Tccd{number}', 40000) for number in range(1, 12)
+        ])
+        found = sensors.discover(str(tmp_path))
+        assert found[1].path == str(device / 'temp2_input')
+        assert found[10].path == str(device / 'temp11_input')
+
+    def test_thermal_fallback(self, tmp_path):
+        add_hwmon(tmp_path, 0, 'nvme', [('Composite', 40000)])
+        add_zone(tmp_path, 0, 'acpitz', 30000)
+        zone = add_zone(tmp_path, 1, 'cpu-thermal', 55000)
+        assert sensors.discover(str(tmp_path)) == [
+            Sensor('cpu-thermal thermal_zone1', str(zone / 'temp')),
+        ]
+
+    def test_none(self, tmp_path):
+        assert sensors.discover(str(tmp_path)) == []
+
+
+class TestCPUTemperature:
+    def test_ok(self, tmp_path):
+        add_hwmon(tmp_path, 0, 'coretemp', [
+            ('Core 0', 50000), ('Core 1', 62500),
+        ])
+        check = CPUTemperature(root=str(tmp_path))
+        check.update()
+        assert check.status == Status.OK
+        assert check.data == {
+            'temperatures': {'Core 0': 50.0, 'Core 1': 62.5},
+            'max': 62.5,
+        }
+
+    def test_multi_socket__hottest_kept(self, tmp_path):
+        add_hwmon(tmp_path, 0, 'coretemp', [('Package id 0', 90000)])
+        add_hwmon(tmp_path, 1, 'coretemp', [('Package id 0', 50000)])
+        check = CPUTemperature(root=str(tmp_path))
+        check.update()
+        assert check.data['max'] == 90.0
+        assert len(check.data['temperatures']) == 2
+        assert check.status == Status.WARN
+
+    def test_thresholds(self, tmp_path):
+        add_hwmon(tmp_path, 0, 'coretemp', [('Core 0', 85000)])
+        check = CPUTemperature(root=str(tmp_path))
+        check.update()
+        assert check.status == Status.WARN
+        check = CPUTemperature(root=str(tmp_path), error=84)
+        check.update()
+        assert check.status == Status.ERROR
+
+    def test_no_sensors__disabled(self, tmp_path):
+        check = CPUTemperature(root=str(tmp_path))
+        check.update()
+        assert check.status == Status.DISABLED
+        assert 'error' in check.data
+
+    def test_discovery_cached(self, tmp_path):
+        device = add_hwmon(tmp_path, 0, 'coretemp', [('Core 0', 50000)])
+        check = CPUTemperature(root=str(tmp_path))
+        check.update()
+
+        # New sensors are not found, but known sensors are read again
+        add_hwmon(tmp_path, 1, 'coretemp', [('Core 9', 90000)])
+        (device / 'temp1_input').write_text('60000\n')
+        CPUTemperature(root=str(tmp_path)).update()
+        check.update()
+        assert check.data['temperatures'] == {'Core 0': 60.0}
+
+    def test_sensor_removed__rediscovered(self, tmp_path):
+        device = add_hwmon(tmp_path, 0, 'coretemp', [('Core 0', 50000)])
+        check = CPUTemperature(root=str(tmp_path))
+        check.update()
+
+        (device / 'temp1_input').unlink()
+        add_hwmon(tmp_path, 1, 'coretemp', [('Core 1', 55000)])
+        check.update()
+        assert check.status == Status.ERROR
+
+        check.update()
+        assert check.status == Status.OK
+        assert check.data['temperatures'] == {'Core 1': 55.0}
@@ -0,0 +1,157 @@
+"""
+Test disermo/checks/storage.py
+"""
+import os
+from unittest import mock
+
+import pytest
+
+from disermo import procfs
+from disermo.checks.storage import FreeSpace, Mounts
+from disermo.constants import Status
+
+
+MOUNTINFO = (
+    '23 28 0:22 / /proc rw,relatime - proc proc rw\n'
+    '28 1 8:1 / / rw,relatime - ext4 /dev/sda1 rw\n'
+    '29 28 8:2 / /var rw,relatime - ext4 /dev/sda2 rw\n'
+    '30 28 8:2 /lib/docker /srv/docker rw,relatime - ext4 /dev/sda2 rw\n'
+    '31 28 8:3 / /mnt/my\\040disk rw - xfs /dev/sdb1 rw\n'
+    '32 28 0:30 / /run rw - tmpfs tmpfs rw\n'
+)
+
+
+def statvfs(blocks=100, avail=50, files=100, favail=50):
+    return os.statvfs_result(
+        (4096, 4096, blocks, avail, avail, files, favail, favail, 0, 255),
+    )
+
+
+@pytest.fixture
+def proc(tmp_path, monkeypatch):
+    (tmp_path / 'self').mkdir()
+    (tmp_path / 'self' / 'mountinfo').write_text(MOUNTINFO)
+    monkeypatch.setattr(procfs, 'shared', procfs.Snapshot(str(tmp_path)))
+    return tmp_path
+
+
+class TestFreeSpace:
+    @mock.patch('os.statvfs', side_effect=FileNotFoundError('gone'))
+    def test_unreadable__error(self, statvfs_mock):
+        check = FreeSpace('/mnt/gone')
+        check.update()
+        assert check.status == Status.ERROR
+        assert check.data == {'error': 'Could not read filesystem: gone'}
+
+    @mock.patch('os.statvfs', return_value=statvfs())
+    def test_ok(self, statvfs_mock):
+        check = FreeSpace('/')
+        check.update()
+        assert check.status == Status.OK
+        assert check.data == {
+            'total': 409600,
+            'free': 204800,
+            'inodes_total': 100,
+            'inodes_free': 50,
+        }
+
+    @mock.patch('os.statvfs', return_value=statvfs(avail=8))
+    def test_space_low__warn(self, statvfs_mock):
+        check = FreeSpace('/')
+        check.update()
+        assert check.status == Status.WARN
+
+    @mock.patch('os.statvfs', return_value=statvfs(favail=4))
+    def test_inodes_low__error(self, statvfs_mock):
+        check = FreeSpace('/')
+        check.update()
+        assert check.status == Status.ERROR
+
+    @mock.patch('os.statvfs', return_value=statvfs(files=0, favail=0))
+    def test_no_inodes__space_only(self, statvfs_mock):
+        check = FreeSpace('/')
+        check.update()
+        assert check.status == Status.OK
+        assert 'inodes_total' not in check.data
+
+
+def test_parse_mountinfo():
+    mounts = procfs.parse_mountinfo(MOUNTINFO)
+    assert mounts[1] == procfs.Mount(
+        28, 1, '8:1', '/', '/', 'ext4', '/dev/sda1',
+    )
+    assert mounts[4].mount_point == '/mnt/my disk'
+
+
+class TestMounts:
+    def test_one_subcheck_per_filesystem(self, proc):
+        check = Mounts()
+        assert [sub.drive for sub in check.subchecks] == [
+            '/', '/var', '/mnt/my disk',
+        ]
+        assert [sub.uid for sub in check.subchecks] == [
+            'freespace:/', 'freespace:/var', 'freespace:/mnt/my disk',
+        ]
+        assert check.subchecks[1].label == '/var'
+
+    def test_fstypes(self, proc):
+        check = Mounts(fstypes={'tmpfs', 'xfs'})
+        assert [sub.drive for sub in check.subchecks] == [
+            '/mnt/my disk', '/run',
+        ]
+
+    def test_thresholds_and_overrides(self, proc):
+        check = Mounts(warning=0.3, overrides={'/var': {'error': 0.2}})
+        root, var, _ = check.subchecks
+        assert (root.warning, root.error) == (0.3, 0.05)
+        assert (var.warning, var.error) == (0.3, 0.2)
+
+    def test_run__one_statvfs_per_filesystem(self, proc):
+        check = Mounts()
+        with mock.patch('os.statvfs', return_value=statvfs()) as mocked:
+            assert check.run() == Status.OK
+        assert mocked.call_count == 3
+        assert check.data == {'filesystems': 3}
+
+    def test_missing_mount__error(self, proc):
+        check = Mounts()
+        (proc / 'self' / 'mountinfo').write_text(''.join(
+            line + '\n' for line in MOUNTINFO.splitlines()
+            if ' 8:2 ' not in line
+        ))
+        procfs.reset()
+        check.update()
+        assert check.status == Status.ERROR
+        assert check.data['missing'] == ['/var']
+
+    def test_missing_mount__subcheck_disabled(self, proc):
+        check = Mounts()
+        (proc / 'self' / 'mountinfo').write_text(''.join(
+            line + '\n' for line in MOUNTINFO.splitlines()
+            if ' 8:2 ' not in line
+        ))
+        procfs.reset()
+        with mock.patch('os.statvfs', return_value=statvfs()) as mocked:
+            assert check.run() == Status.ERROR
+        assert mocked.call_count == 2
+        root, var, _ = check.subchecks
+        assert root.status == Status.OK
+        assert var.status == Status.DISABLED
+        assert var.data == {'error': '/var is not mounted'}
+
+    def test_discover__adds_new(self, proc):
+        check = Mounts()
+        (proc / 'self' / 'mountinfo').write_text(
+            MOUNTINFO + '40 28 8:4 / /data rw - ext4 /dev/sdc1 rw\n',
+        )
+        procfs.reset()
+        check.discover()
+        assert [sub.drive for sub in check.subchecks][-1] == '/data'
+        assert len(check.subchecks) == 4
+
+    def test_unreadable__error(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(procfs, 'shared', procfs.Snapshot(str(tmp_path)))
+        check = Mounts()
+        assert check.subchecks == []
+        check.update()
+        assert check.status == Status.ERROR
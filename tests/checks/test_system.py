@@ -0,0 +1,167 @@
+"""
+Test disermo/checks/system.py
+"""
+import builtins
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from disermo import procfs
+from disermo.checks.system import Load, Memory, Swap
+from disermo.constants import Status
+from disermo.node import Node
+from disermo.storage.base import Storage
+
+from ..test_procfs import LOADAVG, MEMINFO, STAT
+
+
+class MockStorage(Storage):
+    def load(self):
+        pass
+
+    def save(self):
+        pass
+
+
+@pytest.fixture
+def proc(tmp_path, monkeypatch):
+    (tmp_path / 'loadavg').write_text(LOADAVG)
+    (tmp_path / 'stat').write_text(STAT)
+    (tmp_path / 'meminfo').write_text(MEMINFO)
+    monkeypatch.setattr(procfs, 'shared', procfs.Snapshot(str(tmp_path)))
+    return tmp_path
+
+
+def write_meminfo(proc, **values):
+    proc.joinpath('meminfo').write_text(''.join(
+        f'{name}: {value} kB\n' for name, value in values.items()
+    ))
+    procfs.reset()
+
+
+class TestLoad:
+    def test_ok(self, proc):
+        check = Load()
+        check.update()
+        assert check.status == Status.OK
+        assert check.data['load_per_cpu'] == 0.5
+        assert check.data['cpus'] == 2
+        assert 'cpu_usage' not in check.data
+
+    def test_thresholds(self, proc):
+        check = Load(period=15, warning=0.5)
+        check.update()
+        assert check.status == Status.WARN
+        check = Load(period=15, warning=0.5, error=0.7)
+        check.update()
+        assert check.status == Status.ERROR
+
+    def test_invalid_period(self):
+        with pytest.raises(ValueError):
+            Load(period=2)
+
+    def test_cpu_usage(self, proc):
+        storage = MockStorage()
+        check = Load()
+        check.update()
+        check.save_state(storage)
+        proc.joinpath('stat').write_text(
+            'cpu  200 10 100 850 40 0 0 0 0 0\ncpu0 0\n',
+        )
+        procfs.reset()
+        check.load_state(storage)
+        check.update()
+        # 150 busy of 200 ticks
+        assert check.data['cpu_usage'] == 0.75
+
+    def test_cpu_usage__rebooted__not_compared(self, proc):
+        storage = MockStorage()
+        check = Load()
+        check.update()
+        check.save_state(storage)
+        proc.joinpath('stat').write_text(
+            'cpu  200 10 100 850 40 0 0 0 0 0\ncpu0 0\nbtime 1800000000\n',
+        )
+        procfs.reset()
+        check.load_state(storage)
+        check.update()
+        assert 'cpu_usage' not in check.data
+
+    def test_cpu_usage__executor(self, proc):
+        storage = MockStorage()
+        node = Node(label='Node').add(Load())
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            node.check(storage, executor=executor)
+            proc.joinpath('stat').write_text(
+                'cpu  200 10 100 850 40 0 0 0 0 0\ncpu0 0\n',
+            )
+            node.check(storage, executor=executor)
+        assert node.subchecks[0].data['cpu_usage'] == 0.75
+
+    def test_missing__error(self, proc):
+        proc.joinpath('loadavg').unlink()
+        check = Load()
+        check.update()
+        assert check.status == Status.ERROR
+        assert 'Could not read procfs' in check.data['error']
+
+
+class TestMemory:
+    def test_ok(self, proc):
+        check = Memory()
+        check.update()
+        assert check.status == Status.OK
+        assert check.data == {'total': 1024000, 'available': 409600}
+
+    def test_low__error(self, proc):
+        write_meminfo(proc, MemTotal=1000, MemFree=10, MemAvailable=40)
+        check = Memory()
+        check.update()
+        assert check.status == Status.ERROR
+
+    def test_no_available__uses_free(self, proc):
+        write_meminfo(proc, MemTotal=1000, MemFree=80)
+        check = Memory()
+        check.update()
+        assert check.status == Status.WARN
+
+
+class TestSwap:
+    def test_ok(self, proc):
+        check = Swap()
+        check.update()
+        assert check.status == Status.OK
+
+    def test_low__warn(self, proc):
+        write_meminfo(proc, SwapTotal=100, SwapFree=30)
+        check = Swap()
+        check.update()
+        assert check.status == Status.WARN
+
+    def test_no_swap__ok(self, proc):
+        write_meminfo(proc, SwapTotal=0, SwapFree=0)
+        check = Swap()
+        check.update()
+        assert check.status == Status.OK
+
+
+def test_node_check__reads_each_file_once(proc, monkeypatch):
+    opened = []
+    real_open = builtins.open
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(str(path))
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(procfs, 'open', counting_open, raising=False)
+    node = Node(label='Node').add(
+        Load(), Load(period=1), Memory(), Swap(),
+    )
+    node.check(MockStorage())
+    assert sorted(opened) == sorted([
+        str(proc / 'loadavg'), str(proc / 'stat'), str(proc / 'meminfo'),
+    ])
+
+    # Each sweep reads the files again
+    node.check(MockStorage())
+    assert len(opened) == 6
@@ -0,0 +1,271 @@
+"""
+Test disermo/notifiers/dispatch.py
+"""
+import os
+import threading
+
+from disermo.constants import Status
+from disermo.notifiers.base import Notifier
+from disermo.notifiers.dispatch import Dispatcher
+from disermo.notifiers.email import Email
+
+from ..test_node import gen_tree, MockStorage
+
+
+class MockNotifier(Notifier):
+    def __init__(self, failures=0, block=None):
+        self.failures = failures
+        self.block = block
+        self.delivered = []
+        self.flushed = 0
+
+    def render(self, node, checks):
+        if not checks:
+            return None
+        return [check.label for check in checks]
+
+    def deliver(self, payload):
+        if self.block is not None:
+            self.block.wait()
+        if self.failures:
+            self.failures -= 1
+            raise ValueError('failed')
+        self.delivered.append(payload)
+
+    def flush(self):
+        self.flushed += 1
+
+
+class InlineNotifier(Notifier):
+    def send(self, node, checks):
+        raise ValueError('failed')
+
+
+def test_submit__delivered_in_background():
+    node, checks = gen_tree()
+    block = threading.Event()
+    notifier = MockNotifier(block=block)
+    dispatcher = Dispatcher()
+
+    dispatcher.submit(notifier, node, MockStorage(), checks[:2])
+    assert notifier.delivered == []
+
+    block.set()
+    dispatcher.join()
+    assert notifier.delivered == [['check 0', 'check 1']]
+    assert notifier.flushed == 1
+    assert dispatcher.stats.delivered == 1
+    dispatcher.close()
+
+
+def test_submit__rendered_when_submitted():
+    node, checks = gen_tree()
+    block = threading.Event()
+    notifier = MockNotifier(block=block)
+    dispatcher = Dispatcher()
+
+    dispatcher.submit(notifier, node, MockStorage(), checks[:1])
+    checks[0].label = 'changed'
+    block.set()
+    dispatcher.join()
+    assert notifier.delivered == [['check 0']]
+    dispatcher.close()
+
+
+def test_submit__nothing_to_send__not_queued():
+    node, checks = gen_tree()
+    notifier = MockNotifier()
+    dispatcher = Dispatcher()
+    dispatcher.submit(notifier, node, MockStorage(), [])
+    assert dispatcher.workers == {}
+    assert dispatcher.stats.submitted == 0
+
+
+def test_deliver__retried_with_backoff():
+    node, checks = gen_tree()
+    notifier = MockNotifier(failures=2)
+    dispatcher = Dispatcher(backoff=0.01)
+
+    dispatcher.submit(notifier, node, MockStorage(), checks[:1])
+    dispatcher.join()
+    assert notifier.delivered == [['check 0']]
+    assert dispatcher.stats.retried == 2
+    assert dispatcher.stats.failed == 0
+    dispatcher.close()
+
+
+def test_deliver__retries_exhausted__failed_in_spool(tmp_path):
+    node, checks = gen_tree()
+    notifier = MockNotifier(failures=10)
+    dispatcher = Dispatcher(spool=tmp_path, retries=1, backoff=0.01)
+
+    dispatcher.submit(notifier, node, MockStorage(), checks[:1])
+    dispatcher.join()
+    assert dispatcher.stats.failed == 1
+    assert [
+        name.endswith('.pickle.failed')
+        for name in os.listdir(tmp_path / 'mocknotifier')
+    ] == [True]
+    dispatcher.close()
+
+
+def test_spool__removed_when_delivered(tmp_path):
+    node, checks = gen_tree()
+    notifier = MockNotifier()
+    dispatcher = Dispatcher(spool=tmp_path)
+
+    dispatcher.submit(notifier, node, MockStorage(), checks[:1])
+    dispatcher.join()
+    assert os.listdir(tmp_path / 'mocknotifier') == []
+    dispatcher.close()
+
+
+def test_spool__recovered_after_restart(tmp_path):
+    node, checks = gen_tree()
+    crashed = Dispatcher(spool=tmp_path)
+    crashed.write_spool(MockNotifier(), ['check 0'])
+
+    notifier = MockNotifier()
+    restarted = Dispatcher(spool=tmp_path)
+    restarted.submit(notifier, node, MockStorage(), checks[1:2])
+    restarted.join()
+    assert notifier.delivered == [['check 0'], ['check 1']]
+    assert os.listdir(tmp_path / 'mocknotifier') == []
+    restarted.close()
+
+
+def test_spool__stale_recovered_once(tmp_path):
+    node, checks = gen_tree()
+    Dispatcher(spool=tmp_path).write_spool(MockNotifier(), ['check 0'])
+
+    first = MockNotifier()
+    second = MockNotifier()
+    restarted = Dispatcher(spool=tmp_path)
+    restarted.submit(first, node, MockStorage(), checks[1:2])
+    restarted.submit(second, node, MockStorage(), checks[2:3])
+    restarted.join()
+    assert first.delivered == [['check 0'], ['check 1']]
+    assert second.delivered == [['check 2']]
+    restarted.close()
+
+
+def test_spool__written_after_start__not_recovered(tmp_path):
+    node, checks = gen_tree()
+    notifier = MockNotifier()
+    dispatcher = Dispatcher(spool=tmp_path)
+    Dispatcher(spool=tmp_path).write_spool(MockNotifier(), ['in flight'])
+
+    dispatcher.submit(notifier, node, MockStorage(), checks[:1])
+    dispatcher.join()
+    assert notifier.delivered == [['check 0']]
+    dispatcher.close()
+
+
+def test_spool__same_key__separate_dirs(tmp_path):
+    node, checks = gen_tree()
+    block = threading.Event()
+    first = MockNotifier(block=block)
+    second = MockNotifier(block=block)
+    dispatcher = Dispatcher(spool=tmp_path)
+
+    dispatcher.submit(first, node, MockStorage(), checks[:1])
+    dispatcher.submit(second, node, MockStorage(), checks[1:2])
+    assert sorted(os.listdir(tmp_path)) == ['mocknotifier', 'mocknotifier-2']
+    assert len(os.listdir(tmp_path / 'mocknotifier')) == 1
+    assert len(os.listdir(tmp_path / 'mocknotifier-2')) == 1
+
+    block.set()
+    dispatcher.join()
+    assert first.delivered == [['check 0']]
+    assert second.delivered == [['check 1']]
+    dispatcher.close()
+
+
+def test_spool_key__email__includes_settings():
+    keys = {
+        Email('ops@example.com', 'a@example.com').spool_key,
+        Email('ops@example.com', 'b@example.com').spool_key,
+        Email('ops@example.com', 'a@example.com', after=1).spool_key,
+    }
+    assert len(keys) == 3
+    assert all(key.startswith('email-ops@example.com-') for key in keys)
+    assert Email('ops@example.com', 'a@example.com').spool_key in keys
+
+
+def test_deliver__spool_file_missing__worker_survives(tmp_path):
+    node, checks = gen_tree()
+    block = threading.Event()
+    notifier = MockNotifier(block=block)
+    dispatcher = Dispatcher(spool=tmp_path)
+
+    dispatcher.submit(notifier, node, MockStorage(), checks[:1])
+    for name in os.listdir(tmp_path / 'mocknotifier'):
+        os.remove(tmp_path / 'mocknotifier' / name)
+    block.set()
+    dispatcher.join()
+
+    dispatcher.submit(notifier, node, MockStorage(), checks[1:2])
+    dispatcher.join()
+    assert notifier.delivered == [['check 0'], ['check 1']]
+    assert dispatcher.workers[notifier].thread.is_alive()
+    dispatcher.close()
+
+
+def test_queue_full__spooled__delivered_later(tmp_path):
+    node, checks = gen_tree()
+    block = threading.Event()
+    notifier = MockNotifier(block=block)
+    dispatcher = Dispatcher(spool=tmp_path, max_size=1)
+
+    for check in checks[:4]:
+        dispatcher.submit(notifier, node, MockStorage(), [check])
+    assert dispatcher.stats.deferred >= 2
+    block.set()
+    dispatcher.join()
+    assert notifier.delivered == [
+        [check.label] for check in checks[:4]
+    ]
+    assert dispatcher.stats.dropped == 0
+    assert os.listdir(tmp_path / 'mocknotifier') == []
+    dispatcher.close()
+
+
+def test_queue_full__dropped():
+    node, checks = gen_tree()
+    block = threading.Event()
+    notifier = MockNotifier(block=block)
+    dispatcher = Dispatcher(max_size=1)
+
+    for check in checks[:3]:
+        dispatcher.submit(notifier, node, MockStorage(), [check])
+    block.set()
+    dispatcher.join()
+    assert dispatcher.stats.dropped >= 1
+    assert len(notifier.delivered) + dispatcher.stats.dropped == 3
+    dispatcher.close()
+
+
+def test_cannot_render__processed_inline_and_errors_logged():
+    node, checks = gen_tree()
+    dispatcher = Dispatcher()
+    dispatcher.submit(InlineNotifier(), node, MockStorage(), checks)
+    assert dispatcher.workers == {}
+
+
+def test_node_check__notifier_failure_does_not_stop_run():
+    node, checks = gen_tree()
+    checks[0].mock_status = Status.ERROR
+    block = threading.Event()
+    notifier = MockNotifier(failures=10, block=block)
+    node.notify(notifier)
+    storage = MockStorage()
+    dispatcher = Dispatcher(retries=0)
+
+    assert node.check(storage, dispatcher=dispatcher) == Status.ERROR
+    assert storage.saved
+    assert storage.data['check 0'] == [(Status.ERROR, 1)]
+
+    block.set()
+    dispatcher.join()
+    assert dispatcher.stats.failed == 1
+    dispatcher.close()
@@ -0,0 +1,117 @@
+"""
+Test disermo/notifiers/email.py
+"""
+import smtplib
+from unittest import mock
+
+from disermo.constants import Status
+from disermo.notifiers.email import Email, SMTPConnection
+
+from ..test_node import gen_tree
+
+
+def gen_notifier(connection=None, to_addr='to@example.com'):
+    return Email(
+        to_addr=to_addr,
+        from_addr='from@example.com',
+        connection=connection,
+    )
+
+
+@mock.patch('smtplib.SMTP')
+def test_send__full_labels_in_tree_order(mock_smtp):
+    node, checks = gen_tree()
+    node.status = Status.ERROR
+    checks[5].status = Status.ERROR
+    notifier = Email(to_addr='to@example.com', from_addr='from@example.com')
+
+    notifier.send(node, [checks[5], checks[0]])
+
+    msg = mock_smtp.return_value.send_message.call_args[0][0]
+    assert msg['Subject'] == '[Disermo] node => Status.ERROR'
+    assert msg['To'] == 'to@example.com'
+    assert msg.get_payload() == (
+        'node > check 0: Disabled\n'
+        'node > check 3 > check 4 > check 5: Error'
+    )
+
+
+@mock.patch('smtplib.SMTP')
+def test_send__nothing_to_send(mock_smtp):
+    node, checks = gen_tree()
+    notifier = Email(to_addr='to@example.com', from_addr='from@example.com')
+    notifier.send(node, [])
+    mock_smtp.assert_not_called()
+
+
+@mock.patch('smtplib.SMTP')
+def test_connection__shared_by_notifiers(mock_smtp):
+    node, checks = gen_tree()
+    connection = SMTPConnection(host='mail.example.com', port=587)
+    notifiers = [gen_notifier(connection), gen_notifier(connection)]
+
+    notifiers[0].send(node, [checks[0]])
+    notifiers[1].send(node, [checks[1]])
+    for notifier in notifiers:
+        notifier.flush()
+
+    mock_smtp.assert_called_once_with('mail.example.com', 587, timeout=30)
+    assert mock_smtp.return_value.send_message.call_count == 2
+    mock_smtp.return_value.quit.assert_called_once()
+    assert connection.smtp is None
+
+
+@mock.patch('smtplib.SMTP')
+def test_connection__starttls_and_login(mock_smtp):
+    connection = SMTPConnection(
+        starttls=True, username='user', password='pass',
+    )
+    connection.connect()
+    mock_smtp.return_value.starttls.assert_called_once()
+    mock_smtp.return_value.login.assert_called_once_with('user', 'pass')
+
+
+@mock.patch('smtplib.SMTP')
+def test_connection__disconnected__reconnects(mock_smtp):
+    first = mock.MagicMock()
+    first.send_message.side_effect = smtplib.SMTPServerDisconnected()
+    second = mock.MagicMock()
+    mock_smtp.side_effect = [first, second]
+    node, checks = gen_tree()
+    connection = SMTPConnection()
+
+    gen_notifier(connection).send(node, [checks[0]])
+
+    second.send_message.assert_called_once()
+
+
+@mock.patch('smtplib.SMTP')
+def test_connection__digest__merged(mock_smtp):
+    node, checks = gen_tree()
+    checks[0].status = Status.ERROR
+    connection = SMTPConnection(digest=True)
+    notifiers = [
+        gen_notifier(connection),
+        gen_notifier(connection),
+        gen_notifier(connection, to_addr='other@example.com'),
+    ]
+
+    for notifier in notifiers:
+        notifier.send(node, [checks[0]])
+    mock_smtp.assert_not_called()
+    notifiers[0].flush()
+
+    mock_smtp.assert_called_once()
+    sent = [
+        call[0][0]
+        for call in mock_smtp.return_value.send_message.call_args_list
+    ]
+    assert len(sent) == 2
+    assert sent[0]['Subject'] == '[Disermo] 2 notifications'
+    assert sent[0]['To'] == 'to@example.com'
+    assert sent[0].get_payload() == (
+        '[Disermo] node => Status.DISABLED\n\nnode > check 0: Error\n\n'
+        '[Disermo] node => Status.DISABLED\n\nnode > check 0: Error'
+    )
+    assert sent[1]['To'] == 'other@example.com'
+    assert sent[1]['Subject'] == '[Disermo] node => Status.DISABLED'
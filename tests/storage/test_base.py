@@ -1,8 +1,25 @@
 """
 Test disermo/storage/base.py
 """
+import random
+
 from disermo.constants import Status
-from disermo.storage.base import Storage
+from disermo.storage.base import History, HistoryDict, Storage, Trend
+
+
+def scan_trend(storage, key, after):
+    """
+    Find the trend by scanning the whole history
+    """
+    grouped = list(storage.get(key, grouped=True))
+    if not grouped:
+        return Trend(None, 0, None)
+    previous = None
+    for status, count in grouped[1:]:
+        if count >= after:
+            previous = status
+            break
+    return Trend(grouped[0][0], grouped[0][1], previous)
 
 
 def test_set():
@@ -78,3 +95,95 @@ def test_get_grouped__returns_groups():
         (Status.WARN, 1),
         (Status.OK, 3),
     ]
+
+
+def test_get__missing__not_created():
+    storage = Storage()
+    assert list(storage.get('key')) == []
+    assert storage.data == {}
+
+
+def test_history__ring_buffer_wraps():
+    history = History(3)
+    for count in range(1, 6):
+        history.append(Status.OK, count)
+    assert list(history) == [
+        (Status.OK, 3), (Status.OK, 4), (Status.OK, 5),
+    ]
+    assert list(reversed(history)) == [
+        (Status.OK, 5), (Status.OK, 4), (Status.OK, 3),
+    ]
+    assert history.last() == (Status.OK, 5)
+    assert len(history) == 3
+
+
+def test_history__increment_after_wrap():
+    history = History(2, [(Status.OK, 1), (Status.WARN, 1), (Status.ERROR, 1)])
+    history.increment()
+    assert history == [(Status.WARN, 1), (Status.ERROR, 2)]
+
+
+def test_history__packed():
+    history = History(10)
+    assert history.statuses.itemsize == 1
+    assert history.capacity == 10
+
+
+def test_history__empty():
+    history = History(2)
+    assert history.last() is None
+    assert history == []
+
+
+def test_history_dict__converts_lists():
+    data = HistoryDict(2)
+    data['key'] = [(Status.OK, 1), (Status.WARN, 1), (Status.ERROR, 1)]
+    assert isinstance(data['key'], History)
+    assert data['key'] == [(Status.WARN, 1), (Status.ERROR, 1)]
+    assert isinstance(data['missing'], History)
+
+
+def test_trend__empty():
+    storage = Storage()
+    assert storage.trend('key', after=3) == Trend(None, 0, None)
+
+
+def test_trend__previous_found():
+    storage = Storage()
+    storage.data['key'] = [
+        (Status.ERROR, 3), (Status.OK, 1), (Status.DISABLED, 2),
+    ]
+    assert storage.trend('key', after=3) == Trend(
+        Status.DISABLED, 2, Status.ERROR,
+    )
+    assert storage.trend('key', after=4) == Trend(Status.DISABLED, 2, None)
+
+
+def test_trend__updated_incrementally():
+    storage = Storage()
+    storage.set('key', Status.OK)
+    storage.set('key', Status.OK)
+    assert storage.trend('key', after=2) == Trend(Status.OK, 2, None)
+    storage.set('key', Status.WARN)
+    assert storage.trend('key', after=2) == Trend(Status.WARN, 1, Status.OK)
+
+
+def test_trend__previous_trimmed__forgotten():
+    storage = Storage(max_memory=2)
+    storage.set('key', Status.OK)
+    storage.set('key', Status.OK)
+    storage.set('key', Status.WARN)
+    assert storage.trend('key', after=2) == Trend(Status.WARN, 1, Status.OK)
+    storage.set('key', Status.ERROR)
+    assert storage.trend('key', after=2) == Trend(Status.ERROR, 1, None)
+
+
+def test_trend__matches_scan():
+    rand = random.Random(0)
+    storage = Storage(max_memory=5)
+    for i in range(500):
+        storage.set('key', rand.choice([Status.OK, Status.OK, Status.ERROR]))
+        for after in (1, 2, 3, 5):
+            assert storage.trend('key', after) == scan_trend(
+                storage, 'key', after,
+            )
@@ -2,6 +2,7 @@
 Test disermo/storage/csv.py
 """
 from disermo.constants import Status
+from disermo.storage.base import Counter
 from disermo.storage.csv import CSV
 
 
@@ -81,3 +82,24 @@ def test_load__does_not_exist__fail_silently(tmp_path):
     storage.load()
 
     assert storage.data == {}
+
+
+def test_counters__saved_alongside(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = CSV(path=test_file)
+    storage.set_counter('key', Counter({'reads': 10}, 100.5, 50))
+    storage.save()
+    assert (tmp_path / 'test.csv.counters.json').exists()
+
+    loaded = CSV(path=test_file)
+    loaded.load()
+    assert loaded.get_counter('key') == Counter({'reads': 10}, 100.5, 50)
+    assert loaded.get_counter('missing') is None
+
+
+def test_counters__unchanged__not_written(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = CSV(path=test_file)
+    storage.set('key', Status.OK)
+    storage.save()
+    assert not (tmp_path / 'test.csv.counters.json').exists()
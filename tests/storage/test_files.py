@@ -0,0 +1,112 @@
+"""
+Test disermo/storage/files.py
+"""
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from disermo.constants import Status
+from disermo.storage.csv import CSV
+from disermo.storage.files import atomic_write, FileLock
+
+
+def test_atomic_write__replaces(tmp_path):
+    path = tmp_path / 'test.txt'
+    path.write_text('old')
+    with atomic_write(path, fsync=True) as file:
+        file.write('new')
+    assert path.read_text() == 'new'
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_atomic_write__error__original_kept(tmp_path):
+    path = tmp_path / 'test.txt'
+    path.write_text('old')
+    with pytest.raises(ValueError):
+        with atomic_write(path) as file:
+            file.write('new')
+            raise ValueError()
+    assert path.read_text() == 'old'
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_atomic_write__mode_kept(tmp_path):
+    path = tmp_path / 'test.txt'
+    path.write_text('old')
+    path.chmod(0o640)
+    with atomic_write(path) as file:
+        file.write('new')
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+
+def test_atomic_write__new_file__umask_applied(tmp_path):
+    path = tmp_path / 'test.txt'
+    umask = os.umask(0)
+    os.umask(umask)
+    with atomic_write(path) as file:
+        file.write('new')
+    assert stat.S_IMODE(path.stat().st_mode) == 0o666 & ~umask
+
+
+def test_file_lock__reentrant(tmp_path):
+    lock = FileLock(tmp_path / 'test.lock')
+    lock.acquire()
+    lock.acquire()
+    lock.release()
+    assert lock.file is not None
+    lock.release()
+    assert lock.file is None
+
+
+def test_file_lock__waits(tmp_path):
+    path = tmp_path / 'test.lock'
+    first = FileLock(path)
+    second = FileLock(path)
+    first.acquire()
+
+    thread = threading.Thread(target=second.acquire)
+    thread.start()
+    time.sleep(0.1)
+    assert second.file is None
+    first.release()
+    thread.join()
+
+    assert second.file is not None
+    assert second.wait >= 0.1
+    second.release()
+
+
+def test_csv_locked__serialised(tmp_path):
+    path = tmp_path / 'test.csv'
+    first = CSV(path=path)
+    second = CSV(path=path)
+
+    def run(storage, status):
+        with storage.locked():
+            storage.load()
+            storage.set('key', status)
+            time.sleep(0.05)
+            storage.save()
+
+    thread = threading.Thread(target=run, args=(second, Status.WARN))
+    with first.locked():
+        thread.start()
+        time.sleep(0.05)
+        first.load()
+        first.set('key', Status.OK)
+        first.save()
+    thread.join()
+
+    assert second.lock_wait > 0
+    assert second.data == {'key': [(Status.OK, 1), (Status.WARN, 1)]}
+
+
+def test_csv_no_lock(tmp_path):
+    storage = CSV(path=tmp_path / 'test.csv', lock=False)
+    with storage.locked():
+        pass
+    assert storage.file_lock is None
+    assert not (tmp_path / 'test.csv.lock').exists()
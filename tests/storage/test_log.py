@@ -0,0 +1,251 @@
+"""
+Test disermo/storage/log.py
+"""
+import os
+import threading
+
+from disermo.constants import Status
+from disermo.storage.base import Counter
+from disermo.storage.log import Log
+
+
+def read(path):
+    with open(path, 'r') as file:
+        lines = file.readlines()
+    return lines
+
+
+def test_save__appends_changes_only(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file)
+    storage.set('key1', Status.OK)
+    storage.set('key2', Status.WARN)
+    storage.save()
+    storage.set('key1', Status.OK)
+    storage.save()
+
+    lines = read(storage.get_segment_path(1))
+    assert len(lines) == 3
+    assert [line.split('\t', 1)[1] for line in lines] == [
+        '1\tkey1\n', '2\tkey2\n', '1\tkey1\n',
+    ]
+    assert not test_file.exists()
+
+
+def test_load__replays_log(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file)
+    storage.set('key1', Status.OK)
+    storage.set('key1', Status.OK)
+    storage.set('key1', Status.WARN)
+    storage.set('key2', Status.ERROR)
+    storage.save()
+
+    loaded = Log(path=test_file)
+    loaded.load()
+    assert loaded.data == {
+        'key1': [(Status.OK, 2), (Status.WARN, 1)],
+        'key2': [(Status.ERROR, 1)],
+    }
+
+
+def test_load__twice__not_doubled(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file)
+    storage.set('key', Status.OK)
+    storage.save()
+    storage.load()
+    storage.load()
+    assert storage.data == {'key': [(Status.OK, 1)]}
+
+
+def test_load__torn_line__discarded_and_truncated(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file)
+    storage.set('key', Status.OK)
+    storage.save()
+    segment = storage.get_segment_path(1)
+    with open(segment, 'ab') as file:
+        file.write(b'1234')
+
+    loaded = Log(path=test_file)
+    loaded.load()
+    assert loaded.data == {'key': [(Status.OK, 1)]}
+    assert len(read(segment)) == 1
+
+    # Appending after a torn line is safe
+    loaded.set('key', Status.WARN)
+    loaded.save()
+    reloaded = Log(path=test_file)
+    reloaded.load()
+    assert reloaded.data == {'key': [(Status.OK, 1), (Status.WARN, 1)]}
+
+
+def test_load__corrupt_line__discarded(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file)
+    storage.set('key', Status.OK)
+    storage.save()
+    segment = storage.get_segment_path(1)
+    with open(segment, 'ab') as file:
+        file.write(b'00000000\t3\tkey\n')
+
+    loaded = Log(path=test_file)
+    loaded.load()
+    assert loaded.data == {'key': [(Status.OK, 1)]}
+
+
+def test_compact__snapshot_written(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file, compact_after=3)
+    storage.set('key', Status.OK)
+    storage.set('key', Status.OK)
+    storage.set('key', Status.WARN)
+    storage.save()
+    storage.wait()
+
+    assert read(test_file) == ['#1\n', 'key,1|2,2|1\n']
+    assert list(storage.get_segments()) == [2]
+    assert storage.generation == 2
+
+    storage.set('key', Status.ERROR)
+    storage.save()
+    loaded = Log(path=test_file)
+    loaded.load()
+    assert loaded.data == {
+        'key': [(Status.OK, 2), (Status.WARN, 1), (Status.ERROR, 1)],
+    }
+
+
+def test_load__compacted_segment_left__not_replayed(tmp_path):
+    """
+    A crash after the snapshot was written but before old segments were
+    removed must not replay them twice
+    """
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file)
+    storage.set('key', Status.OK)
+    storage.save()
+    segment = storage.get_segment_path(1)
+    with open(segment, 'rb') as file:
+        content = file.read()
+    storage.compact()
+    storage.wait()
+    with open(segment, 'wb') as file:
+        file.write(content)
+
+    loaded = Log(path=test_file)
+    loaded.load()
+    assert loaded.data == {'key': [(Status.OK, 1)]}
+    assert list(loaded.get_segments()) == [2]
+
+
+def test_compact__locked__not_waited_for(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file, compact_after=2)
+    started = threading.Event()
+    finish = threading.Event()
+    write_snapshot = storage.write_snapshot
+
+    def blocked_write_snapshot(*args):
+        started.set()
+        finish.wait(5)
+        write_snapshot(*args)
+
+    storage.write_snapshot = blocked_write_snapshot
+    with storage.locked():
+        storage.set('key', Status.OK)
+        storage.set('key', Status.WARN)
+        storage.save()
+    assert started.wait(5)
+
+    # Another process can lock and load while the snapshot is written
+    other = Log(path=test_file)
+    with other.locked():
+        other.load()
+        other.set('key', Status.ERROR)
+        other.save()
+
+    finish.set()
+    storage.wait()
+    assert read(test_file) == ['#1\n', 'key,1|1,2|1\n']
+    loaded = Log(path=test_file)
+    loaded.load()
+    assert loaded.data == {
+        'key': [(Status.OK, 1), (Status.WARN, 1), (Status.ERROR, 1)],
+    }
+
+
+def test_load__compacted_while_loading__reloaded(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    writer = Log(path=test_file)
+    writer.set('key', Status.OK)
+    writer.save()
+
+    # Compact between reading the snapshot and finding segments
+    reader = Log(path=test_file)
+    get_segments = reader.get_segments
+
+    def compact_then_get_segments():
+        reader.get_segments = get_segments
+        writer.compact()
+        writer.wait()
+        return get_segments()
+
+    reader.get_segments = compact_then_get_segments
+    reader.load()
+    assert reader.data == {'key': [(Status.OK, 1)]}
+    assert reader.generation == 2
+
+
+def test_write_snapshot__later_generation__kept(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file)
+    storage.set('key', Status.OK)
+    storage.save()
+    storage.compact()
+    storage.wait()
+    storage.set('key', Status.WARN)
+    storage.save()
+    storage.compact()
+    storage.wait()
+
+    # A slower compaction of the first generation finishes last
+    storage.write_snapshot(1, {'key': [(Status.OK, 1)]})
+    assert read(test_file) == ['#2\n', 'key,1|1,2|1\n']
+
+
+def test_compact__segment_already_removed(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file)
+    storage.set('key', Status.OK)
+    storage.save()
+    segments = storage.get_segments()
+    os.remove(segments[1])
+    storage.get_segments = lambda: segments
+
+    storage.compact()
+    storage.wait()
+    assert read(test_file) == ['#1\n', 'key,1|1\n']
+
+
+def test_load__plain_csv(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    with open(test_file, 'w') as file:
+        file.write('key,1|1,2|1\n')
+
+    storage = Log(path=test_file)
+    storage.load()
+    assert storage.data == {'key': [(Status.OK, 1), (Status.WARN, 1)]}
+
+
+def test_counters__saved_alongside(tmp_path):
+    test_file = tmp_path / 'test.csv'
+    storage = Log(path=test_file)
+    storage.load()
+    storage.set_counter('key', Counter({'rx_bytes': 5}, 1.0, 2.0))
+    storage.save()
+
+    loaded = Log(path=test_file)
+    loaded.load()
+    assert loaded.get_counter('key') == Counter({'rx_bytes': 5}, 1.0, 2.0)
@@ -0,0 +1,284 @@
+"""
+Test disermo/storage/series.py
+"""
+from disermo.checks.base import Check
+from disermo.constants import Status
+from disermo.node import Node
+from disermo.scheduler import Scheduler
+from disermo.storage.base import Storage
+from disermo.storage.series import (
+    Point, Series, SeriesStore, Tier, get_key, read_header,
+)
+
+
+TIERS = ((60, 10), (3600, 5))
+
+
+class TestTier:
+    def test_add__same_bucket__merged(self):
+        tier = Tier(60, 10)
+        tier.add(120, 1)
+        tier.add(150, 3)
+        assert list(tier.query(0, 1000)) == [Point(120, 1, 3, 2, 2)]
+
+    def test_add__full__oldest_dropped(self):
+        tier = Tier(60, 3)
+        for minute in range(5):
+            tier.add(minute * 60, minute)
+        assert [point.time for point in tier.query(0, 1000)] == [
+            120, 180, 240,
+        ]
+        assert tier.oldest == 120
+
+    def test_add__late_sample__merged_into_bucket(self):
+        tier = Tier(60, 10)
+        tier.add(0, 1)
+        tier.add(60, 2)
+        tier.add(120, 3)
+        tier.add(70, 8)
+        tier.add(-600, 5)
+        assert [point.max for point in tier.query(-1000, 1000)] == [1, 8, 3]
+
+    def test_query__range(self):
+        tier = Tier(60, 10)
+        for minute in range(8):
+            tier.add(minute * 60, minute)
+        assert [point.avg for point in tier.query(130, 300)] == [2, 3, 4, 5]
+
+    def test_add__arrays_grow_to_capacity(self):
+        tier = Tier(60, 3)
+        assert len(tier.buckets) == 0
+        tier.add(0, 1)
+        tier.add(60, 2)
+        assert len(tier.buckets) == 2
+        for minute in range(2, 6):
+            tier.add(minute * 60, minute)
+        assert len(tier.buckets) == 3
+
+    def test_query__wrapped(self):
+        tier = Tier(60, 4)
+        for minute in range(10):
+            tier.add(minute * 60, minute)
+        assert [point.avg for point in tier.query(0, 1000)] == [6, 7, 8, 9]
+
+
+class TestSeries:
+    def test_rollups(self):
+        series = Series('web', 'elapsed', TIERS)
+        for minute in range(120):
+            series.add(minute * 60, minute)
+        hourly = series.query(0, 7200, resolution=3600)
+        assert hourly == [
+            Point(0, 0, 59, 29.5, 60),
+            Point(3600, 60, 119, 89.5, 60),
+        ]
+
+    def test_query__finest_covering_tier(self):
+        series = Series('web', 'elapsed', TIERS)
+        for minute in range(120):
+            series.add(minute * 60, minute)
+        # Minutes only go back 10 buckets
+        assert len(series.query(7200 - 300, 7200)) == 5
+        assert len(series.query(0, 7200)) == 2
+
+    def test_query__new_series__finest_tier_spanning_range(self):
+        series = Series('web', 'elapsed', ((60, 10), (600, 10), (3600, 5)))
+        for minute in range(30):
+            series.add(minute * 60, minute)
+        # No tier goes back an hour, but 10 minute buckets span the range
+        assert [point.time for point in series.query(-3600, 1800)] == [
+            0, 600, 1200,
+        ]
+
+
+class TestSeriesStore:
+    def test_record__numeric_only(self):
+        store = SeriesStore(tiers=TIERS)
+        store.record('web', {
+            'elapsed': 0.5, 'status': 200, 'error': 'x', 'ok': True,
+            'nested': {'a': 1},
+        }, timestamp=60)
+        assert set(store.series) == {('web', 'elapsed'), ('web', 'status')}
+        assert store.query('web', 'status', 60, 120) == [
+            Point(60, 200, 200, 200, 1),
+        ]
+
+    def test_record__skip(self):
+        store = SeriesStore(tiers=TIERS)
+        store.record(
+            'load', {'load1': 0.5, 'time': 60.0, 'boot': 1.0},
+            timestamp=60, skip=('time', 'boot'),
+        )
+        assert set(store.series) == {('load', 'load1')}
+
+    def test_save_and_load(self, tmp_path):
+        store = SeriesStore(path=tmp_path / 'series', tiers=TIERS)
+        for minute in range(15):
+            store.add('freespace:/var', 'free', minute, timestamp=minute * 60)
+        store.save()
+        assert len(list((tmp_path / 'series').iterdir())) == 1
+
+        loaded = SeriesStore(path=tmp_path / 'series', tiers=TIERS)
+        assert loaded.query('freespace:/var', 'free', 0, 900) == (
+            store.query('freespace:/var', 'free', 0, 900)
+        )
+        assert loaded.query('freespace:/var', 'free', 0, 900, 3600) == [
+            Point(0, 0, 14, 7, 15),
+        ]
+
+        # New samples continue the loaded series
+        loaded.add('freespace:/var', 'free', 20, timestamp=15 * 60)
+        assert loaded.query('freespace:/var', 'free', 900, 900)[0].avg == 20
+
+    def test_save__unchanged_not_written(self, tmp_path):
+        store = SeriesStore(path=tmp_path, tiers=TIERS)
+        store.add('web', 'elapsed', 1, timestamp=0)
+        store.save()
+        path = tmp_path / 'web.elapsed.series'
+        mtime = path.stat().st_mtime_ns
+        path.write_bytes(b'')
+        store.save()
+        assert path.read_bytes() == b''
+        assert mtime
+
+    def test_save__appends_samples(self, tmp_path):
+        store = SeriesStore(path=tmp_path, tiers=TIERS)
+        store.add('web', 'elapsed', 1, timestamp=0)
+        store.save()
+        path = tmp_path / 'web.elapsed.series'
+        inode = path.stat().st_ino
+        size = path.stat().st_size
+
+        store.add('web', 'elapsed', 2, timestamp=60)
+        store.add('web', 'elapsed', 3, timestamp=120)
+        store.save()
+        assert path.stat().st_ino == inode
+        assert path.stat().st_size == size + 2 * 16
+
+        loaded = SeriesStore(path=tmp_path, tiers=TIERS)
+        assert [
+            point.avg for point in loaded.query('web', 'elapsed', 0, 600)
+        ] == [1, 2, 3]
+
+    def test_save__not_queried__not_read(self, tmp_path):
+        store = SeriesStore(path=tmp_path, tiers=TIERS)
+        store.add('web', 'elapsed', 1, timestamp=0)
+        store.save()
+        assert store.series == {}
+
+        # Unsaved samples are included once the series is read
+        store.add('web', 'elapsed', 2, timestamp=60)
+        assert [
+            point.avg for point in store.query('web', 'elapsed', 0, 600)
+        ] == [1, 2]
+        store.save()
+        store.add('web', 'elapsed', 3, timestamp=120)
+        assert [
+            point.avg for point in store.query('web', 'elapsed', 0, 600)
+        ] == [1, 2, 3]
+
+    def test_save__compacted(self, tmp_path):
+        store = SeriesStore(path=tmp_path, tiers=TIERS, compact=3)
+        path = tmp_path / 'web.elapsed.series'
+        appended = []
+        for minute in range(5):
+            store.add('web', 'elapsed', minute, timestamp=minute * 60)
+            store.save()
+            with open(path, 'rb') as file:
+                _, offset = read_header(file)
+            appended.append((path.stat().st_size - offset) // 16)
+        # Created, appended twice, then compacted once 3 were appended
+        assert appended == [0, 1, 2, 0, 1]
+
+        loaded = SeriesStore(path=tmp_path, tiers=TIERS)
+        assert loaded.query('web', 'elapsed', 0, 600, 3600) == [
+            Point(0, 0, 4, 2, 5),
+        ]
+
+    def test_save__partial_sample__dropped(self, tmp_path):
+        store = SeriesStore(path=tmp_path, tiers=TIERS)
+        store.add('web', 'elapsed', 1, timestamp=0)
+        store.save()
+        path = tmp_path / 'web.elapsed.series'
+        with open(path, 'ab') as file:
+            file.write(b'\x01\x02\x03')
+        assert [
+            point.avg
+            for point in SeriesStore(path=tmp_path, tiers=TIERS).query(
+                'web', 'elapsed', 0, 600,
+            )
+        ] == [1]
+
+        store.add('web', 'elapsed', 2, timestamp=60)
+        store.save()
+        loaded = SeriesStore(path=tmp_path, tiers=TIERS)
+        assert [
+            point.avg for point in loaded.query('web', 'elapsed', 0, 600)
+        ] == [1, 2]
+
+    def test_load__smaller_capacity__newest_kept(self, tmp_path):
+        store = SeriesStore(path=tmp_path, tiers=((60, 10),))
+        for minute in range(10):
+            store.add('web', 'elapsed', minute, timestamp=minute * 60)
+        store.save()
+
+        loaded = SeriesStore(path=tmp_path, tiers=((60, 3),))
+        assert [
+            point.avg for point in loaded.query('web', 'elapsed', 0, 600)
+        ] == [7, 8, 9]
+
+
+class MockCheck(Check):
+    unrecorded_fields = Check.unrecorded_fields + ('time',)
+
+    def __init__(self, label=None, elapsed=0.25):
+        super().__init__(label)
+        self.elapsed = elapsed
+
+    def update(self):
+        self.status = Status.OK
+        self.data = {'elapsed': self.elapsed, 'time': 60.0}
+
+
+class MockStorage(Storage):
+    def load(self):
+        pass
+
+    def save(self):
+        pass
+
+
+def test_node_check__records_data(tmp_path):
+    store = SeriesStore(path=tmp_path)
+    node = Node(label='Node').add(MockCheck(label='Check'))
+    node.check(MockStorage(), series=store)
+    node.check(MockStorage(), series=store)
+    points = SeriesStore(path=tmp_path).query('Node/Check', 'elapsed', 0)
+    assert sum(point.samples for point in points) == 2
+    assert points[-1].avg == 0.25
+
+
+def test_node_check__checks_of_one_class__kept_apart():
+    store = SeriesStore()
+    node = Node(label='Node').add(
+        MockCheck(label='Fast', elapsed=0.1),
+        MockCheck(label='Slow', elapsed=2),
+    )
+    node.check(MockStorage(), series=store)
+    assert set(store.series) == {
+        ('Node/Fast', 'elapsed'), ('Node/Slow', 'elapsed'),
+    }
+    assert store.query('Node/Slow', 'elapsed', 0)[0].avg == 2
+
+
+def test_scheduler__records_by_labels():
+    store = SeriesStore()
+    node = Node(label='Node').add(MockCheck(label='Check'))
+    scheduler = Scheduler(node, MockStorage(), series=store)
+    scheduler.start()
+    scheduler.run_pending()
+    assert set(store.series) == {('Node/Check', 'elapsed')}
+
+
+def test_get_key():
+    assert get_key(['Node', 'Web']) == 'Node/Web'
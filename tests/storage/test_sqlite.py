@@ -0,0 +1,100 @@
+"""
+Test disermo/storage/sqlite.py
+"""
+import random
+
+from disermo.constants import Status
+from disermo.storage.base import Counter, Storage
+from disermo.storage.sqlite import SQLite
+
+
+def rows(storage):
+    return storage.connect().execute(
+        'SELECT key, seq, status, count FROM history ORDER BY key, seq'
+    ).fetchall()
+
+
+def test_load__wal_mode(tmp_path):
+    storage = SQLite(path=tmp_path / 'test.db')
+    storage.load()
+    mode = storage.connect().execute('PRAGMA journal_mode').fetchone()
+    assert mode == ('wal',)
+
+
+def test_set(tmp_path):
+    storage = SQLite(path=tmp_path / 'test.db')
+    storage.set('key', Status.OK)
+    storage.set('key', Status.OK)
+    storage.set('key', Status.WARN)
+    assert rows(storage) == [('key', 0, 1, 2), ('key', 1, 2, 1)]
+
+
+def test_set_over_max__first_in_first_out(tmp_path):
+    storage = SQLite(path=tmp_path / 'test.db', max_memory=2)
+    storage.set('key', Status.OK)
+    storage.set('key', Status.WARN)
+    storage.set('key', Status.WARN)
+    storage.set('key', Status.ERROR)
+    assert list(storage.get('key', grouped=True)) == [
+        (Status.ERROR, 1), (Status.WARN, 2),
+    ]
+
+
+def test_get__returns_all(tmp_path):
+    storage = SQLite(path=tmp_path / 'test.db')
+    storage.set('key', Status.OK)
+    storage.set('key', Status.WARN)
+    storage.set('key', Status.WARN)
+    storage.set('other', Status.ERROR)
+    assert list(storage.get('key')) == [Status.WARN, Status.WARN, Status.OK]
+    assert list(storage.get('missing')) == []
+
+
+def test_save__committed(tmp_path):
+    path = tmp_path / 'test.db'
+    storage = SQLite(path=path)
+    storage.load()
+    storage.set('key', Status.OK)
+    storage.save()
+
+    other = SQLite(path=path)
+    other.load()
+    assert list(other.get('key', grouped=True)) == [(Status.OK, 1)]
+
+
+def test_not_saved__not_committed(tmp_path):
+    path = tmp_path / 'test.db'
+    storage = SQLite(path=path)
+    storage.load()
+    storage.set('key', Status.OK)
+
+    other = SQLite(path=path)
+    other.load()
+    assert list(other.get('key')) == []
+
+
+def test_trend__matches_memory(tmp_path):
+    rand = random.Random(0)
+    storage = SQLite(path=tmp_path / 'test.db', max_memory=5)
+    memory = Storage(max_memory=5)
+    assert storage.trend('key', 2) == memory.trend('key', 2)
+    for i in range(200):
+        status = rand.choice([Status.OK, Status.OK, Status.ERROR])
+        storage.set('key', status)
+        memory.set('key', status)
+        for after in (1, 2, 3):
+            assert storage.trend('key', after) == memory.trend('key', after)
+
+
+def test_counters(tmp_path):
+    path = tmp_path / 'test.db'
+    storage = SQLite(path=path)
+    storage.load()
+    assert storage.get_counter('key') is None
+    storage.set_counter('key', Counter({'reads': 1}, 1.0, 2.0))
+    storage.set_counter('key', Counter({'reads': 3}, 4.0, 2.0))
+    storage.save()
+
+    other = SQLite(path=path)
+    other.load()
+    assert other.get_counter('key') == Counter({'reads': 3}, 4.0, 2.0)
@@ -0,0 +1,52 @@
+"""
+Test benchmarks/
+"""
+import json
+
+from benchmarks.__main__ import main
+from benchmarks.suite import Options, registry, run
+from benchmarks.trees import build_tree, count
+
+
+SMALL = Options(
+    width=2, depth=2, repeat=1, latency=0, web_width=2, web_depth=1,
+    workers=2,
+)
+
+
+def test_build_tree__size():
+    node = build_tree(width=3, depth=2)
+    # Node, 3 branches, 9 leaves
+    assert count(node) == 13
+
+
+def test_run__all_benchmarks():
+    results = dict(run(SMALL))
+    assert set(results) == set(registry)
+    for result in results.values():
+        assert result['min'] <= result['max']
+        assert result['items'] > 0
+
+
+def test_main__writes_json(tmp_path, capsys):
+    path = str(tmp_path / 'results.json')
+    assert main(['--repeat', '1', '-o', path, 'storage']) == 0
+    with open(path) as file:
+        results = json.load(file)
+    assert set(results['results']) == {'storage.set', 'storage.get'}
+    assert results['meta']['options']['repeat'] == 1
+
+
+def test_main__compare_threshold(tmp_path, capsys):
+    path = str(tmp_path / 'results.json')
+    main(['--repeat', '1', '-o', path, 'storage.set'])
+    with open(path) as file:
+        results = json.load(file)
+    results['results']['storage.set']['min'] /= 1000
+    with open(path, 'w') as file:
+        json.dump(results, file)
+
+    assert main([
+        '--repeat', '1', '--compare', path, '--threshold', '2', 'storage.set',
+    ]) == 1
+    assert 'REGRESSION' in capsys.readouterr().err
@@ -0,0 +1,232 @@
+"""
+Test disermo/cache.py
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import threading
+import time
+
+from unittest import mock
+
+from disermo.cache import Cache, CacheEntry, FileCache
+from disermo.checks.base import Check
+from disermo.constants import Status
+from disermo.node import Node
+from disermo.storage.files import atomic_write
+
+from .test_node import MockStorage
+
+
+class CountingCheck(Check):
+    def __init__(self, value: int = 1, status: Status = Status.OK):
+        self.value = value
+        self.done_status = status
+        self.updates = 0
+        super().__init__()
+
+    def update(self):
+        self.updates += 1
+        self.status = self.done_status
+        self.data = {'value': self.value, 'updates': self.updates}
+
+
+class BlockingCheck(CountingCheck):
+    def __init__(self, *args, **kwargs):
+        self.release = threading.Event()
+        self.finished = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def update(self):
+        super().update()
+        if self.updates > 1:
+            self.release.wait(5)
+            self.finished.set()
+
+
+class KeywordCheck(Check):
+    def __init__(self, label, **options):
+        self.options = options
+        super().__init__(label)
+
+
+def age(backend: Cache, check: Check, seconds: float) -> None:
+    key = check.get_cache_key()
+    entry = backend.get(key)
+    backend.set(key, entry._replace(time=entry.time - seconds))
+
+
+class TestCacheKey:
+    def test_same_config__same_key(self):
+        assert CountingCheck(1).get_cache_key() == (
+            CountingCheck(1).get_cache_key()
+        )
+
+    def test_different_config__different_key(self):
+        key = CountingCheck(1).get_cache_key()
+        assert key != CountingCheck(2).get_cache_key()
+        assert key.startswith('countingcheck:')
+
+    def test_state_ignored(self):
+        check = CountingCheck(1)
+        key = check.get_cache_key()
+        check.status = Status.ERROR
+        check.data = {'changed': True}
+        check.label = 'Changed'
+        check.every(10)
+        check.updates = 10
+        check.extra = object()
+        assert check.get_cache_key() == key
+
+    def test_from_constructor_arguments(self):
+        assert CountingCheck(1).get_signature() == (
+            CountingCheck(value=1, status=Status.OK).get_signature()
+        )
+        assert CountingCheck(1).get_signature() != (
+            CountingCheck(1, Status.ERROR).get_signature()
+        )
+
+    def test_label_and_keyword_order_ignored(self):
+        first = KeywordCheck('a', timeout=1, retries=2)
+        second = KeywordCheck('b', retries=2, timeout=1)
+        assert first.get_signature() == second.get_signature()
+        assert first.get_signature() != (
+            KeywordCheck('a', timeout=1).get_signature()
+        )
+
+
+class TestCheckCache:
+    def test_uncached__always_updates(self):
+        check = CountingCheck()
+        check.run()
+        check.run()
+        assert check.updates == 2
+        assert 'cache' not in check.data
+
+    def test_miss_then_hit(self):
+        check = CountingCheck().cache(60, backend=Cache())
+        check.run()
+        assert check.data['cache'] == 'miss'
+        check.run()
+        assert check.updates == 1
+        assert check.status == Status.OK
+        assert check.data['cache'] == 'hit'
+        assert check.data['value'] == 1
+        assert check.data['cache_age'] >= 0
+
+    def test_shared_between_equal_checks(self):
+        backend = Cache()
+        first = CountingCheck().cache(60, backend=backend)
+        second = CountingCheck().cache(60, backend=backend)
+        first.run()
+        second.run()
+        assert first.updates == 1
+        assert second.updates == 0
+        assert second.data['cache'] == 'hit'
+
+    def test_expired__updates(self):
+        backend = Cache()
+        check = CountingCheck().cache(60, backend=backend)
+        check.run()
+        age(backend, check, 61)
+        check.run()
+        assert check.updates == 2
+        assert check.data['cache'] == 'miss'
+
+    def test_stale__served_and_refreshed(self):
+        backend = Cache()
+        check = BlockingCheck().cache(60, stale=True, backend=backend)
+        check.run()
+        age(backend, check, 61)
+
+        check.run()
+        assert check.data['cache'] == 'stale'
+        assert check.data['updates'] == 1
+        assert check.get_cache_key() in backend.refreshing
+
+        # A second stale read does not start another refresh
+        check.run()
+        check.release.set()
+        assert check.finished.wait(5)
+        for _ in range(100):
+            if not backend.refreshing:
+                break
+            time.sleep(0.01)
+
+        # The refresh ran on a detached copy and filled the cache
+        assert check.updates == 1
+        check.run()
+        assert check.data['cache'] == 'hit'
+        assert check.data['updates'] == 2
+
+    def test_executor__only_misses_submitted(self):
+        backend = Cache()
+        cached = CountingCheck(1).cache(60, backend=backend)
+        cached.run()
+        root = Check().add(
+            CountingCheck(1).cache(60, backend=backend),
+            CountingCheck(2),
+        )
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            root.run(executor=executor)
+        assert root.subchecks[0].data['cache'] == 'hit'
+        assert root.subchecks[1].data['updates'] == 1
+
+    def test_arun__uses_cache(self):
+        check = CountingCheck().cache(60, backend=Cache())
+        asyncio.run(check.arun())
+        asyncio.run(check.arun())
+        assert check.updates == 1
+        assert check.data['cache'] == 'hit'
+
+
+class TestFileCache:
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / 'cache.json')
+        cache = FileCache(path)
+        cache.set('key', CacheEntry(Status.ERROR, {'a': 1}, 10.0))
+        cache.flush()
+        entry = FileCache(path).get('key')
+        assert entry == CacheEntry(Status.ERROR, {'a': 1}, 10.0)
+
+    def test_missing_file(self, tmp_path):
+        assert FileCache(str(tmp_path / 'cache.json')).get('key') is None
+
+    def test_set__written_on_flush(self, tmp_path):
+        path = tmp_path / 'cache.json'
+        cache = FileCache(str(path))
+        cache.set('a', CacheEntry(Status.OK, {}, 10.0))
+        cache.set('b', CacheEntry(Status.OK, {}, 10.0))
+        assert not path.exists()
+
+        with mock.patch(
+            'disermo.cache.atomic_write', wraps=atomic_write,
+        ) as writer:
+            cache.flush()
+            cache.flush()
+        assert writer.call_count == 1
+        assert FileCache(str(path)).get('b') is not None
+
+    def test_check_result_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / 'cache.json')
+        Node('node').add(
+            CountingCheck().cache(60, backend=FileCache(path)),
+        ).check(MockStorage())
+        check = CountingCheck().cache(60, backend=FileCache(path))
+        check.run()
+        assert check.updates == 0
+        assert check.data['cache'] == 'hit'
+
+    def test_process_pool(self, tmp_path):
+        path = str(tmp_path / 'cache.json')
+        node = Node('node').add(
+            CountingCheck(value=2).cache(60, backend=FileCache(path)),
+        )
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            node.check(MockStorage(), executor=executor)
+            assert node.subchecks[0].data['cache'] == 'miss'
+            node.check(MockStorage(), executor=executor)
+        assert node.subchecks[0].data['cache'] == 'hit'
+        assert node.subchecks[0].data['value'] == 2
+        assert FileCache(path).get(
+            node.subchecks[0].get_cache_key(),
+        ).data['value'] == 2
@@ -0,0 +1,137 @@
+"""
+Test disermo/fleet.py
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import StringIO
+import os
+import threading
+
+from disermo.checks.base import Check
+from disermo.constants import Status
+from disermo.fleet import Fleet, ShardStats
+from disermo.node import Node
+from disermo.notifiers.stream import Stream
+from disermo.storage.base import Storage
+
+
+class MockCheck(Check):
+    def __init__(self, label, status):
+        self.mock_status = status
+        super().__init__(label=label)
+
+    def get_uid(self):
+        return self.label
+
+    def update(self):
+        self.status = self.mock_status
+        self.data = {'pid': os.getpid()}
+
+
+class RaisingCheck(MockCheck):
+    def update(self):
+        raise ValueError('Broken')
+
+
+class LockedNotifier(Stream):
+    """
+    Notifier which cannot be pickled, like most real notifiers
+    """
+    def __init__(self):
+        super().__init__(StringIO())
+        self.lock = threading.Lock()
+
+
+class MockStorage(Storage):
+    saved = 0
+
+    def load(self):
+        pass
+
+    def save(self):
+        self.saved += 1
+
+
+def gen_fleet(count=5, **kwargs):
+    fleet = Fleet(**kwargs)
+    for index in range(count):
+        status = Status.ERROR if index == 3 else Status.OK
+        node = Node(label=f'Node {index}').add(
+            MockCheck('first', Status.OK),
+            MockCheck('second', status),
+        ).notify(LockedNotifier())
+        fleet.add(node, MockStorage())
+    return fleet
+
+
+def test_split__round_robin():
+    fleet = gen_fleet(5, shards=2)
+    shards = fleet.split()
+    assert [len(shard) for shard in shards] == [3, 2]
+    assert shards[1][0][0].label == 'Node 1'
+
+
+def test_split__more_shards_than_nodes():
+    assert len(gen_fleet(2, shards=4).split()) == 2
+
+
+def test_run__statuses():
+    fleet = gen_fleet(5, shards=2)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        fleet.executor = executor
+        result = fleet.run()
+
+    assert result.worst == Status.ERROR
+    statuses = {node.label: status for node, status in result.statuses.items()}
+    assert statuses == {
+        'Node 0': Status.OK,
+        'Node 1': Status.OK,
+        'Node 2': Status.OK,
+        'Node 3': Status.ERROR,
+        'Node 4': Status.OK,
+    }
+    for node, storage in fleet.nodes:
+        assert storage.saved == 1
+        assert list(storage.get('second')) == [result.statuses[node]]
+
+
+def test_run__shard_stats():
+    fleet = gen_fleet(5, shards=2)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        fleet.executor = executor
+        result = fleet.run()
+    assert [(stats.shard, stats.nodes, stats.checks) for stats in (
+        result.shards
+    )] == [(0, 3, 9), (1, 2, 6)]
+    assert result.elapsed >= max(stats.elapsed for stats in result.shards)
+
+
+def test_run__process_pool():
+    fleet = gen_fleet(4, shards=2)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        fleet.executor = executor
+        result = fleet.run()
+    assert result.worst == Status.ERROR
+    node = fleet.nodes[0][0]
+    assert node.subchecks[0].data['pid'] != os.getpid()
+    assert node.notifiers[0].stream.getvalue().startswith('Node 0: Ok\n')
+
+
+def test_run__process_pool__failing_check():
+    fleet = gen_fleet(4, shards=2)
+    fleet.nodes[0][0].add(RaisingCheck('broken', Status.OK))
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        fleet.executor = executor
+        result = fleet.run()
+
+    node = fleet.nodes[0][0]
+    assert result.statuses[node] == Status.ERROR
+    assert node.subchecks[2].data == {
+        'error': "Check failed: ValueError('Broken')",
+    }
+    for node, storage in fleet.nodes:
+        assert storage.saved == 1
+
+
+def test_shard_stats__throughput():
+    assert ShardStats(shard=0, checks=10, elapsed=2).checks_per_second == 5
+    assert ShardStats(shard=0).checks_per_second == 0
@@ -0,0 +1,156 @@
+"""
+Test disermo/hooks.py
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+import pytest
+
+from disermo import hooks
+from disermo.checks.base import Check
+from disermo.constants import Status
+from disermo.node import Node
+from disermo.notifiers.stream import Stream
+from disermo.storage.base import Storage
+
+
+class MockCheck(Check):
+    def update(self):
+        self.status = Status.OK
+
+
+class MockStorage(Storage):
+    def load(self):
+        pass
+
+    def save(self):
+        pass
+
+
+@pytest.fixture
+def events():
+    recorded = []
+    hook = hooks.add(
+        pre=lambda event, target: recorded.append(('pre', event, target)),
+        post=lambda event, target, elapsed: recorded.append(
+            ('post', event, target),
+        ),
+    )
+    yield recorded
+    hooks.remove(hook)
+
+
+def gen_node():
+    check = MockCheck(label='Check')
+    node = Node(label='Node').add(check)
+    node.notify(Stream(StringIO()))
+    return node, check
+
+
+def test_add__unknown_event__raises():
+    with pytest.raises(ValueError):
+        hooks.add('unknown')
+
+
+def test_event_filter():
+    recorded = []
+    hook = hooks.add('storage.save', post=lambda *args: recorded.append(args))
+    try:
+        node, _ = gen_node()
+        storage = MockStorage()
+        node.check(storage)
+    finally:
+        hooks.remove(hook)
+    assert [(event, target) for event, target, _ in recorded] == [
+        ('storage.save', storage),
+    ]
+    assert recorded[0][2] >= 0
+
+
+def test_remove():
+    hook = hooks.add(post=lambda *args: None)
+    hooks.remove(hook)
+    assert hook not in hooks.registry
+
+
+def test_timed__post_called_on_error(events):
+    with pytest.raises(RuntimeError):
+        with hooks.timed('check.update', 'target'):
+            raise RuntimeError()
+    assert events == [
+        ('pre', 'check.update', 'target'),
+        ('post', 'check.update', 'target'),
+    ]
+
+
+def test_node_check__events(events):
+    node, check = gen_node()
+    storage = MockStorage()
+    notifier = node.notifiers[0]
+    node.check(storage)
+    assert [entry for entry in events if entry[0] == 'post'] == [
+        ('post', 'storage.load', storage),
+        ('post', 'check.update', node),
+        ('post', 'check.update', check),
+        ('post', 'check.run', check),
+        ('post', 'check.run', node),
+        ('post', 'notifier.send', notifier),
+        ('post', 'notifier.process', notifier),
+        ('post', 'storage.save', storage),
+        ('post', 'node.check', node),
+    ]
+
+
+def test_node_check__executor__updates_timed(events):
+    node, check = gen_node()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        node.check(MockStorage(), executor=executor)
+    updates = [entry for entry in events if entry[1] == 'check.update']
+    assert updates == [
+        ('pre', 'check.update', node),
+        ('pre', 'check.update', check),
+        ('post', 'check.update', node),
+        ('post', 'check.update', check),
+    ]
+
+
+def test_node_acheck__events(events):
+    node, check = gen_node()
+    asyncio.run(node.acheck(MockStorage()))
+    posted = {entry[1] for entry in events if entry[0] == 'post'}
+    assert posted == {
+        'check.update', 'storage.load', 'notifier.send', 'notifier.process',
+        'storage.save', 'node.check',
+    }
+
+
+class TestProfiler:
+    def test_records(self):
+        node, check = gen_node()
+        with hooks.Profiler() as profiler:
+            node.check(MockStorage())
+            node.check(MockStorage())
+        assert profiler.hook is None
+
+        timing = profiler.timings[('check.update', 'MockCheck: Check')]
+        assert timing.count == 2
+        assert timing.max <= timing.total
+        assert timing.mean == timing.total / 2
+
+    def test_slowest(self):
+        profiler = hooks.Profiler()
+        profiler.record('check.update', MockCheck(label='Fast'), 0.1)
+        profiler.record('check.update', MockCheck(label='Slow'), 0.5)
+        profiler.record('storage.save', MockStorage(), 1.0)
+        assert [key for key, _ in profiler.slowest('check.update')] == [
+            ('check.update', 'MockCheck: Slow'),
+            ('check.update', 'MockCheck: Fast'),
+        ]
+        assert profiler.slowest(limit=1)[0][0] == (
+            'storage.save', 'MockStorage',
+        )
+        assert profiler.totals() == {
+            'check.update': pytest.approx(0.6), 'storage.save': 1.0,
+        }
+        assert 'MockCheck: Slow' in profiler.report()
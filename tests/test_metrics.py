@@ -0,0 +1,133 @@
+"""
+Test disermo/metrics.py
+"""
+from urllib.request import urlopen
+
+import pytest
+
+from disermo.checks.base import Check
+from disermo.constants import Status
+from disermo.metrics import BATCH_SIZE, CONTENT_TYPE, Exporter, escape
+from disermo.node import Node
+from disermo.storage.base import Storage
+
+
+class MockCheck(Check):
+    def __init__(self, label, status, elapsed=None):
+        self.mock_status = status
+        self.elapsed = elapsed
+        super().__init__(label=label)
+
+    def update(self):
+        self.status = self.mock_status
+        if self.elapsed is not None:
+            self.data = {'elapsed': self.elapsed}
+
+
+class MockStorage(Storage):
+    def load(self):
+        pass
+
+    def save(self):
+        pass
+
+
+@pytest.fixture
+def exporter():
+    node = Node(label='Server').add(
+        MockCheck('Web', Status.OK, elapsed=0.5).add(
+            MockCheck('Say "hi"', Status.ERROR),
+        ),
+    )
+    exporter = Exporter(node).install()
+    node.check(MockStorage())
+    yield exporter
+    exporter.uninstall()
+
+
+def test_escape():
+    assert escape('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+
+
+def test_check_metrics(exporter):
+    lines = list(exporter)
+    assert '# TYPE disermo_check_status gauge\n' in lines
+    # Statuses include the worst status of subchecks
+    assert (
+        'disermo_check_status{node="Server",check="Web",uid="mockcheck"} 3\n'
+    ) in lines
+    assert (
+        'disermo_check_status{node="Server",check="Web/Say \\"hi\\"",'
+        'uid="mockcheck"} 3\n'
+    ) in lines
+    assert (
+        'disermo_check_elapsed_seconds{node="Server",check="Web",'
+        'uid="mockcheck"} 0.5\n'
+    ) in lines
+    elapsed = [
+        line for line in lines
+        if line.startswith('disermo_check_elapsed_seconds{')
+    ]
+    assert len(elapsed) == 1
+
+
+def test_sweep_and_storage_metrics(exporter):
+    text = ''.join(exporter)
+    assert 'disermo_sweeps_total{node="Server"} 1\n' in text
+    assert 'disermo_sweep_duration_seconds{node="Server"} ' in text
+    assert 'disermo_storage_seconds{operation="load"} ' in text
+    assert 'disermo_storage_seconds_total{operation="save"} ' in text
+
+
+def test_families_grouped(exporter):
+    names = [
+        line.split('{')[0].split(' ')[0]
+        for line in exporter if not line.startswith('#')
+    ]
+    # Each family's samples are contiguous
+    seen = []
+    for name in names:
+        if not seen or seen[-1] != name:
+            assert name not in seen
+            seen.append(name)
+
+
+def test_iter_batches__large_tree():
+    node = Node(label='Node').add(*[
+        MockCheck(f'Check {index}', Status.OK)
+        for index in range(BATCH_SIZE * 2)
+    ])
+    node.run()
+    exporter = Exporter(node)
+    batches = list(exporter.iter_batches())
+    assert len(batches) > 1
+    assert b''.join(batches).decode('utf-8') == ''.join(exporter)
+
+
+def test_write_textfile(exporter, tmp_path):
+    path = tmp_path / 'disermo.prom'
+    exporter.write_textfile(str(path))
+    assert path.read_text() == ''.join(exporter)
+    assert [item.name for item in tmp_path.iterdir()] == ['disermo.prom']
+
+
+def test_serve(exporter):
+    server = exporter.serve(port=0)
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+        with urlopen(f'{url}/metrics') as response:
+            assert response.headers['Content-Type'] == CONTENT_TYPE
+            body = response.read().decode('utf-8')
+        assert body == ''.join(exporter)
+
+        with pytest.raises(Exception):
+            urlopen(f'{url}/missing')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_uninstall__stops_recording(exporter):
+    exporter.uninstall()
+    exporter.nodes[0].check(MockStorage())
+    assert 'disermo_sweeps_total{node="Server"} 1\n' in ''.join(exporter)
@@ -1,7 +1,10 @@
 """
 Test disermo/node.py
 """
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from io import StringIO
+import threading
 
 from disermo.checks.base import Check
 from disermo.constants import Status
@@ -36,6 +39,10 @@ class MockStorage(Storage):
 class MockNotifier(Stream):
     def __init__(self):
         super().__init__(StringIO())
+        self.flushed = 0
+
+    def flush(self):
+        self.flushed += 1
 
 
 def gen_tree():
@@ -102,6 +109,101 @@ def test_iter_flat_labelled_checks__tree_is_flattened_with_labels():
     ]
 
 
+def test_get_index__cached():
+    node, checks = gen_tree()
+    index = node.get_index()
+    assert node.get_index() is index
+    assert [entry.check for entry in index] == [node] + checks
+
+
+def test_get_index__add__invalidated():
+    node, checks = gen_tree()
+    node.get_index()
+    check6 = MockCheck('check 6')
+    checks[5].add(check6)
+    assert list(node.iter_flat_labelled_checks())[-1] == (
+        check6, ['node', 'check 3', 'check 4', 'check 5', 'check 6'],
+    )
+
+
+def test_get_labelled_checks__tree_order():
+    node, checks = gen_tree()
+    assert node.get_labelled_checks(
+        [checks[5], checks[0], MockCheck('other'), checks[0]],
+    ) == [
+        (checks[0], ['node', 'check 0']),
+        (checks[5], ['node', 'check 3', 'check 4', 'check 5']),
+    ]
+
+
+def test_iter_flat_checks__large_tree():
+    node = Node('node')
+    parent = node
+    for i in range(200):
+        check = MockCheck(f'parent {i}')
+        check.add(*[MockCheck(f'check {i}.{j}') for j in range(100)])
+        parent.add(check)
+        if i % 10 == 0:
+            parent = check
+
+    checks = list(node.iter_flat_checks())
+    assert len(checks) == 1 + 200 * 101
+    assert checks == list(node.iter_tree())
+
+
+class CountingLabelCheck(MockCheck):
+    reads = 0
+
+    @property
+    def label(self):
+        CountingLabelCheck.reads += 1
+        return self._label
+
+    @label.setter
+    def label(self, value):
+        self._label = value
+
+
+def test_get_index__deep_tree__labels_read_linearly():
+    """
+    Building the index reads no labels, and listing every label path reads
+    each label once, however deep the tree is
+    """
+    node = Node('node')
+    parent = node
+    for i in range(1000):
+        check = CountingLabelCheck(f'check {i}')
+        parent.add(check)
+        parent = check
+
+    CountingLabelCheck.reads = 0
+    index = node.get_index()
+    assert CountingLabelCheck.reads == 0
+    assert [entry.parent for entry in index[:3]] == [-1, 0, 1]
+
+    labelled = list(node.iter_flat_labelled_checks())
+    assert CountingLabelCheck.reads == 1000
+    assert labelled[-1][1][-2:] == ['check 998', 'check 999']
+
+
+class CountingStorage(MockStorage):
+    loads = 0
+
+    def load(self):
+        super().load()
+        self.loads += 1
+
+
+def test_check__storage_loaded_once():
+    node, checks = gen_tree()
+    node.notify(MockNotifier())
+    storage = CountingStorage()
+    node.check(storage)
+    assert storage.loads == 1
+    asyncio.run(node.acheck(storage))
+    assert storage.loads == 2
+
+
 def test_check():
     # Set up tree with notifiers on each node
     node, checks = gen_tree()
@@ -134,5 +236,84 @@ def test_check():
         '      check 5: Disabled\n'
     )
     assert notifierNode.stream.getvalue() == notification
+    assert notifierNode.flushed == 1
     for i in range(6):
         assert notifiers[i].stream.getvalue() == notification
+
+
+def test_check__executor__matches_sequential():
+    node, checks = gen_tree()
+    checks[2].mock_status = Status.WARN
+    checks[4].mock_status = Status.OK
+    storage = MockStorage()
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        assert node.check(storage, executor=executor) == Status.WARN
+
+    assert [check.status for check in node.iter_flat_checks()] == [
+        Status.WARN,
+        Status.DISABLED,
+        Status.WARN,
+        Status.WARN,
+        Status.OK,
+        Status.OK,
+        Status.DISABLED,
+    ]
+    assert storage.saved
+
+
+class LockedNotifier(MockNotifier):
+    """
+    Notifier which cannot be pickled
+    """
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+
+
+def test_check__process_pool__notified_node():
+    node, checks = gen_tree()
+    checks[2].mock_status = Status.WARN
+    notifier = LockedNotifier()
+    node.notify(notifier)
+    storage = MockStorage()
+
+    # The second run has an index cached from the first
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert node.check(storage, executor=executor) == Status.WARN
+        assert node.check(storage, executor=executor) == Status.WARN
+
+    assert notifier.flushed == 2
+    assert storage.data['check 1'] == [(Status.WARN, 2)]
+
+
+def test_detached__index_dropped():
+    node, checks = gen_tree()
+    node.get_index()
+    clone = node.detached()
+    assert '_index' not in vars(clone)
+    assert '_index_positions' not in vars(clone)
+    assert node.get_index() is node.get_index()
+
+
+def test_acheck__matches_check():
+    node, checks = gen_tree()
+    checks[5].mock_status = Status.ERROR
+    notifier = MockNotifier()
+    node.notify(notifier)
+    storage = MockStorage()
+
+    assert asyncio.run(node.acheck(storage)) == Status.ERROR
+
+    assert storage.loaded
+    assert storage.saved
+    assert storage.data['check 3'] == [(Status.ERROR, 1)]
+    assert notifier.stream.getvalue() == (
+        'node: Error\n'
+        '  check 0: Disabled\n'
+        '  check 1: Disabled\n'
+        '    check 2: Disabled\n'
+        '  check 3: Error\n'
+        '    check 4: Error\n'
+        '      check 5: Error\n'
+    )
@@ -0,0 +1,79 @@
+"""
+Test disermo/pool.py
+"""
+from unittest import mock
+
+from disermo.pool import ConnectionPool
+
+
+KEY = ('http', 'example.com', 80)
+
+
+class MockResponse:
+    will_close = False
+
+    def isclosed(self):
+        return True
+
+
+def test_acquire__empty__new_connection():
+    pool = ConnectionPool()
+    conn, reused = pool.acquire(KEY, timeout=5)
+    assert reused is False
+    assert conn.host == 'example.com'
+    assert conn.timeout == 5
+
+
+def test_acquire__https__shares_context():
+    pool = ConnectionPool()
+    conn1, _ = pool.acquire(('https', 'example.com', 443), timeout=5)
+    conn2, _ = pool.acquire(('https', 'example.com', 443), timeout=5)
+    assert conn1._context is conn2._context
+
+
+def test_release__reused():
+    pool = ConnectionPool()
+    conn, _ = pool.acquire(KEY, timeout=5)
+    pool.release(KEY, conn, MockResponse())
+    reused_conn, reused = pool.acquire(KEY, timeout=5)
+    assert reused is True
+    assert reused_conn is conn
+
+
+def test_release__will_close__not_reused():
+    pool = ConnectionPool()
+    conn, _ = pool.acquire(KEY, timeout=5)
+    response = MockResponse()
+    response.will_close = True
+    pool.release(KEY, conn, response)
+    assert KEY not in pool.idle
+
+
+def test_release__over_max_size__oldest_closed():
+    pool = ConnectionPool(max_size=2)
+    conns = [mock.MagicMock() for i in range(3)]
+    for conn in conns:
+        pool.release(KEY, conn, MockResponse())
+    assert [conn for conn, _ in pool.idle[KEY]] == conns[1:]
+    conns[0].close.assert_called_once()
+
+
+def test_acquire__idle_timeout__evicted():
+    pool = ConnectionPool(idle_timeout=10)
+    conn = mock.MagicMock()
+    with mock.patch('time.monotonic', return_value=100):
+        pool.release(KEY, conn, MockResponse())
+    with mock.patch('time.monotonic', return_value=111):
+        new_conn, reused = pool.acquire(KEY, timeout=5)
+    assert reused is False
+    assert new_conn is not conn
+    conn.close.assert_called_once()
+
+
+def test_clear__all_closed():
+    pool = ConnectionPool()
+    conn = mock.MagicMock()
+    pool.release(KEY, conn, MockResponse())
+    pool.clear()
+    assert pool.idle == {}
+    conn.close.assert_called_once()
@@ -0,0 +1,96 @@
+"""
+Test disermo/procfs.py
+"""
+import time
+
+from disermo import procfs
+
+
+LOADAVG = '0.50 1.00 1.50 3/72 20843\n'
+
+STAT = (
+    'cpu  100 10 50 800 40 0 0 0 0 0\n'
+    'cpu0 50 5 25 400 20 0 0 0 0 0\n'
+    'cpu1 50 5 25 400 20 0 0 0 0 0\n'
+    'intr 161708 0 0\n'
+    'procs_running 3\n'
+    'procs_blocked 1\n'
+)
+
+MEMINFO = (
+    'MemTotal:        1000 kB\n'
+    'MemFree:          200 kB\n'
+    'MemAvailable:     400 kB\n'
+    'SwapTotal:        100 kB\n'
+    'SwapFree:          80 kB\n'
+    'HugePages_Total:    0\n'
+)
+
+
+def test_parse_loadavg():
+    assert procfs.parse_loadavg(LOADAVG) == procfs.LoadAvg(
+        0.5, 1.0, 1.5, 3, 72,
+    )
+
+
+def test_parse_stat():
+    stat = procfs.parse_stat(STAT)
+    # Idle and iowait are not busy
+    assert stat.cpu == procfs.CPUTimes(busy=160, total=1000)
+    assert stat.cpus == 2
+    assert stat.procs_running == 3
+    assert stat.procs_blocked == 1
+
+
+def test_parse_meminfo():
+    meminfo = procfs.parse_meminfo(MEMINFO)
+    assert meminfo['MemTotal'] == 1000 * 1024
+    assert meminfo['HugePages_Total'] == 0
+
+
+class TestSnapshot:
+    def test_read_once(self, tmp_path):
+        (tmp_path / 'loadavg').write_text(LOADAVG)
+        snapshot = procfs.Snapshot(root=str(tmp_path))
+        assert snapshot.loadavg().load1 == 0.5
+        (tmp_path / 'loadavg').write_text('9.00 9.00 9.00 1/1 1\n')
+        assert snapshot.loadavg().load1 == 0.5
+
+    def test_reset(self, tmp_path):
+        (tmp_path / 'loadavg').write_text(LOADAVG)
+        snapshot = procfs.Snapshot(root=str(tmp_path))
+        snapshot.loadavg()
+        (tmp_path / 'loadavg').write_text('9.00 9.00 9.00 1/1 1\n')
+        snapshot.reset()
+        assert snapshot.loadavg().load1 == 9.0
+
+    def test_kept_until_reset(self, tmp_path):
+        (tmp_path / 'loadavg').write_text(LOADAVG)
+        snapshot = procfs.Snapshot(root=str(tmp_path))
+        snapshot.loadavg()
+        (tmp_path / 'loadavg').write_text('9.00 9.00 9.00 1/1 1\n')
+        time.sleep(0.02)
+        assert snapshot.loadavg().load1 == 0.5
+
+    def test_join(self, tmp_path):
+        """
+        A worker's snapshot is only reset when it joins a new sweep
+        """
+        (tmp_path / 'loadavg').write_text(LOADAVG)
+        parent = procfs.Snapshot(root=str(tmp_path))
+        worker = procfs.Snapshot(root=str(tmp_path))
+        worker.join(parent.sweep)
+        worker.loadavg()
+        (tmp_path / 'loadavg').write_text('9.00 9.00 9.00 1/1 1\n')
+        worker.join(parent.sweep)
+        assert worker.loadavg().load1 == 0.5
+
+        parent.reset()
+        worker.join(parent.sweep)
+        assert worker.loadavg().load1 == 9.0
+
+    def test_live(self):
+        # Runs against the real /proc on Linux
+        snapshot = procfs.Snapshot()
+        assert snapshot.stat().cpus >= 1
+        assert snapshot.meminfo()['MemTotal'] > 0
@@ -0,0 +1,242 @@
+"""
+Test disermo/scheduler.py
+"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+from unittest import mock
+
+from disermo.checks.rates import NetworkIO
+from disermo.constants import Status
+from disermo.node import Node
+from disermo.scheduler import Scheduler
+
+from .checks.test_rates import NET_DEV, proc  # noqa: F401
+from .test_node import MockCheck, MockStorage
+
+
+class MockClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingCheck(MockCheck):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.runs = 0
+
+    def update(self):
+        super().update()
+        self.runs += 1
+
+
+class CountingNode(Node, CountingCheck):
+    pass
+
+
+def gen_scheduler(**kwargs):
+    """
+    Generate a scheduler for the tree:
+
+        node (every 60)
+            fast (every 10)
+            slow (every 30)
+    """
+    fast = CountingCheck('fast').every(10)
+    slow = CountingCheck('slow').every(30)
+    node = CountingNode('node')
+    node.add(fast, slow)
+    clock = MockClock()
+    storage = MockStorage()
+    scheduler = Scheduler(
+        node, storage, interval=60, flush_interval=20, clock=clock, **kwargs
+    )
+    return scheduler, clock, storage, node, fast, slow
+
+
+def test_start__loads_and_runs_all():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+    scheduler.start()
+    assert storage.loaded
+
+    assert scheduler.run_pending() == [node, fast, slow]
+    assert (node.runs, fast.runs, slow.runs) == (1, 1, 1)
+    assert storage.data['fast'] == [(Status.DISABLED, 1)]
+
+
+def test_intervals__inherited():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+    assert scheduler.intervals == {node: 60, fast: 10, slow: 30}
+
+
+def test_run_pending__checks_run_at_intervals():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+    scheduler.start()
+    for second in range(0, 61):
+        clock.now = second
+        scheduler.run_pending()
+
+    assert (node.runs, fast.runs, slow.runs) == (2, 7, 3)
+    assert scheduler.stats.skipped == 0
+
+
+def test_run_pending__parents_reported():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+    scheduler.start()
+    scheduler.run_pending()
+    clock.now = 10
+    assert scheduler.run_pending() == [fast]
+    assert storage.data['node'] == [(Status.DISABLED, 2)]
+    assert storage.data['fast'] == [(Status.DISABLED, 2)]
+    assert storage.data['slow'] == [(Status.DISABLED, 1)]
+
+
+def test_run_pending__status_recovers():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+    scheduler.start()
+    fast.mock_status = Status.ERROR
+    scheduler.run_pending()
+    assert node.status == Status.ERROR
+
+    fast.mock_status = Status.OK
+    clock.now = 10
+    scheduler.run_pending()
+    assert node.status == Status.OK
+
+
+def test_run_pending__missed_runs_skipped():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+    scheduler.start()
+    scheduler.run_pending()
+
+    clock.now = 35
+    assert scheduler.run_pending() == [fast, slow]
+    assert fast.runs == 2
+    assert scheduler.stats.skipped == 2
+    assert scheduler.stats.drift == 25
+    assert scheduler.due[fast] == 40
+
+
+def test_run_pending__overrun_counted():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+
+    def slow_update():
+        CountingCheck.update(fast)
+        clock.now += 15
+
+    fast.update = slow_update
+    scheduler.start()
+    scheduler.run_pending()
+    assert scheduler.stats.overruns == 1
+
+
+def test_run_pending__overrun_only_counted_for_slow_check():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+
+    def slow_update():
+        CountingCheck.update(slow)
+        clock.now += 15
+
+    slow.update = slow_update
+    scheduler.start()
+    scheduler.run_pending()
+    assert scheduler.stats.overruns == 0
+
+
+def test_run_pending__overrun_counted__executor():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler(
+        executor=ThreadPoolExecutor(max_workers=2),
+    )
+    fast.every(0.01)
+    scheduler.intervals[fast] = 0.01
+
+    def slow_update():
+        CountingCheck.update(fast)
+        time.sleep(0.05)
+
+    fast.update = slow_update
+    scheduler.start()
+    scheduler.run_pending()
+    assert scheduler.stats.overruns == 1
+    scheduler.executor.shutdown()
+
+
+def test_run_pending__exception__error_and_continues():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+
+    def broken_update():
+        raise ValueError('broken')
+
+    fast.update = broken_update
+    scheduler.start()
+    assert scheduler.run_pending() == [node, fast, slow]
+    assert fast.status == Status.ERROR
+    assert fast.data == {'error': "Check failed: ValueError('broken')"}
+    assert node.status == Status.ERROR
+    assert slow.runs == 1
+
+    clock.now = 10
+    assert scheduler.run_pending() == [fast]
+
+
+def test_run_pending__exception__executor():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler(
+        executor=ThreadPoolExecutor(max_workers=2),
+    )
+
+    def broken_update():
+        raise ValueError('broken')
+
+    fast.update = broken_update
+    scheduler.start()
+    scheduler.run_pending()
+    assert fast.status == Status.ERROR
+    assert slow.status == Status.DISABLED
+    scheduler.executor.shutdown()
+
+
+def test_run_pending__stateful__rates_from_last_run(proc):  # noqa: F811
+    check = NetworkIO('eth0').every(10)
+    node = Node('node').add(check)
+    clock = MockClock()
+    scheduler = Scheduler(node, MockStorage(), clock=clock)
+    scheduler.start()
+
+    for run in range(4):
+        clock.now = run * 10
+        (proc / 'net' / 'dev').write_text(
+            NET_DEV.replace(' 1000 10 ', f' {1000 + run * 500} 10 '),
+        )
+        with mock.patch('time.time', return_value=100 + run * 10):
+            due = scheduler.run_pending()
+        assert due == ([check] if run else [node, check])
+        if run:
+            assert check.data['rx_bytes_per_second'] == 50
+            assert check.data['interval'] == 10
+        else:
+            assert 'rx_bytes_per_second' not in check.data
+
+
+def test_flush__batched():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+    scheduler.start()
+    scheduler.run_pending()
+    assert not storage.saved
+
+    clock.now = 10
+    scheduler.run_pending()
+    assert not storage.saved
+
+    clock.now = 20
+    scheduler.run_pending()
+    assert storage.saved
+    assert scheduler.stats.flushes == 1
+
+
+def test_run_forever__stops_and_flushes():
+    scheduler, clock, storage, node, fast, slow = gen_scheduler()
+    scheduler.node.report = lambda *args, **kwargs: scheduler.stop()
+    scheduler.run_forever()
+    assert storage.saved
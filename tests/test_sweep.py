@@ -0,0 +1,102 @@
+"""
+Test disermo/sweep.py
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from disermo.checks.base import Check
+from disermo.constants import Status
+from disermo.node import Node
+from disermo.notifiers.stream import Stream
+from disermo.storage.base import Storage
+from disermo.sweep import Sweep
+
+
+class Probe(Check):
+    updates = 0
+
+    def __init__(self, target, status=Status.OK, label=None):
+        self.target = target
+        self.mock_status = status
+        super().__init__(label=label)
+
+    def update(self):
+        Probe.updates += 1
+        self.status = self.mock_status
+        self.data = {'target': self.target}
+
+
+class MockStorage(Storage):
+    saved = False
+
+    def load(self):
+        pass
+
+    def save(self):
+        self.saved = True
+
+
+def gen_nodes():
+    Probe.updates = 0
+    stream_a = Stream(StringIO())
+    stream_b = Stream(StringIO())
+    node_a = Node(label='A').add(
+        Probe('shared', Status.ERROR, label='Shared from A').notify(stream_a),
+        Probe('a'),
+    )
+    node_b = Node(label='B').add(
+        Probe('shared', Status.ERROR, label='Shared from B').notify(stream_b),
+    )
+    return node_a, node_b
+
+
+def test_group__by_configuration():
+    node_a, node_b = gen_nodes()
+    groups = Sweep().add(node_a, Storage()).add(node_b, Storage()).group()
+    sizes = sorted(len(checks) for checks in groups.values())
+    # Both nodes, shared probe, probe a
+    assert sizes == [1, 2, 2]
+
+
+def test_group__same_instance_once():
+    shared = Probe('shared')
+    node_a = Node(label='A').add(shared)
+    node_b = Node(label='B').add(shared)
+    groups = Sweep().add(node_a, Storage()).add(node_b, Storage()).group()
+    assert [shared] in groups.values()
+
+
+def test_run__shared_check_updated_once():
+    node_a, node_b = gen_nodes()
+    storage_a = MockStorage()
+    storage_b = MockStorage()
+    sweep = Sweep().add(node_a, storage_a).add(node_b, storage_b)
+    assert sweep.run() == Status.ERROR
+    # Two nodes, shared probe and probe a
+    assert Probe.updates == 2
+
+    shared_a, probe_a = node_a.subchecks
+    shared_b, = node_b.subchecks
+    assert shared_b.status == Status.ERROR
+    assert shared_b.data == {'target': 'shared'}
+    assert shared_b.data is not shared_a.data
+    assert probe_a.status == Status.OK
+    assert node_a.status == Status.ERROR
+    assert node_b.status == Status.ERROR
+
+    # Labels, notifiers and storage stay per node
+    assert shared_b.label == 'Shared from B'
+    assert 'Shared from B: Error' in shared_b.notifiers[0].stream.getvalue()
+    assert 'Shared from A' not in shared_b.notifiers[0].stream.getvalue()
+    assert storage_a.saved and storage_b.saved
+    assert list(storage_b.get(shared_b.uid)) == [Status.ERROR]
+
+
+def test_run__executor():
+    node_a, node_b = gen_nodes()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        sweep = Sweep(executor=executor)
+        sweep.add(node_a, MockStorage()).add(node_b, MockStorage())
+        assert sweep.run() == Status.ERROR
+    assert node_b.subchecks[0].status == Status.ERROR
+    assert node_b.subchecks[0].data == {'target': 'shared'}
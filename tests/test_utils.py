@@ -36,7 +36,7 @@ class TestCamelToSentence:
         assert camel_to_sentence('servesHTTP') == 'Serves HTTP'
 
 
-@mock.patch('time.time', mock.MagicMock(side_effect=[10.0, 20.0]))
+@mock.patch('time.perf_counter', mock.MagicMock(side_effect=[10.0, 20.0]))
 def test_timer():
     timer = Timer()
     assert timer.elapsed() == 10.0